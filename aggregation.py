@@ -0,0 +1,216 @@
+"""
+Monthly transaction aggregation shared by the forecasting and insights code
+Months are integer keys (months since 1970-01, the same ordinal as a monthly
+pandas Period) instead of Period objects, and distinct customers/products
+are counted on factorized ids. Partial results are mergeable, so the table can
+be built chunk by chunk, across processes or incrementally, and distinct
+counts can switch to a HyperLogLog sketch for very large inputs
+"""
+
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+TRANSACTION_COLUMNS = ["sale_date", "total_value", "quantity", "price", "customer_id", "product_id", "age"]
+DISTINCT_COLUMNS = ("customer_id", "product_id")
+SUM_COLUMNS = ("total_value", "quantity", "price", "age")
+CHUNK_SIZE = 100_000
+HLL_PRECISION = 12
+
+
+def month_keys(dates) -> np.ndarray:
+    """Integer month keys of datetime values (months since 1970-01)"""
+    values = np.asarray(pd.to_datetime(dates), dtype="datetime64[ns]")
+    return values.astype("datetime64[M]").astype(np.int64)
+
+
+def month_starts(keys) -> pd.DatetimeIndex:
+    """First day of each integer month key"""
+    return pd.DatetimeIndex(np.asarray(keys, dtype=np.int64).astype("datetime64[M]").astype("datetime64[ns]"))
+
+
+def hash_ids(values) -> np.ndarray:
+    """Stable 64-bit hashes of id values, comparable across chunks and processes"""
+    return pd.util.hash_array(np.asarray(values, dtype=object), categorize=False)
+
+
+def _register_updates(hashes, precision):
+    # Register index from the top bits, rank from the leading zeros of the rest
+    index = (hashes >> np.uint64(64 - precision)).astype(np.int64)
+    rest = hashes & np.uint64((1 << (64 - precision)) - 1)
+    bit_length = np.frexp(rest.astype(np.float64))[1]
+    rank = (64 - precision) - bit_length + 1
+    return index, np.minimum(rank, 64 - precision + 1).astype(np.uint8)
+
+
+def hll_estimate(registers) -> float:
+    """Cardinality estimate of one HyperLogLog register array"""
+    m = registers.size
+    alpha = 0.7213 / (1 + 1.079 / m)
+    estimate = alpha * m * m / np.sum(np.ldexp(1.0, -registers.astype(np.int64)))
+    zeros = int(np.count_nonzero(registers == 0))
+    if estimate <= 2.5 * m and zeros:
+        # Linear counting is more accurate for small cardinalities
+        estimate = m * np.log(m / zeros)
+    return float(estimate)
+
+
+class MonthlyAggregate:
+    """Mergeable per-month sums, counts and distinct ids of transactions"""
+
+    def __init__(self, approx_distinct: bool = False, precision: int = HLL_PRECISION):
+        """
+        Args:
+            approx_distinct: Count distinct ids with HyperLogLog sketches
+                (fixed 2**precision bytes per month and column) instead of
+                exact (month, id) pairs
+            precision: HyperLogLog register bits; relative error is about
+                1.04 / sqrt(2**precision)
+        """
+        self.approx_distinct = approx_distinct
+        self.precision = precision
+        self.sums = None
+        self.distinct = {col: None for col in DISTINCT_COLUMNS}
+
+    def update(self, df):
+        """Fold a DataFrame of transactions (TRANSACTION_COLUMNS) into the aggregate"""
+        if df.empty:
+            return self
+        keys = month_keys(df["sale_date"])
+        months, month_idx = np.unique(keys, return_inverse=True)
+        n = len(months)
+        sums = {"count": np.bincount(month_idx, minlength=n).astype(np.float64)}
+        for col in SUM_COLUMNS:
+            sums[col] = np.bincount(month_idx, weights=df[col].to_numpy(dtype=np.float64), minlength=n)
+        self._merge_sums(pd.DataFrame(sums, index=months))
+
+        for col in DISTINCT_COLUMNS:
+            codes, uniques = pd.factorize(df[col], sort=False)
+            hashes = hash_ids(uniques)
+            # Missing ids get code -1; like nunique(), they are not counted
+            valid = codes >= 0
+            codes, id_month_idx = codes[valid], month_idx[valid]
+            if self.approx_distinct:
+                sets = self._sketches(months, id_month_idx, hashes[codes])
+            else:
+                # Distinct (month, id) pairs on the small factorized codes
+                # first; only the survivors are mapped to hashes, which stay
+                # comparable when partials from other chunks are merged
+                n_ids = max(len(uniques), 1)
+                pair_keys = np.unique(id_month_idx.astype(np.int64) * n_ids + codes)
+                bounds = np.searchsorted(pair_keys // n_ids, np.arange(n + 1))
+                sets = {
+                    int(months[i]): np.sort(hashes[pair_keys[bounds[i]:bounds[i + 1]] % n_ids])
+                    for i in range(n)
+                }
+            self._merge_distinct(col, sets)
+        return self
+
+    def _sketches(self, months, month_idx, hashes):
+        index, rank = _register_updates(hashes, self.precision)
+        registers = np.zeros((len(months), 1 << self.precision), dtype=np.uint8)
+        np.maximum.at(registers, (month_idx, index), rank)
+        return {int(month): registers[i] for i, month in enumerate(months)}
+
+    def _merge_sums(self, sums):
+        self.sums = sums if self.sums is None else self.sums.add(sums, fill_value=0)
+
+    def _merge_distinct(self, col, sets):
+        # Per month: sorted unique id hashes (exact) or HyperLogLog registers
+        combine = np.maximum if self.approx_distinct else np.union1d
+        current = self.distinct[col]
+        if current is None:
+            self.distinct[col] = dict(sets)
+            return
+        for month, values in sets.items():
+            mine = current.get(month)
+            current[month] = values if mine is None else combine(mine, values)
+
+    def merge(self, other):
+        """Fold another aggregate's partial results into this one"""
+        if other.approx_distinct != self.approx_distinct or other.precision != self.precision:
+            raise ValueError("Cannot merge aggregates with different distinct-count modes")
+        if other.sums is not None:
+            self._merge_sums(other.sums)
+        for col in DISTINCT_COLUMNS:
+            if other.distinct[col] is not None:
+                self._merge_distinct(col, other.distinct[col])
+        return self
+
+    def _distinct_counts(self, col, months):
+        sets = self.distinct[col]
+        if self.approx_distinct:
+            return np.array([round(hll_estimate(sets[m])) for m in months], dtype=np.float64)
+        return np.array([len(sets[m]) for m in months], dtype=np.float64)
+
+    def table(self) -> pd.DataFrame:
+        """
+        Monthly table in the layout of create_time_series_features
+
+        Returns:
+            DataFrame with month_key, total_value_sum, quantity_sum,
+            quantity_mean, price_mean, customer_id_nunique, product_id_nunique,
+            age_mean (rounded to 2 decimals, like the notebook) and date
+        """
+        sums = self.sums.sort_index()
+        months = sums.index.to_numpy(dtype=np.int64)
+        count = sums["count"].to_numpy()
+        table = pd.DataFrame({
+            "month_key": months,
+            "total_value_sum": sums["total_value"].to_numpy(),
+            "quantity_sum": sums["quantity"].to_numpy(),
+            "quantity_mean": sums["quantity"].to_numpy() / count,
+            "price_mean": sums["price"].to_numpy() / count,
+            "customer_id_nunique": self._distinct_counts("customer_id", months),
+            "product_id_nunique": self._distinct_counts("product_id", months),
+            "age_mean": sums["age"].to_numpy() / count,
+        }).round(2)
+        table["date"] = month_starts(months)
+        return table
+
+
+def _aggregate_chunk(args):
+    df, approx_distinct, precision = args
+    return MonthlyAggregate(approx_distinct, precision).update(df)
+
+
+def aggregate_chunks(chunks, approx_distinct: bool = False, precision: int = HLL_PRECISION, workers: int = 1):
+    """
+    Aggregate an iterable of transaction DataFrames into one MonthlyAggregate
+
+    Args:
+        chunks: Iterable of DataFrames with TRANSACTION_COLUMNS
+        approx_distinct: Use HyperLogLog distinct counts
+        precision: HyperLogLog register bits
+        workers: Processes aggregating chunks in parallel (1: in-process)
+    """
+    result = MonthlyAggregate(approx_distinct, precision)
+    if workers <= 1:
+        for chunk in chunks:
+            result.update(chunk)
+        return result
+    # spawn: forking a threaded web worker can deadlock the child
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+        pending = []
+        for chunk in chunks:
+            pending.append(pool.submit(_aggregate_chunk, (chunk, approx_distinct, precision)))
+            # Keep only a couple of chunks per worker in flight
+            while len(pending) >= 2 * workers:
+                result.merge(pending.pop(0).result())
+        for future in pending:
+            result.merge(future.result())
+    return result
+
+
+def aggregate_frame(df, approx_distinct: bool = False, workers: int = 1, chunksize: int = CHUNK_SIZE):
+    """Monthly table of an in-memory transactions DataFrame"""
+    chunks = (df.iloc[i:i + chunksize] for i in range(0, len(df), chunksize))
+    return aggregate_chunks(chunks, approx_distinct, workers=workers).table()
+
+
+def aggregate_csv(path: str, approx_distinct: bool = False, workers: int = 1, chunksize: int = CHUNK_SIZE):
+    """Monthly table of a transactions CSV, streamed in chunks"""
+    chunks = pd.read_csv(path, usecols=TRANSACTION_COLUMNS, parse_dates=["sale_date"], chunksize=chunksize)
+    return aggregate_chunks(chunks, approx_distinct, workers=workers).table()
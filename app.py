@@ -1,9 +1,27 @@
 
-from flask import Flask, request, jsonify, send_file
-import pickle
+from flask import Flask, request, jsonify, send_file, Response, g
 import numpy as np
 import os
+import re
+import time
+import queue
 import logging
+from functools import partial
+from model_registry import ModelRegistry, ModelNotAvailable
+from churn_preprocessing import ChurnModels
+from feature_store import FeatureStore
+from score_cache import ScoreCache
+from sentiment import SentimentScorer
+from jobs import JobQueue, SUCCEEDED, FAILED
+from llm_insights import InsightsPipeline, BriefsPipeline
+from insights_store import InsightsStore
+from forecasting import SalesForecaster, MAX_HORIZON
+from segmentation import Segmenter
+from metrics import Metrics
+from feature_schema import schema_for, FeatureValidationError
+from scoring import (
+    CHURN_MODELS, score_model, score_models, combine_scores, top_n_indices
+)
 
 
 app = Flask(__name__)
@@ -11,20 +29,67 @@ logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 INSIGHTS_FILE = "customer_insights_mistral.txt"
 AUDIO_FILE = "audio_output/insights_from_file.mp3"
-with open('models/logistic_regression.pkl', 'rb') as f:
-    lr_model = pickle.load(f)
-with open('models/svm_rbf.pkl', 'rb') as f:
-    svm_model = pickle.load(f)
-with open('models/decision_tree.pkl', 'rb') as f:
-    dt_model = pickle.load(f)
-with open('models/random_forest.pkl', 'rb') as f:
-    rf_model = pickle.load(f)
-with open('models/linreg_forecast.pkl', 'rb') as f:
-    linreg_model = pickle.load(f)
-with open('models/sentiment_vader.pkl', 'rb') as f:
-    sentiment_model = pickle.load(f)
-with open('models/kmeans.pkl', 'rb') as f:
-    kmeans_model = pickle.load(f)
+DEFAULT_VOICE = "en-US-AriaNeural"
+registry = ModelRegistry()
+churn_models = ChurnModels(registry)
+feature_store = FeatureStore()
+score_cache = ScoreCache()
+sentiment_scorer = SentimentScorer(lambda: registry.get("sentiment"), registry.path("sentiment"))
+insights_store = InsightsStore()
+forecaster = SalesForecaster(registry)
+segmenter = Segmenter(registry)
+metrics = Metrics()
+DEFAULT_CHURN_MODEL = "logreg"
+
+
+def cache_and_load_samples():
+    for cache, stats in (("score", score_cache.stats()), ("sentiment", sentiment_scorer.stats()),
+                         ("forecast", forecaster.stats())):
+        yield "cache_hits_total", {"cache": cache}, stats["hits"]
+        yield "cache_misses_total", {"cache": cache}, stats["misses"]
+    for name, stats in registry.load_stats().items():
+        yield "model_loads_total", {"model": name}, stats["loads"]
+        yield "model_load_seconds_total", {"model": name}, stats["seconds"]
+
+
+metrics.add_collector(cache_and_load_samples)
+
+
+@app.before_request
+def start_request_timer():
+    g.request_start = time.perf_counter()
+    g.stages = metrics.stages()
+
+
+@app.after_request
+def record_request_metrics(response):
+    stages = g.get("stages")
+    if stages is None:
+        return response
+    endpoint = request.url_rule.rule if request.url_rule is not None else "unmatched"
+    if "model" in g:
+        # Everything after the last marked stage is building the response
+        stages.mark("serialize")
+        stages.observe(endpoint=endpoint, model=g.get("model", ""))
+    metrics.inc("api_requests_total", endpoint=endpoint, method=request.method, status=response.status_code)
+    metrics.observe("api_request_duration_seconds", time.perf_counter() - g.request_start, endpoint=endpoint)
+    return response
+
+
+def record_batch(model, n_rows):
+    """Close the convert stage of a scoring request and record its batch size"""
+    g.model = model
+    g.stages.mark("convert")
+    metrics.observe("model_batch_rows", n_rows, model=model)
+
+
+def run_model(model, fn, rows):
+    """Call fn(rows) and record its compute time and row count under the model's name"""
+    start = time.perf_counter()
+    result = fn(rows)
+    metrics.observe("model_inference_duration_seconds", time.perf_counter() - start, model=model)
+    metrics.inc("model_rows_total", len(rows), model=model)
+    return result
 
 
 @app.route('/')
@@ -33,43 +98,323 @@ def home():
         "message": "ML Model API is running.",
         "endpoints": [
             "/predict - ML model predictions",
+            "/models - Model availability and load state",
+            "/cache/stats - Churn score cache counters",
+            "/metrics - Prometheus metrics of all workers",
+            "/customers/score - Churn score, cluster and segment by customer_id",
+            "/segments - Cluster and segment name for raw customer feature rows",
+            "/forecast - Recursive monthly sales forecast for a horizon",
             "/sentiment - Sentiment analysis", 
             "/llm_insights - Generate LLM customer insights",
             "/tts - Convert insights to speech",
-            "/tts_insights - Get insights audio directly"
+            "/tts_insights - Get insights audio directly",
+            "/llm_insights/briefs - Per-segment and at-risk customer briefs",
+            "/jobs/<job_id> - Status of a background regeneration job"
         ]
     })
 
 
+MODEL_TYPES = ("logreg", "svm", "dt", "rf", "linreg", "kmeans")
+
+
+@app.route('/models')
+def models():
+    return jsonify({"models": registry.available()})
+
+
+@app.route('/models/<model_type>/schema')
+def model_schema(model_type):
+    if model_type not in MODEL_TYPES:
+        return jsonify({"error": f"Unknown model type: {model_type}"}), 404
+    try:
+        version, model = registry.get_versioned(model_type)
+        schema = schema_for(model_type, model, version=version)
+    except ModelNotAvailable as e:
+        return jsonify({"error": str(e)}), 503
+    return jsonify({"model_type": model_type, "features": list(schema.names)})
+
+
+@app.route('/cache/stats')
+def cache_stats():
+    return jsonify(score_cache.stats())
+
+
+@app.route('/metrics')
+def prometheus_metrics():
+    try:
+        return Response(metrics.render(), mimetype="text/plain; version=0.0.4")
+    except Exception as e:
+        logger.error(f"Metrics Error: {str(e)}")
+        return jsonify({"error": str(e)}), 500
+
+
 @app.route('/predict', methods=['POST'])
 def predict():
     try:
         data = request.get_json()
+        g.stages.mark("parse")
         model_type = data.get('model_type')
+        model_types = data.get('model_types')
         features = data.get('features')
+        if model_type == "ensemble":
+            model_types = list(CHURN_MODELS)
+        if model_types is not None:
+            return predict_ensemble(model_types, features)
         if not model_type or features is None:
             return jsonify({"error": "Please provide 'model_type' and 'features' in the request body."}), 400
-        data_np = np.array(features).reshape(1, -1)
-        if model_type == "logreg":
-            prediction = lr_model.predict(data_np)[0]
-        elif model_type == "svm":
-            prediction = svm_model.predict(data_np)[0]
-        elif model_type == "dt":
-            prediction = dt_model.predict(data_np)[0]
-        elif model_type == "rf":
-            prediction = rf_model.predict(data_np)[0]
+        if model_type not in MODEL_TYPES:
+            return jsonify({"error": "Invalid model type. Choose 'logreg', 'svm', 'dt', 'rf', 'linreg', or 'kmeans'."}), 400
+        # Loading gets its own stage so a cold model load isn't timed as convert
+        version, model = registry.get_versioned(model_type)
+        schema = input_schema([model_type], model, version)
+        g.stages.mark("load")
+        try:
+            data_np, single = schema.to_matrix(features)
+        except FeatureValidationError as e:
+            return jsonify({"error": str(e)}), 400
+        record_batch(model_type, data_np.shape[0])
+        if model_type in CHURN_MODELS:
+            if any(k in data for k in ("return_scores", "threshold", "top_n")):
+                return predict_churn_scores(model_type, data_np, single, data)
+            predictions = score_churn(model_type, data_np)[0]
         elif model_type == "linreg":
-            prediction = linreg_model.predict(data_np)[0]
-        elif model_type == "kmeans":
-            prediction = kmeans_model.predict(data_np)[0]
+            predictions = run_model(model_type, model.predict, forecaster.transform(data_np))
         else:
-            return jsonify({"error": "Invalid model type. Choose 'logreg', 'svm', 'dt', 'rf', 'linreg', or 'kmeans'."}), 400
+            predictions = run_model(model_type, model.predict, data_np)
+        g.stages.mark("inference")
+        if single:
+            return jsonify({
+                "model_type": model_type,
+                "features": features,
+                "prediction": float(predictions[0])
+            })
         return jsonify({
             "model_type": model_type,
-            "features": features,
-            "prediction": float(prediction)
+            "n_rows": int(data_np.shape[0]),
+            "predictions": predictions.astype(np.float64).tolist()
         })
+    except ModelNotAvailable as e:
+        return jsonify({"error": str(e)}), 503
     except Exception as e:
+        logger.error(f"Prediction Error: {str(e)}")
+        return jsonify({"error": str(e)}), 500
+
+
+def input_schema(model_types, model, version):
+    """Request schema of model_types[0]; NaN/inf pass when every model's preprocessing fills them"""
+    allow_nan = all(m in CHURN_MODELS and churn_models.imputes(m) for m in model_types)
+    return schema_for(model_types[0], model, allow_nan=allow_nan, version=version)
+
+
+def score_churn(model_type, data_np):
+    """Return (labels, scores, score_type), reusing cached rows of the same model and preprocessing files"""
+    version, model = churn_models.get_versioned(model_type)
+    return score_cache.score_rows(
+        model_type, version, data_np, lambda rows: run_model(model_type, partial(score_model, model), rows)
+    )
+
+
+def predict_churn_scores(model_type, data_np, single, data):
+    threshold = data.get('threshold')
+    top_n = data.get('top_n')
+    ids = data.get('ids')
+    if threshold is not None and (isinstance(threshold, bool) or not isinstance(threshold, (int, float))):
+        return jsonify({"error": "'threshold' must be a number."}), 400
+    if top_n is not None and (isinstance(top_n, bool) or not isinstance(top_n, int) or top_n < 1):
+        return jsonify({"error": "'top_n' must be a positive integer."}), 400
+    if ids is not None and (not isinstance(ids, list) or len(ids) != data_np.shape[0]):
+        return jsonify({"error": "'ids' must be a list with one entry per feature row."}), 400
+
+    labels, scores, score_type = score_churn(model_type, data_np)
+    g.stages.mark("inference")
+    if threshold is not None:
+        labels = (scores >= threshold).astype(np.float64)
+
+    result = {
+        "model_type": model_type,
+        "score_type": score_type,
+        "threshold": threshold,
+        "n_rows": int(data_np.shape[0])
+    }
+    if top_n is not None:
+        result["top_at_risk"] = [{
+            "row": int(i),
+            "id": ids[i] if ids is not None else None,
+            "score": float(scores[i]),
+            "prediction": float(labels[i])
+        } for i in top_n_indices(scores, top_n)]
+    elif single:
+        result["prediction"] = float(labels[0])
+        result["score"] = float(scores[0])
+    else:
+        result["predictions"] = labels.tolist()
+        result["scores"] = scores.tolist()
+    return jsonify(result)
+
+
+def predict_ensemble(model_types, features):
+    if not isinstance(model_types, list) or not model_types or features is None:
+        return jsonify({"error": "Please provide a non-empty 'model_types' list and 'features' in the request body."}), 400
+    invalid = [m for m in model_types if m not in CHURN_MODELS]
+    if invalid:
+        return jsonify({"error": f"Invalid churn model(s) {invalid}. Choose from {list(CHURN_MODELS)}."}), 400
+    model_types = list(dict.fromkeys(model_types))
+    models = {m: registry.get_versioned(m) for m in model_types}
+    version, model = models[model_types[0]]
+    schema = input_schema(model_types, model, version)
+    g.stages.mark("load")
+    try:
+        data_np, single = schema.to_matrix(features)
+    except FeatureValidationError as e:
+        return jsonify({"error": str(e)}), 400
+    record_batch("ensemble", data_np.shape[0])
+    results = score_models({m: partial(score_churn, m) for m in model_types}, data_np)
+    vote, avg_proba = combine_scores(results)
+    g.stages.mark("inference")
+
+    def _out(values):
+        if values is None:
+            return None
+        values = np.asarray(values, dtype=np.float64)
+        return float(values[0]) if single else values.tolist()
+
+    return jsonify({
+        "model_types": model_types,
+        "n_rows": int(data_np.shape[0]),
+        "predictions": {m: _out(labels) for m, (labels, _, _) in results.items()},
+        "probabilities": {
+            m: _out(scores) if score_type == "probability" else None
+            for m, (_, scores, score_type) in results.items()
+        },
+        "vote": _out(vote),
+        "avg_probability": _out(avg_proba)
+    })
+
+
+@app.route('/customers/score', methods=['POST'])
+def customers_score():
+    try:
+        data = request.get_json()
+        g.stages.mark("parse")
+        customer_id = data.get('customer_id')
+        customer_ids = data.get('customer_ids')
+        model_type = data.get('model_type', DEFAULT_CHURN_MODEL)
+        threshold = data.get('threshold')
+        if customer_ids is None and customer_id is None:
+            return jsonify({"error": "Please provide 'customer_id' or a 'customer_ids' list in the request body."}), 400
+        if customer_ids is not None and not isinstance(customer_ids, list):
+            return jsonify({"error": "'customer_ids' must be a list."}), 400
+        if model_type not in CHURN_MODELS:
+            return jsonify({"error": f"Invalid churn model. Choose from {list(CHURN_MODELS)}."}), 400
+        if threshold is not None and (isinstance(threshold, bool) or not isinstance(threshold, (int, float))):
+            return jsonify({"error": "'threshold' must be a number."}), 400
+        ids = customer_ids if customer_ids is not None else [customer_id]
+        bad = [cid for cid in ids if isinstance(cid, bool) or not isinstance(cid, (str, int))]
+        if bad:
+            return jsonify({"error": f"Customer ids must be strings or integers, got {bad[0]!r}."}), 400
+        churn_models.get_versioned(model_type)
+        g.stages.mark("load")
+
+        snapshot, rows, found, missing = feature_store.lookup(ids)
+        if customer_ids is None and missing:
+            return jsonify({"error": f"Unknown customer_id: {customer_id}"}), 404
+        record_batch(model_type, len(rows))
+        results = []
+        if len(rows):
+            labels, scores, _ = score_churn(model_type, snapshot.features[rows])
+            g.stages.mark("inference")
+            if threshold is not None:
+                labels = (scores >= threshold).astype(np.float64)
+            clusters = snapshot.clusters[rows]
+            segments = snapshot.segments[rows]
+            results = [{
+                "customer_id": cid,
+                "churn_score": float(scores[i]),
+                "churn_prediction": float(labels[i]),
+                "cluster": int(clusters[i]),
+                "segment_name": segments[i]
+            } for i, cid in enumerate(found)]
+        if customer_ids is None:
+            return jsonify({"model_type": model_type, **results[0]})
+        return jsonify({
+            "model_type": model_type,
+            "results": results,
+            "not_found": missing
+        })
+    except ModelNotAvailable as e:
+        return jsonify({"error": str(e)}), 503
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
+@app.route('/customers/reload', methods=['POST'])
+def customers_reload():
+    try:
+        snapshot = feature_store.reload()
+        return jsonify({"status": "success", "customers": len(snapshot)})
+    except Exception as e:
+        logger.error(f"Feature store reload failed: {str(e)}")
+        return jsonify({"error": str(e)}), 500
+
+
+@app.route('/segments', methods=['POST'])
+def segments():
+    try:
+        data = request.get_json()
+        g.stages.mark("parse")
+        features = data.get('features')
+        ids = data.get('ids')
+        if features is None:
+            return jsonify({"error": "Please provide raw customer 'features' in the request body."}), 400
+        model = segmenter.model()
+        g.stages.mark("load")
+        try:
+            data_np, single = segmenter.to_matrix(features)
+        except FeatureValidationError as e:
+            return jsonify({"error": str(e)}), 400
+        if ids is not None and (not isinstance(ids, list) or len(ids) != data_np.shape[0]):
+            return jsonify({"error": "'ids' must be a list with one entry per feature row."}), 400
+
+        record_batch("segments", data_np.shape[0])
+        clusters, names, components = run_model("segments", model.assign, data_np)
+        g.stages.mark("inference")
+        if single:
+            result = {"cluster": int(clusters[0]), "segment_name": names[0]}
+            if data.get('return_components'):
+                result["components"] = components[0].tolist()
+            return jsonify(result)
+        result = {
+            "n_rows": int(data_np.shape[0]),
+            "clusters": clusters.tolist(),
+            "segment_names": names.tolist()
+        }
+        if ids is not None:
+            result["ids"] = ids
+        if data.get('return_components'):
+            result["components"] = components.tolist()
+        return jsonify(result)
+    except ModelNotAvailable as e:
+        return jsonify({"error": str(e)}), 503
+    except Exception as e:
+        logger.error(f"Segmentation Error: {str(e)}")
+        return jsonify({"error": str(e)}), 500
+
+
+@app.route('/forecast', methods=['GET', 'POST'])
+def forecast():
+    data = request.get_json(silent=True) or {}
+    try:
+        horizon = int(data.get('horizon', request.args.get('horizon', 6)))
+    except (TypeError, ValueError):
+        return jsonify({"error": "'horizon' must be an integer number of months."}), 400
+    if not 1 <= horizon <= MAX_HORIZON:
+        return jsonify({"error": f"'horizon' must be between 1 and {MAX_HORIZON}."}), 400
+    try:
+        return jsonify(forecaster.forecast(horizon))
+    except ModelNotAvailable as e:
+        return jsonify({"error": str(e)}), 503
+    except Exception as e:
+        logger.error(f"Forecast Error: {str(e)}")
         return jsonify({"error": str(e)}), 500
 
 
@@ -78,166 +423,257 @@ def sentiment():
     try:
         data = request.get_json()
         text = data.get('text')
+        texts = data.get('texts')
+        if texts is not None:
+            if not isinstance(texts, list) or not all(isinstance(t, str) for t in texts):
+                return jsonify({"error": "'texts' must be a list of strings."}), 400
+            results = sentiment_scorer.score_many(texts)
+            return jsonify({
+                "n_texts": len(texts),
+                "results": [{
+                    "text": t,
+                    "scores": {k: r[k] for k in ("neg", "neu", "pos", "compound")},
+                    "sentiment_category": r["sentiment_category"]
+                } for t, r in zip(texts, results)]
+            })
         if not text:
-            return jsonify({"error": "Please provide 'text' in the request body."}), 400
-        scores = sentiment_model.polarity_scores(text)
+            return jsonify({"error": "Please provide 'text' or a 'texts' list in the request body."}), 400
+        result = sentiment_scorer.score(text)
         return jsonify({
             "text": text,
-            "scores": scores
+            "scores": {k: result[k] for k in ("neg", "neu", "pos", "compound")},
+            "sentiment_category": result["sentiment_category"]
         })
+    except ModelNotAvailable as e:
+        return jsonify({"error": str(e)}), 503
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
 
 
 
-# @app.route('/llm_insights', methods=['POST'])
-# def llm_insights():
-#     try:
-#         data = request.get_json() if request.is_json else {}
-#         regenerate = data.get('regenerate', False)
-#         if os.path.exists(INSIGHTS_FILE) and not regenerate:
-#             logger.info("Using existing insights file")
-#             with open(INSIGHTS_FILE, 'r', encoding='utf-8') as f:
-#                 insights = f.read()
-#         else:
-#             logger.info("Running llm_insights.py to generate new insights...")
-#             result = subprocess.run(
-#                 ['python', 'llm_insights.py'], 
-#                 capture_output=True, 
-#                 text=True,
-#                 timeout=600
-#             )
-#             if result.returncode != 0:
-#                 logger.error(f"llm_insights.py failed: {result.stderr}")
-#                 return jsonify({
-#                     "error": f"Failed to generate insights: {result.stderr}"
-#                 }), 500
-#             if os.path.exists(INSIGHTS_FILE):
-#                 with open(INSIGHTS_FILE, 'r', encoding='utf-8') as f:
-#                     insights = f.read()
-#                 logger.info("Insights generated successfully")
-#             else:
-#                 return jsonify({
-#                     "error": "Insights file not generated"
-#                 }), 500
-        
-#         return jsonify({
-#             "status": "success",
-#             "insights": insights,
-#             "insights_file": INSIGHTS_FILE,
-#             "message": "Insights generated successfully"
-#         })
-#     except subprocess.TimeoutExpired:
-#         return jsonify({"error": "Insights generation timed out"}), 500
-#     except Exception as e:
-#         logger.error(f"Error generating insights: {str(e)}")
-#         return jsonify({"error": str(e)}), 500
-
-# @app.route('/tts_insights', methods=['GET', 'POST'])
-# def tts_insights():
-#     try:
-#         data = request.get_json() if request.is_json else {}
-#         voice = data.get('voice', 'en-US-AriaNeural')
-#         regenerate_insights = data.get('regenerate_insights', False)
-#         regenerate_audio = data.get('regenerate_audio', False)
-#         if os.path.exists(AUDIO_FILE) and not regenerate_audio:
-#             logger.info("Using existing audio file")
-#             return send_file(
-#                 AUDIO_FILE,
-#                 mimetype='audio/mpeg',
-#                 as_attachment=True,
-#                 download_name='customer_insights.mp3'
-#             )
-
-#         if not os.path.exists(INSIGHTS_FILE) or regenerate_insights:
-#             logger.info("Generating insights first...")
-#             result = subprocess.run(
-#                 ['python', 'llm_insights.py'], 
-#                 capture_output=True, 
-#                 text=True,
-#                 timeout=600
-#             )
-#             if result.returncode != 0:
-#                 return jsonify({
-#                     "error": f"Failed to generate insights: {result.stderr}"
-#                 }), 500
-
-#         if not os.path.exists(INSIGHTS_FILE):
-#             return jsonify({
-#                 "error": f"Insights file not found: {INSIGHTS_FILE}"
-#             }), 404
-#         audio_path = generate_audio_from_file(
-#             INSIGHTS_FILE, 
-#             voice=voice, 
-#             output_file=AUDIO_FILE
-#         )
-#         logger.info(f"Audio generated: {audio_path}")
-#         return send_file(
-#             audio_path,
-#             mimetype='audio/mpeg',
-#             as_attachment=True,
-#             download_name='customer_insights.mp3'
-#         )
-#     except subprocess.TimeoutExpired:
-#         return jsonify({"error": "Insights generation timed out"}), 500
-#     except Exception as e:
-#         logger.error(f"TTS Insights Error: {str(e)}")
-#         return jsonify({"error": str(e)}), 500
+def generate_insights():
+    """Job handler: regenerate the insights file in-process"""
+    result = InsightsPipeline(output_file=INSIGHTS_FILE).run()
+    logger.info("Insights stage timings: " + ", ".join(f"{k}={v:.2f}s" for k, v in result["timings"].items()))
+    return {"insights_file": result["insights_file"], "timings": result["timings"]}
+
+
+def audio_file_for(voice):
+    """AUDIO_FILE for the default voice, a per-voice file next to it for any other voice"""
+    if voice == DEFAULT_VOICE:
+        return AUDIO_FILE
+    root, ext = os.path.splitext(AUDIO_FILE)
+    return f"{root}.{voice}{ext}"
+
+
+def generate_insights_audio(voice=DEFAULT_VOICE, regenerate_insights=False, on_audio=None):
+    """Job handler: summary -> LLM -> TTS chain producing the voice's audio file; on_audio receives each chunk's MP3 bytes"""
+    from tts import generate_audio_from_file
+    if regenerate_insights or not os.path.exists(INSIGHTS_FILE):
+        # Through the insights single-flight key, so a concurrent insights
+        # job is joined instead of regenerating the file twice
+        insights_job = job_queue.run("insights")
+        if insights_job["status"] != SUCCEEDED:
+            raise RuntimeError(f"Insights job {insights_job['id']} failed: {insights_job['error']}")
+    audio_path = generate_audio_from_file(INSIGHTS_FILE, voice=voice, output_file=os.path.basename(audio_file_for(voice)),
+                                          on_audio=on_audio)
+    return {"insights_file": INSIGHTS_FILE, "audio_file": audio_path}
+
+
+def generate_briefs(segments=True, top_at_risk=20):
+    """Job handler: fan out per-segment and per-customer briefs into insights_store"""
+    result = BriefsPipeline(
+        store=insights_store, segments=segments, top_at_risk=top_at_risk, registry=registry
+    ).run()
+    logger.info("Brief stage timings: " + ", ".join(f"{k}={v:.2f}s" for k, v in result["timings"].items()))
+    return result
+
+
+job_queue = JobQueue()
+job_queue.register("insights", generate_insights)
+job_queue.register("tts", generate_insights_audio)
+job_queue.register("briefs", generate_briefs)
+
+
+def job_accepted(job, created):
+    return jsonify({
+        "status": job["status"],
+        "job_id": job["id"],
+        "deduplicated": not created,
+        "status_url": f"/jobs/{job['id']}",
+        "result_url": f"/jobs/{job['id']}/result"
+    }), 202
+
 
 @app.route('/llm_insights', methods=['POST'])
 def llm_insights():
     try:
-        data = request.get_json() if request.is_json else {}
+        data = request.get_json(silent=True) or {}
         regenerate = data.get('regenerate', False)
-        
+
         if os.path.exists(INSIGHTS_FILE) and not regenerate:
             logger.info("Using existing insights file")
             with open(INSIGHTS_FILE, 'r', encoding='utf-8') as f:
                 insights = f.read()
         else:
-            return jsonify({
-                "error": "Insights file not found. Generation disabled in production."
-            }), 404
-        
+            return job_accepted(*job_queue.submit("insights"))
+
         return jsonify({
             "status": "success",
             "insights": insights,
             "insights_file": INSIGHTS_FILE,
             "message": "Pre-generated insights served successfully"
         })
-        
+
     except Exception as e:
         logger.error(f"Error serving insights: {str(e)}")
         return jsonify({"error": str(e)}), 500
 
 
+def stream_job_audio(job_id, pieces, poll_interval=0.5):
+    """Yield the MP3 bytes a running tts job hands to its on_audio callback, until the job finishes"""
+    while True:
+        try:
+            yield pieces.get(timeout=poll_interval)
+            continue
+        except queue.Empty:
+            pass
+        job = job_queue.get(job_id)
+        if job is None or job["status"] in (SUCCEEDED, FAILED):
+            break
+    # Chunks are handed over before the job record is finalized
+    while not pieces.empty():
+        yield pieces.get_nowait()
+    if job is not None and job["status"] == FAILED:
+        raise RuntimeError(f"TTS job {job_id} failed: {job['error']}")
+
+
+def send_audio(path):
+    # conditional=True answers Range requests with 206 and If-None-Match /
+    # If-Modified-Since with 304; the default Cache-Control: no-cache makes
+    # clients revalidate, since regeneration replaces the file in place
+    return send_file(
+        path,
+        mimetype='audio/mpeg',
+        as_attachment=True,
+        download_name='customer_insights.mp3',
+        conditional=True,
+        etag=True
+    )
+
+
+VOICE_NAME = re.compile(r'[A-Za-z]{2,3}-[A-Za-z0-9]{2,4}-[A-Za-z0-9]+')
+
+
+def is_truthy(value):
+    return str(value).lower() in ("1", "true", "yes")
+
+
+def request_flag(data, name):
+    """Boolean flag from the JSON body or, e.g. for GET, the query string"""
+    return is_truthy(data.get(name, request.args.get(name, False)))
+
+
+@app.route('/llm_insights/briefs', methods=['GET', 'POST'])
+def llm_insight_briefs():
+    if request.method == 'GET':
+        return jsonify({"briefs": insights_store.index()})
+    data = request.get_json(silent=True) or {}
+    try:
+        top_at_risk = int(data.get('top_at_risk', 20))
+    except (TypeError, ValueError):
+        return jsonify({"error": "'top_at_risk' must be an integer."}), 400
+    if not 0 <= top_at_risk <= 500:
+        return jsonify({"error": "'top_at_risk' must be between 0 and 500."}), 400
+    return job_accepted(*job_queue.submit("briefs", {
+        "segments": bool(data.get('segments', True)),
+        "top_at_risk": top_at_risk
+    }))
+
+
+@app.route('/llm_insights/briefs/<kind>/<path:name>')
+def llm_insight_brief(kind, name):
+    found = insights_store.get(kind, name)
+    if found is None:
+        return jsonify({"error": f"No brief for {kind}/{name}; POST /llm_insights/briefs to generate briefs"}), 404
+    meta, insights = found
+    return jsonify({"status": "success", **meta, "insights": insights})
+
+
 @app.route('/tts_insights', methods=['GET', 'POST'])
 def tts_insights():
     try:
-        data = request.get_json() if request.is_json else {}
-        # voice = data.get('voice', 'en-US-AriaNeural')  # Not needed anymore
-        # regenerate_insights = data.get('regenerate_insights', False)  # Not needed
-        # regenerate_audio = data.get('regenerate_audio', False)  # Not needed
-        
-        if os.path.exists(AUDIO_FILE):
+        data = request.get_json(silent=True) or {}
+        voice = data.get('voice', request.args.get('voice', DEFAULT_VOICE))
+        if not isinstance(voice, str) or not VOICE_NAME.fullmatch(voice):
+            return jsonify({"error": "'voice' must be an Edge TTS voice name such as en-US-GuyNeural."}), 400
+        regenerate_insights = request_flag(data, 'regenerate_insights')
+        regenerate_audio = request_flag(data, 'regenerate_audio') or regenerate_insights
+        stream = request_flag(data, 'stream')
+
+        audio_file = audio_file_for(voice)
+        if os.path.exists(audio_file) and not regenerate_audio:
             logger.info("Using existing audio file")
-            return send_file(
-                AUDIO_FILE,
-                mimetype='audio/mpeg',
-                as_attachment=True,
-                download_name='customer_insights.mp3'
-            )
-        else:
-            return jsonify({
-                "error": f"Audio file not found: {AUDIO_FILE}. TTS generation disabled in production."
-            }), 404
-        
+            return send_audio(audio_file)
+        if stream and not regenerate_insights and os.path.exists(INSIGHTS_FILE):
+            # Start playback while synthesis runs; the finished file lands at
+            # the voice's audio file for later (range-capable) requests.
+            # Synthesis goes through the tts job's single-flight key, so a
+            # concurrent request for the same voice joins that job (202)
+            # instead of writing the file a second time
+            pieces = queue.Queue()
+            job, created = job_queue.submit("tts", {
+                "voice": voice,
+                "regenerate_insights": False
+            }, on_audio=pieces.put)
+            if not created:
+                return job_accepted(job, created)
+            logger.info(f"Streaming audio while tts job {job['id']} synthesizes")
+            return Response(stream_job_audio(job["id"], pieces), mimetype='audio/mpeg', headers={
+                "Cache-Control": "no-store",
+                "X-Accel-Buffering": "no"
+            })
+        return job_accepted(*job_queue.submit("tts", {
+            "voice": voice,
+            "regenerate_insights": regenerate_insights
+        }))
+
     except Exception as e:
         logger.error(f"TTS Insights Error: {str(e)}")
         return jsonify({"error": str(e)}), 500
 
 
+@app.route('/jobs/<job_id>')
+def job_status(job_id):
+    job = job_queue.get(job_id)
+    if job is None:
+        return jsonify({"error": f"Unknown job: {job_id}"}), 404
+    return jsonify(job)
+
+
+@app.route('/jobs/<job_id>/result')
+def job_result(job_id):
+    job = job_queue.get(job_id)
+    if job is None:
+        return jsonify({"error": f"Unknown job: {job_id}"}), 404
+    if job["status"] == FAILED:
+        return jsonify({"status": job["status"], "error": job["error"]}), 500
+    if job["status"] != SUCCEEDED:
+        return jsonify({"status": job["status"], "message": "Job has not finished yet"}), 409
+    if job["kind"] == "tts":
+        return send_audio(job["result"]["audio_file"])
+    if job["kind"] == "briefs":
+        return jsonify({"status": "success", **job["result"]})
+    with open(job["result"]["insights_file"], 'r', encoding='utf-8') as f:
+        insights = f.read()
+    return jsonify({
+        "status": "success",
+        "insights": insights,
+        "insights_file": job["result"]["insights_file"]
+    })
+
+
 
 
 # if __name__ == '__main__':
@@ -262,6 +698,40 @@ Logistic Regression, SVM, Decision Tree, Random Forest:
   "features": [2, 41, 185, 249000.0, 124500.0, 225000.0, 3.5, 5.0, 28500.0, 0.0, 0.0, 0.5, 0.5, 0.0, 0.0, 2, 2, 0.5, 1, 0, 1, 0.0, 0, 2, 1.0, 43, 0.5, 124500.0, 1.4634146341463414, 182195.1219512195, 0, 0, 1, 0, 0, 0, 0, 1]
 }
 
+Named features (any model): send a record, a list of records or a columnar dict
+keyed by feature name instead of positional values. GET /models/<model_type>/schema
+lists the names in training order; missing or unknown names are rejected with a 400:
+{
+  "model_type": "rf",
+  "features": {"orders": [2, 4], "tenure_days": [41, 439], ...}
+}
+
+Batch scoring (any model): pass a list of rows instead of a single vector.
+Every row is scored in one vectorized call and "predictions" is aligned with the rows:
+{
+  "model_type": "logreg",
+  "features": [[2, 41, 185, ...], [4, 439, 21, ...]]
+}
+
+Churn scores, custom threshold and server-side top-N ranking (churn models only).
+"scores" are P(churn) where the model supports it, else its decision function;
+with "threshold" the predictions become score >= threshold; with "top_n" only the
+top_n highest-risk rows (tagged with the optional "ids") are returned:
+{
+  "model_type": "svm",
+  "features": [[2, 41, 185, ...], [4, 439, 21, ...]],
+  "return_scores": true,
+  "threshold": 0.35,
+  "top_n": 50,
+  "ids": ["CUST00001", "CUST00002"]
+}
+
+Ensemble of churn models (run concurrently on the same rows; "ensemble" selects all four):
+{
+  "model_types": ["logreg", "svm", "dt", "rf"],  # or "model_type": "ensemble"
+  "features": [[2, 41, 185, ...], [4, 439, 21, ...]]
+}
+
 KMeans:
 {
   "model_type": "kmeans",
@@ -271,11 +741,42 @@ Linear Regression (Sales Forecasting):
 {
   "model_type": "linreg",
   "features": [8, 3, 0.5, 0.866, 12, 2, 1, 100, 25000, 3, 100, 0.05, 0.02, 200, 50, 1000, 45, 5000, 0.8, 0.1, 0.1]
-  // Replace with actual monthly feature values in correct order
+  // Replace with actual monthly feature values in correct order (unscaled;
+  // the API applies linreg_scaler.pkl)
+}
+
+For /forecast (features are built server-side from the transactions; 1-60 months):
+{
+  "horizon": 6
+}
+
+For /customers/score endpoint (features come from the snapshot files; "model_type"
+defaults to "logreg", "threshold" is optional):
+{
+  "customer_ids": ["CUST00001", "CUST00002"],  # or "customer_id": "CUST00001"
+  "model_type": "svm"
+}
+
+For /llm_insights and /tts_insights regeneration (runs in the background; the 202
+response carries a job_id to poll at /jobs/<job_id> and fetch at /jobs/<job_id>/result;
+identical concurrent requests share one job):
+{
+  "regenerate": true
+}
+{
+  "voice": "en-US-GuyNeural",
+  "regenerate_insights": false,
+  "regenerate_audio": true
 }
 
 For /sentiment endpoint:
 {
   "text": "I love this product! It works perfectly and the support is great."
 }
+
+Batch sentiment (duplicates are scored once; results keep input order and include
+"sentiment_category" with the text-analysis notebook's +/-0.05 thresholds):
+{
+  "texts": ["Excellent customer service.", "Delivery was late.", "Excellent customer service."]
+}
 """
\ No newline at end of file
@@ -0,0 +1,67 @@
+"""
+Micro-benchmark for the churn preprocessing stage
+Compares ChurnPreprocessor.transform (one numpy pass: inf/NaN fill, caps and
+the folded RobustScaler) with the notebook's pandas path (replace, fillna,
+clip per capped column, then the pipeline scaler) on batches of snapshot rows
+
+Usage: python benchmarks/churn_preprocessing_benchmark.py [--rows 1000 100000] [--repeat 5]
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+from sklearn.preprocessing import RobustScaler
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from churn_preprocessing import ChurnPreprocessor, training_matrix
+from feature_schema import CHURN_FEATURES
+
+
+def pandas_preprocess(X, medians, caps, scaler):
+    df = pd.DataFrame(X, columns=CHURN_FEATURES)
+    df = df.replace([np.inf, -np.inf], np.nan)
+    df = df.fillna(medians)
+    for c, (lo, hi) in caps.items():
+        df[c] = df[c].clip(lower=lo, upper=hi)
+    return scaler.transform(df.to_numpy())
+
+
+def bench(fn, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, nargs="+", default=[1, 1000, 100000], help="Batch sizes")
+    parser.add_argument("--repeat", type=int, default=5, help="Runs per implementation (best is reported)")
+    args = parser.parse_args()
+
+    X_train, X_test = training_matrix()
+    preprocessor = ChurnPreprocessor.fit(X_train)
+    scaler = RobustScaler().fit(preprocessor.transform(X_train))
+    fused = preprocessor.with_scaler(scaler)
+    medians = pd.Series(preprocessor.medians, index=CHURN_FEATURES)
+    caps = preprocessor.caps
+
+    rng = np.random.default_rng(0)
+    for n in args.rows:
+        X = X_test[rng.integers(0, len(X_test), n)]
+        X[rng.random(X.shape) < 0.001] = np.inf
+        assert np.allclose(fused.transform(X), pandas_preprocess(X, medians, caps, scaler))
+        slow = bench(lambda: pandas_preprocess(X, medians, caps, scaler), args.repeat)
+        fast = bench(lambda: fused.transform(X), args.repeat)
+        print(f"{n:>8} rows: pandas {slow * 1000:9.3f} ms  fused {fast * 1000:9.3f} ms  ({slow / fast:6.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""
+Micro-benchmark for TTSGenerator.clean_text_for_speech
+Compares the compiled two-pass normalizer in tts.py with the previous chain of
+str.replace / re.sub calls on a generated report of a given size
+
+Usage: python benchmarks/clean_text_benchmark.py [--mb 8] [--repeat 5]
+"""
+
+import argparse
+import os
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from tts import normalize_for_speech
+
+INSIGHTS_FILE = "customer_insights_mistral.txt"
+
+SAMPLE = """CUSTOMER INTELLIGENCE INSIGHTS (Mistral 7B)
+==================================================
+
+ 1. **Sales Performance:**
+   - Total sales of $462 million grew 12.5% year over year, peaking on 2020-10-01.
+   - Average order value fell -3.2% & returns rose; consider cross-selling bundles.
+   - Discounts of 3%-5% from Q1 - Q2 cut churn (-1.5%) for 2019–2021 cohorts.
+
+2. **Churn Risk:**
+   • At 20.1%, the churn rate is a medium risk - act on the $1.2M at stake.
+"""
+
+
+def legacy_clean_text_for_speech(text: str) -> str:
+    text = text.replace("="*80, "")
+    text = text.replace("="*50, "")
+    text = text.replace("CUSTOMER INTELLIGENCE INSIGHTS", "Customer Intelligence Insights.")
+    text = text.replace("**", "")
+    text = text.replace("##", "")
+    text = text.replace("•", "Point:")
+    text = text.replace("-", "Point:")
+    text = re.sub(r'\b(\d+)\.\s*\*\*([^*]+)\*\*', r'Point \1: \2.', text)
+    text = re.sub(r'\n\s*\n', '. ', text)
+    text = re.sub(r'\s+', ' ', text)
+    text = text.replace("$", "dollars ")
+    text = text.replace("%", " percent")
+    text = text.replace("&", " and ")
+    return text.strip()
+
+
+def build_input(megabytes: float) -> str:
+    base = SAMPLE
+    if os.path.exists(INSIGHTS_FILE):
+        with open(INSIGHTS_FILE, 'r', encoding='utf-8') as f:
+            base += "\n\n" + f.read()
+    copies = max(1, int(megabytes * 1024 * 1024 / len(base)))
+    return "\n\n".join([base] * copies)
+
+
+def bench(fn, text, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(text)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--mb", type=float, default=8.0, help="Input size in megabytes")
+    parser.add_argument("--repeat", type=int, default=5, help="Runs per implementation (best is reported)")
+    args = parser.parse_args()
+
+    text = build_input(args.mb)
+    size_mb = len(text.encode("utf-8")) / (1024 * 1024)
+    print(f"Input: {size_mb:.1f} MB")
+    for name, fn in (("legacy", legacy_clean_text_for_speech), ("compiled", normalize_for_speech)):
+        seconds = bench(fn, text, args.repeat)
+        print(f"{name:>9}: {seconds * 1000:8.1f} ms  {size_mb / seconds:7.1f} MB/s")
+    print("\nSample output:")
+    print(normalize_for_speech(SAMPLE))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,243 @@
+"""
+Training-serving consistent preprocessing of the churn models
+notebooks/churn_prediction.ipynb replaces inf with NaN, fills NaN with medians
+and clips heavy-tail columns to quantile caps learned on the training split
+before fitting; the RobustScaler inside the pipelines comes after that. The
+caps and medians are saved next to each churn model, and at serving time they
+are fused with the model's scaler into one vectorized numpy pass
+"""
+
+import os
+import pickle
+import threading
+import logging
+
+import numpy as np
+import pandas as pd
+from sklearn.model_selection import train_test_split
+from sklearn.pipeline import Pipeline
+
+from feature_schema import CHURN_FEATURES
+from model_registry import ModelNotAvailable
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_FILE = "data/customer_snapshot_ml.csv"
+
+# HEAVY_TAIL_COLS and fit_caps quantiles of the notebook
+HEAVY_TAIL_COLS = (
+    "monetary_sum", "monetary_median", "monetary_max", "aov",
+    "orders_per_30d", "monetary_per_30d",
+    "avg_price", "avg_quantity",
+    "tenure_days", "recency_days",
+    "unique_products", "unique_categories",
+)
+CAP_LOWER = 0.01
+CAP_UPPER = 0.99
+# train_test_split arguments of the notebook
+TEST_SIZE = 0.20
+RANDOM_STATE = 42
+
+
+def preprocessor_name(model_type: str) -> str:
+    """Registry name of a churn model's preprocessing artifact"""
+    return f"{model_type}_preprocess"
+
+
+class ChurnPreprocessor:
+    """Fitted caps, medians and an optional folded scaler as flat float64 arrays"""
+
+    def __init__(self, feature_names, lower, upper, medians, center=None, scale=None):
+        """
+        Args:
+            feature_names: Column order the arrays refer to
+            lower, upper: Per-column clip bounds (-inf / inf for uncapped columns)
+            medians: Per-column fill values for NaN and inf
+            center, scale: Scaler applied after capping, or None
+        """
+        self.feature_names = tuple(feature_names)
+        self.lower = np.asarray(lower, dtype=np.float64)
+        self.upper = np.asarray(upper, dtype=np.float64)
+        self.medians = np.asarray(medians, dtype=np.float64)
+        self.center = None if center is None else np.asarray(center, dtype=np.float64)
+        self.scale = None if scale is None else np.asarray(scale, dtype=np.float64)
+
+    @classmethod
+    def fit(cls, X, feature_names=CHURN_FEATURES, cap_cols=HEAVY_TAIL_COLS, lower=CAP_LOWER, upper=CAP_UPPER):
+        """
+        Learn fill values and caps from training rows (fit_caps of the notebook)
+
+        Args:
+            X: (rows, len(feature_names)) training matrix
+            cap_cols: Columns clipped to their [lower, upper] quantiles; a
+                column whose quantiles are not finite or not increasing stays
+                uncapped, as in the notebook
+        """
+        X = np.asarray(X, dtype=np.float64)
+        X = np.where(np.isfinite(X), X, np.nan)
+        medians = np.nanmedian(X, axis=0)
+        medians = np.where(np.isnan(medians), 0.0, medians)
+        # The notebook takes the quantiles after the median fill
+        X = np.where(np.isnan(X), medians, X)
+        lo = np.full(X.shape[1], -np.inf)
+        hi = np.full(X.shape[1], np.inf)
+        index = {name: i for i, name in enumerate(feature_names)}
+        cols = [index[c] for c in cap_cols if c in index]
+        if cols:
+            q = np.quantile(X[:, cols], [lower, upper], axis=0)
+            ok = np.isfinite(q).all(axis=0) & (q[0] < q[1])
+            for j, col in enumerate(cols):
+                if ok[j]:
+                    lo[col], hi[col] = q[0, j], q[1, j]
+        return cls(feature_names, lo, hi, medians)
+
+    @property
+    def caps(self) -> dict:
+        """{column: (lower, upper)} in the format of the notebook's fit_caps"""
+        return {
+            name: (float(lo), float(hi))
+            for name, lo, hi in zip(self.feature_names, self.lower, self.upper)
+            if np.isfinite(lo)
+        }
+
+    def with_scaler(self, scaler):
+        """Copy with a fitted RobustScaler/StandardScaler folded in after the caps"""
+        center = getattr(scaler, "center_", None)
+        if center is None:
+            center = getattr(scaler, "mean_", None)
+        scale = getattr(scaler, "scale_", None)
+        n = len(self.feature_names)
+        center = np.zeros(n) if center is None else center
+        scale = np.ones(n) if scale is None else scale
+        return ChurnPreprocessor(self.feature_names, self.lower, self.upper, self.medians, center, scale)
+
+    def transform(self, X):
+        """inf -> NaN -> median fill, caps and scaling in one pass over a float64 copy"""
+        out = np.array(X, dtype=np.float64)
+        if out.ndim == 1:
+            out = out.reshape(1, -1)
+        bad = ~np.isfinite(out)
+        if bad.any():
+            np.copyto(out, self.medians, where=bad)
+        np.clip(out, self.lower, self.upper, out=out)
+        if self.center is not None:
+            out -= self.center
+            out /= self.scale
+        return out
+
+
+def _foldable_scaler(model):
+    # A Pipeline of exactly (scaler, estimator) whose scaler is affine
+    if not isinstance(model, Pipeline) or len(model.steps) != 2:
+        return None
+    scaler = model.steps[0][1]
+    if hasattr(scaler, "scale_") and (hasattr(scaler, "center_") or hasattr(scaler, "mean_")):
+        return scaler
+    return None
+
+
+class PreprocessedModel:
+    """Churn model whose predict/predict_proba/decision_function run the fused preprocessing first"""
+
+    _METHODS = ("predict", "predict_proba", "decision_function")
+
+    def __init__(self, preprocessor, model):
+        scaler = _foldable_scaler(model)
+        if scaler is not None:
+            self.preprocessor = preprocessor.with_scaler(scaler)
+            self.estimator = model.steps[-1][1]
+        else:
+            self.preprocessor = preprocessor
+            self.estimator = model
+        self.model = model
+
+    def __getattr__(self, name):
+        # Only expose the methods the wrapped estimator has, so churn_scores'
+        # hasattr checks pick the same score type as for the raw model
+        if name not in PreprocessedModel._METHODS:
+            raise AttributeError(name)
+        method = getattr(self.estimator, name)
+        return lambda X: method(self.preprocessor.transform(X))
+
+
+class ChurnModels:
+    """Churn models paired with their preprocessing artifacts, rebuilt when either file changes"""
+
+    def __init__(self, registry):
+        self.registry = registry
+        self._models = {}
+        self._warned = set()
+        self._lock = threading.Lock()
+
+    def get_versioned(self, model_type: str):
+        """
+        Return (version, model) where version covers the model and its preprocessing
+
+        A model without a preprocessing artifact is served as is, so older
+        deployments keep working.
+
+        Raises:
+            ModelNotAvailable: if the model itself can't be loaded
+        """
+        model_version, model = self.registry.get_versioned(model_type)
+        try:
+            prep_version, preprocessor = self.registry.get_versioned(preprocessor_name(model_type))
+        except ModelNotAvailable:
+            if model_type not in self._warned:
+                self._warned.add(model_type)
+                logger.warning(f"No preprocessing artifact for '{model_type}', serving it without caps/imputation")
+            return (model_version, None), model
+        version = (model_version, prep_version)
+        entry = self._models.get(model_type)
+        if entry is None or entry[0] != version:
+            with self._lock:
+                entry = self._models.get(model_type)
+                if entry is None or entry[0] != version:
+                    entry = (version, PreprocessedModel(preprocessor, model))
+                    self._models[model_type] = entry
+        return entry
+
+    def get(self, model_type: str):
+        return self.get_versioned(model_type)[1]
+
+    def imputes(self, model_type: str) -> bool:
+        """True when the model is served with a preprocessing artifact that fills NaN/inf"""
+        return self.get_versioned(model_type)[0][1] is not None
+
+
+def training_matrix(snapshot_file: str = SNAPSHOT_FILE):
+    """(X_train, X_test) of the notebook's stratified 80/20 split of the snapshot"""
+    snap = pd.read_csv(snapshot_file)
+    X = snap[list(CHURN_FEATURES)].to_numpy(dtype=np.float64)
+    y = snap["churn"].astype(int).to_numpy()
+    train_idx, test_idx = train_test_split(
+        np.arange(len(y)), test_size=TEST_SIZE, random_state=RANDOM_STATE, stratify=y
+    )
+    return X[train_idx], X[test_idx]
+
+
+def save_preprocessors(registry, snapshot_file: str = SNAPSHOT_FILE, model_types=("logreg", "svm", "dt", "rf")):
+    """
+    Fit the preprocessing on the training split and save it next to each churn model
+
+    Returns:
+        List of written paths
+    """
+    X_train, _ = training_matrix(snapshot_file)
+    preprocessor = ChurnPreprocessor.fit(X_train)
+    paths = []
+    for model_type in model_types:
+        path = registry.path(preprocessor_name(model_type))
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            pickle.dump(preprocessor, f)
+        os.replace(tmp_path, path)
+        paths.append(path)
+    logger.info(f"Saved churn preprocessing ({len(preprocessor.caps)} capped columns) to {paths}")
+    return paths
+
+
+if __name__ == "__main__":
+    from model_registry import ModelRegistry
+    logging.basicConfig(level=logging.INFO)
+    save_preprocessors(ModelRegistry())
@@ -0,0 +1,221 @@
+"""
+Clustering model selection of notebooks/clustering.ipynb as a library
+Searches the (PCA n_components x k) grid of the notebook with one PCA fit whose
+leading columns serve every n_components, scores grid cells in a process pool
+with a sampled silhouette, re-checks only the best few cells with the exact
+O(n^2) silhouette, and saves the chosen KMeans together with the scaler and
+PCA it expects its inputs to go through
+"""
+
+import os
+import pickle
+import argparse
+import multiprocessing
+import logging
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+from sklearn.cluster import KMeans, MiniBatchKMeans
+from sklearn.decomposition import PCA
+from sklearn.metrics import silhouette_score
+from sklearn.preprocessing import StandardScaler
+
+from feature_schema import XLINEAR_FEATURES
+
+logger = logging.getLogger(__name__)
+
+XLINEAR_FILE = "data/customer_snapshot_Xlinear.csv"
+
+# Grid and KMeans settings of the notebook
+PC_LIST = (2, 3, 4, 5, 6, 8, 10)
+K_RANGE = tuple(range(2, 11))
+RANDOM_STATE = 42
+N_INIT = 30
+MAX_ITER = 500
+# Rows the grid silhouettes are estimated on, and cells re-scored exactly
+SAMPLE_SIZE = 5000
+FINALISTS = 3
+# Above this many rows MiniBatchKMeans replaces KMeans in the grid search
+MINIBATCH_ROWS = 200_000
+
+_worker_pcs = None
+
+
+def load_clustering_matrix(path: str = XLINEAR_FILE):
+    """Numeric clustering inputs of the notebook (XLINEAR_FEATURES, median-filled)"""
+    X = pd.read_csv(path)[list(XLINEAR_FEATURES)]
+    return X.fillna(X.median(numeric_only=True)).to_numpy(dtype=np.float64)
+
+
+def make_kmeans(k: int, n_rows: int = 0):
+    """KMeans of the notebook, or MiniBatchKMeans for very large inputs"""
+    if n_rows > MINIBATCH_ROWS:
+        return MiniBatchKMeans(n_clusters=k, random_state=RANDOM_STATE, n_init=3, batch_size=4096)
+    return KMeans(n_clusters=k, random_state=RANDOM_STATE, n_init=N_INIT, max_iter=MAX_ITER)
+
+
+def silhouette(X, labels, sample_size=None):
+    """Silhouette score, estimated on sample_size random rows when the input is larger"""
+    if len(set(labels.tolist())) < 2:
+        return float("nan")
+    if sample_size is None or len(X) <= sample_size:
+        return float(silhouette_score(X, labels))
+    return float(silhouette_score(X, labels, sample_size=sample_size, random_state=RANDOM_STATE))
+
+
+def _init_worker(pcs):
+    # Each worker receives the PCA matrix once instead of with every cell
+    global _worker_pcs
+    _worker_pcs = pcs
+
+
+def _score_cell(args):
+    n_pc, k, sample_size = args
+    X = _worker_pcs[:, :n_pc]
+    labels = make_kmeans(k, len(X)).fit_predict(X)
+    return n_pc, k, silhouette(X, labels, sample_size)
+
+
+class ClusteringSearch:
+    """(n_components, k) grid search over the scaled clustering inputs"""
+
+    def __init__(self, X, pc_list=PC_LIST, k_range=K_RANGE, sample_size: int = SAMPLE_SIZE,
+                 finalists: int = FINALISTS, workers: int = None):
+        """
+        Args:
+            X: Raw (unscaled) clustering matrix
+            pc_list: PCA n_components to try (capped at the feature count)
+            k_range: Cluster counts to try
+            sample_size: Rows the grid silhouettes are estimated on
+            finalists: Best sampled cells re-scored with the exact silhouette
+            workers: Processes scoring grid cells (default: CPU count)
+        """
+        self.X = np.asarray(X, dtype=np.float64)
+        self.pc_list = sorted({p for p in pc_list if p <= self.X.shape[1]})
+        self.k_range = tuple(k_range)
+        self.sample_size = sample_size
+        self.finalists = finalists
+        self.workers = workers or os.cpu_count() or 1
+        self.scaler = StandardScaler().fit(self.X)
+        self.X_scaled = self.scaler.transform(self.X)
+        self._pca = None
+
+    def pcs(self):
+        """
+        Principal components of the scaled data, fit once at the largest n_components
+
+        The first n columns equal PCA(n).fit_transform for every smaller n,
+        so one decomposition serves the whole grid.
+        """
+        if self._pca is None:
+            pca = PCA(n_components=max(self.pc_list), random_state=RANDOM_STATE).fit(self.X_scaled)
+            self._pca = (pca, pca.transform(self.X_scaled))
+        return self._pca[1]
+
+    def explained_variance(self) -> dict:
+        self.pcs()
+        cumulative = np.cumsum(self._pca[0].explained_variance_ratio_)
+        return {n: float(cumulative[n - 1]) for n in self.pc_list}
+
+    def grid(self) -> pd.DataFrame:
+        """Sampled silhouette of every cell (rows: n_components, columns: k)"""
+        pcs = self.pcs()
+        cells = [(n, k, self.sample_size) for n in self.pc_list for k in self.k_range]
+        if self.workers <= 1:
+            _init_worker(pcs)
+            results = [_score_cell(cell) for cell in cells]
+        else:
+            # spawn: forking a threaded web worker can deadlock the child
+            with ProcessPoolExecutor(max_workers=self.workers, mp_context=multiprocessing.get_context("spawn"),
+                                     initializer=_init_worker, initargs=(pcs,)) as pool:
+                results = list(pool.map(_score_cell, cells))
+        grid = pd.DataFrame(index=self.pc_list, columns=self.k_range, dtype=float)
+        for n, k, score in results:
+            grid.loc[n, k] = score
+        return grid
+
+    def run(self) -> dict:
+        """
+        Score the grid and pick the best cell by exact silhouette among the finalists
+
+        Returns:
+            dict with grid (sampled scores), finalists ({(n, k): exact score}),
+            best_n_components, best_k, best_silhouette and explained_variance
+        """
+        grid = self.grid()
+        scores = grid.stack().dropna().sort_values(ascending=False, kind="mergesort")
+        finalists = {}
+        for (n, k), sampled in scores.head(self.finalists).items():
+            if self.sample_size is None or len(self.X) <= self.sample_size:
+                finalists[(n, k)] = sampled
+                continue
+            X = self.pcs()[:, :n]
+            finalists[(n, k)] = silhouette(X, make_kmeans(k, len(X)).fit_predict(X))
+        (best_n, best_k), best = max(finalists.items(), key=lambda item: item[1])
+        return {
+            "grid": grid,
+            "finalists": finalists,
+            "best_n_components": int(best_n),
+            "best_k": int(best_k),
+            "best_silhouette": float(best),
+            "explained_variance": self.explained_variance(),
+        }
+
+    def fit_final(self, n_components: int, k: int):
+        """Return (pca, kmeans, labels, silhouette) of the final model, fit like the notebook"""
+        pca = PCA(n_components=n_components, random_state=RANDOM_STATE).fit(self.X_scaled)
+        X_pca = pca.transform(self.X_scaled)
+        kmeans = KMeans(n_clusters=k, random_state=RANDOM_STATE, n_init=N_INIT, max_iter=MAX_ITER)
+        labels = kmeans.fit_predict(X_pca)
+        return pca, kmeans, labels, silhouette(X_pca, labels)
+
+
+def save_clustering(registry, scaler, pca, kmeans):
+    """Write kmeans.pkl and the scaler/PCA it depends on; returns the written paths"""
+    paths = []
+    for name, model in (("kmeans_scaler", scaler), ("kmeans_pca", pca), ("kmeans", kmeans)):
+        path = registry.path(name)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            pickle.dump(model, f)
+        os.replace(tmp_path, path)
+        paths.append(path)
+    logger.info(f"Saved clustering models to {paths}")
+    return paths
+
+
+def main():
+    from model_registry import ModelRegistry
+
+    parser = argparse.ArgumentParser(description="Select and save the customer clustering model")
+    parser.add_argument("--data", default=XLINEAR_FILE, help="Clustering input CSV")
+    parser.add_argument("--workers", type=int, default=None, help="Grid search processes")
+    parser.add_argument("--sample-size", type=int, default=SAMPLE_SIZE, help="Rows per sampled silhouette")
+    parser.add_argument("--n-components", type=int, default=None, help="Skip the search and use this PCA size")
+    parser.add_argument("--k", type=int, default=None, help="Skip the search and use this cluster count")
+    parser.add_argument("--save", action="store_true", help="Write kmeans.pkl, kmeans_scaler.pkl and kmeans_pca.pkl")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+
+    search = ClusteringSearch(load_clustering_matrix(args.data), sample_size=args.sample_size, workers=args.workers)
+    n_components, k = args.n_components, args.k
+    if n_components is None or k is None:
+        result = search.run()
+        print(result["grid"].round(3).to_string())
+        print(f"Finalists (exact silhouette): {result['finalists']}")
+        print(f"Best: n_components={result['best_n_components']} | k={result['best_k']} "
+              f"| silhouette={result['best_silhouette']:.4f}")
+        n_components = n_components or result["best_n_components"]
+        k = k or result["best_k"]
+
+    pca, kmeans, labels, score = search.fit_final(n_components, k)
+    print(f"Final clustering: k={k} | n_components={n_components} | silhouette={score:.4f}")
+    if args.save:
+        # Cluster ids may be permuted by a refit; check the cluster -> segment
+        # name mapping of the dashboards before deploying a new model
+        save_clustering(ModelRegistry(), search.scaler, pca, kmeans)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""
+Typed binary cache for the CSVs under data/
+Each CSV is parsed once into a DataFrame with categorical and datetime
+columns and stored as a pickle next to the data; later loads skip CSV parsing
+until the source file's size or mtime changes
+"""
+
+import os
+import pickle
+import threading
+import logging
+
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+DATA_PATH = "data"
+DASHBOARD_PATH = "data/dashboards"
+CACHE_DIR = f"{DATA_PATH}/.cache/frames"
+
+CATEGORICAL_COLUMNS = (
+    "category", "region", "segment", "sentiment",
+    "gender", "segment_name", "sentiment_category",
+)
+DATE_COLUMNS = ("sale_date", "last_purchase_date", "date")
+
+
+def _signature(path):
+    st = os.stat(path)
+    return (st.st_size, st.st_mtime_ns)
+
+
+def cache_path(path: str) -> str:
+    rel = os.path.relpath(os.path.abspath(path), os.path.abspath(DATA_PATH))
+    return os.path.join(CACHE_DIR, rel.replace(os.sep, "__") + ".pkl")
+
+
+def parse_csv(path: str) -> pd.DataFrame:
+    """Parse a CSV and apply the shared dtype conventions"""
+    df = pd.read_csv(path)
+    for col in DATE_COLUMNS:
+        if col in df.columns:
+            df[col] = pd.to_datetime(df[col])
+    for col in CATEGORICAL_COLUMNS:
+        if col in df.columns:
+            df[col] = df[col].astype("category")
+    return df
+
+
+def load_frame(path: str, columns=None) -> pd.DataFrame:
+    """
+    Load a data/ CSV through the typed cache
+
+    Args:
+        path: Path of the source CSV
+        columns: Optional subset of columns to return
+
+    Returns:
+        DataFrame with categorical/datetime columns converted
+    """
+    signature = _signature(path)
+    cached = cache_path(path)
+    df = None
+    try:
+        with open(cached, 'rb') as f:
+            cached_signature, cached_df = pickle.load(f)
+        if cached_signature == signature:
+            df = cached_df
+    except (OSError, EOFError, pickle.UnpicklingError, AttributeError, ImportError):
+        pass
+    if df is None:
+        df = parse_csv(path)
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        tmp = f"{cached}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp, 'wb') as f:
+            pickle.dump((signature, df), f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, cached)
+        logger.info(f"Refreshed data cache for {path}")
+    if columns is not None:
+        df = df[list(columns)]
+    return df
+
+
+def build_all():
+    """Refresh the cache for every CSV under data/ and data/dashboards/"""
+    for folder in (DATA_PATH, DASHBOARD_PATH):
+        for name in sorted(os.listdir(folder)):
+            if name.endswith(".csv"):
+                load_frame(os.path.join(folder, name))
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    build_all()
@@ -0,0 +1,186 @@
+"""
+Per-model feature schemas
+Turns named (record or columnar) or positional JSON features into a
+contiguous float64 matrix in the exact column order each model was trained on,
+and rejects malformed input before it reaches sklearn
+"""
+
+import numpy as np
+
+# Column order of customer_snapshot_ml.csv without customer_id / churn,
+# i.e. the training columns of notebooks/churn_prediction.ipynb
+CHURN_FEATURES = (
+    "orders", "tenure_days", "recency_days", "monetary_sum", "monetary_median",
+    "monetary_max", "avg_quantity", "max_quantity", "avg_price",
+    "dow_1_rate", "dow_2_rate", "dow_3_rate", "dow_4_rate", "dow_5_rate", "dow_6_rate",
+    "unique_categories", "unique_products", "top_category_share",
+    "sent_pos", "sent_neg", "sent_neu", "neg_rate", "recent_neg_flag",
+    "feedback_count", "feedback_rate", "age_latest", "high_ticket_rate",
+    "aov", "orders_per_30d", "monetary_per_30d",
+    "gender_Male", "region_North", "region_South", "region_West",
+    "top_category_Furniture", "top_category_Office Supplies",
+    "last_sentiment_Neutral", "last_sentiment_Positive",
+)
+
+# feature_cols of notebooks/sales_forecasting.ipynb
+LINREG_FEATURES = (
+    "month", "quarter", "month_sin", "month_cos", "time_trend",
+    "customers_lag1", "customers_lag2", "quantity_lag1", "price_lag1",
+    "customers_ma3", "quantity_ma3",
+    "customer_growth", "quantity_growth",
+    "customer_id_nunique", "product_id_nunique", "quantity_sum", "quantity_mean", "price_mean", "age_mean",
+    "customers_x_price", "quantity_x_price",
+)
+
+# Numeric columns of customer_snapshot_Xlinear.csv, the inputs of the
+# StandardScaler -> PCA front end of notebooks/clustering.ipynb
+XLINEAR_FEATURES = tuple(
+    name for name in CHURN_FEATURES
+    if name not in ("monetary_median", "monetary_max", "max_quantity", "avg_price",
+                    "unique_categories", "unique_products", "aov")
+)
+
+KMEANS_FEATURES = ("pc1", "pc2")
+
+MODEL_FEATURES = {
+    "logreg": CHURN_FEATURES,
+    "svm": CHURN_FEATURES,
+    "dt": CHURN_FEATURES,
+    "rf": CHURN_FEATURES,
+    "linreg": LINREG_FEATURES,
+    "kmeans": KMEANS_FEATURES,
+}
+
+
+class FeatureValidationError(ValueError):
+    """Raised when request features don't match a model's schema"""
+
+
+class FeatureSchema:
+    """Ordered feature names of one model plus a precompiled name -> column map"""
+
+    def __init__(self, names, allow_nan: bool = False):
+        """
+        Args:
+            names: Feature names in training column order
+            allow_nan: Accept NaN/inf values (for models that impute them)
+        """
+        self.names = tuple(names)
+        self.index = {name: i for i, name in enumerate(self.names)}
+        self.allow_nan = allow_nan
+        self._names_set = frozenset(self.names)
+
+    def __len__(self):
+        return len(self.names)
+
+    def to_matrix(self, features):
+        """
+        Convert request features into a (rows, len(schema)) float64 matrix
+
+        Accepted shapes:
+            - positional vector: [v0, v1, ...]
+            - positional rows: [[v0, v1, ...], ...]
+            - one record: {"orders": 2, "tenure_days": 41, ...}
+            - records: [{"orders": 2, ...}, {"orders": 4, ...}]
+            - columnar: {"orders": [2, 4], "tenure_days": [41, 439], ...}
+
+        Returns:
+            (matrix, single) where single is True for one vector or record
+
+        Raises:
+            FeatureValidationError: on missing/unknown names, wrong lengths or
+                non-numeric values
+        """
+        if isinstance(features, dict):
+            if features and all(isinstance(v, list) for v in features.values()):
+                return self._from_columns(features), False
+            return self._from_records([features]), True
+        if isinstance(features, list) and features:
+            if all(isinstance(row, dict) for row in features):
+                return self._from_records(features), False
+            return self._from_positional(features)
+        raise FeatureValidationError(
+            "'features' must be a non-empty list of values, list of rows, record dict or columnar dict."
+        )
+
+    def _check_names(self, names):
+        names = set(names)
+        if names == self._names_set:
+            return
+        missing = [n for n in self.names if n not in names]
+        unknown = sorted(names - self._names_set)
+        parts = []
+        if missing:
+            parts.append(f"missing features {missing}")
+        if unknown:
+            parts.append(f"unknown features {unknown}")
+        raise FeatureValidationError("Invalid features: " + "; ".join(parts))
+
+    def _finish(self, matrix):
+        if not self.allow_nan and not np.isfinite(matrix).all():
+            raise FeatureValidationError("Features must be finite numbers.")
+        return matrix
+
+    def _from_positional(self, features):
+        try:
+            matrix = np.asarray(features, dtype=np.float64)
+        except (TypeError, ValueError) as e:
+            raise FeatureValidationError(f"Features must be numeric rows of equal length: {e}")
+        single = matrix.ndim == 1
+        if single:
+            matrix = matrix.reshape(1, -1)
+        if matrix.ndim != 2 or matrix.shape[1] != len(self.names):
+            raise FeatureValidationError(
+                f"Expected {len(self.names)} features per row in this order: {list(self.names)}"
+            )
+        return self._finish(matrix), single
+
+    def _from_records(self, records):
+        seen = set()
+        for record in records:
+            keys = frozenset(record)
+            if keys not in seen:
+                self._check_names(keys)
+                seen.add(keys)
+        try:
+            matrix = np.array([[record[n] for n in self.names] for record in records], dtype=np.float64)
+        except (TypeError, ValueError) as e:
+            raise FeatureValidationError(f"Feature values must be numeric: {e}")
+        return self._finish(matrix)
+
+    def _from_columns(self, columns):
+        self._check_names(columns)
+        n_rows = len(next(iter(columns.values())))
+        if n_rows == 0 or any(len(col) != n_rows for col in columns.values()):
+            raise FeatureValidationError("Columnar features must be non-empty lists of equal length.")
+        matrix = np.empty((n_rows, len(self.names)), dtype=np.float64)
+        try:
+            for name, col in columns.items():
+                matrix[:, self.index[name]] = col
+        except (TypeError, ValueError) as e:
+            raise FeatureValidationError(f"Feature values must be numeric: {e}")
+        return self._finish(matrix)
+
+
+_schemas = {}
+
+
+def schema_for(model_type: str, model=None, allow_nan: bool = False, version=None) -> FeatureSchema:
+    """
+    Return the (cached) schema of a model
+
+    Names come from the fitted model's feature_names_in_ when it has them,
+    otherwise from MODEL_FEATURES. allow_nan is for models served with
+    preprocessing that fills missing values. The schema is rebuilt when
+    version (the registry's model file version) changes, so a retrained
+    model with other columns isn't validated against the old ones.
+    """
+    key = (model_type, allow_nan)
+    entry = _schemas.get(key)
+    if entry is None or entry[0] != version:
+        names = getattr(model, "feature_names_in_", None)
+        if names is None:
+            names = MODEL_FEATURES[model_type]
+        entry = (version, FeatureSchema(names, allow_nan=allow_nan))
+        _schemas[key] = entry
+    return entry[1]
@@ -0,0 +1,103 @@
+"""
+In-memory customer feature store
+Holds the engineered per-customer features of the snapshot files as one
+contiguous float64 matrix plus a customer_id -> row index, so customers can
+be scored by id without the caller sending their feature vectors
+"""
+
+import os
+import threading
+import time
+import logging
+
+import numpy as np
+from data_cache import load_frame
+from feature_schema import CHURN_FEATURES
+
+logger = logging.getLogger(__name__)
+
+DATA_PATH = "data"
+FEATURES_FILE = f"{DATA_PATH}/customer_snapshot_ml.csv"
+SEGMENTS_FILE = f"{DATA_PATH}/customer_snapshot_with_named_segments.csv"
+
+
+class StoreSnapshot:
+    """Immutable view of the store; replaced as a whole on reload"""
+
+    def __init__(self, ids, features, clusters, segments, version):
+        self.ids = ids
+        self.index = {cid: i for i, cid in enumerate(ids)}
+        self.features = features
+        self.clusters = clusters
+        self.segments = segments
+        self.version = version
+        self.loaded_at = time.time()
+
+    def __len__(self):
+        return len(self.ids)
+
+
+class FeatureStore:
+    """Array-backed lookup of customer features, cluster and segment name"""
+
+    def __init__(self, features_file: str = FEATURES_FILE, segments_file: str = SEGMENTS_FILE,
+                 feature_names=CHURN_FEATURES):
+        self.features_file = features_file
+        self.segments_file = segments_file
+        self.feature_names = tuple(feature_names)
+        self._snapshot = None
+        self._lock = threading.Lock()
+
+    @property
+    def snapshot(self) -> StoreSnapshot:
+        snapshot = self._snapshot
+        if snapshot is None:
+            with self._lock:
+                if self._snapshot is None:
+                    self._snapshot = self._build()
+                snapshot = self._snapshot
+        return snapshot
+
+    def reload(self) -> StoreSnapshot:
+        """Rebuild from the snapshot files and swap it in atomically"""
+        with self._lock:
+            snapshot = self._build()
+            self._snapshot = snapshot
+        return snapshot
+
+    def _version(self):
+        return tuple(os.stat(p).st_mtime_ns for p in (self.features_file, self.segments_file))
+
+    def _build(self) -> StoreSnapshot:
+        start = time.perf_counter()
+        version = self._version()
+        snap = load_frame(self.features_file, columns=["customer_id", *self.feature_names])
+        segments = load_frame(self.segments_file, columns=["customer_id", "cluster", "segment_name"])
+        segments = segments.set_index("customer_id").reindex(snap["customer_id"])
+
+        ids = snap["customer_id"].to_numpy(dtype=object)
+        features = np.ascontiguousarray(snap[list(self.feature_names)].to_numpy(dtype=np.float64))
+        clusters = segments["cluster"].fillna(-1).to_numpy(dtype=np.int64)
+        names = segments["segment_name"].astype(object).where(segments["segment_name"].notna(), None).to_numpy()
+        result = StoreSnapshot(ids, features, clusters, names, version)
+        logger.info(f"Feature store loaded {len(result)} customers in {time.perf_counter() - start:.3f}s")
+        return result
+
+    def lookup(self, customer_ids):
+        """
+        Resolve customer ids to rows of the current snapshot
+
+        Returns:
+            (snapshot, rows, found_ids, missing_ids); rows index snapshot arrays
+        """
+        snapshot = self.snapshot
+        index = snapshot.index
+        rows, found, missing = [], [], []
+        for cid in customer_ids:
+            row = index.get(cid)
+            if row is None:
+                missing.append(cid)
+            else:
+                rows.append(row)
+                found.append(cid)
+        return snapshot, np.asarray(rows, dtype=np.int64), found, missing
@@ -0,0 +1,228 @@
+"""
+Server-side monthly sales forecasting with the linreg model
+Builds the engineer_forecasting_features columns of
+notebooks/sales_forecasting.ipynb from the transaction data, applies the
+StandardScaler the model was trained with and forecasts recursively: every
+predicted month's driver values are rolled into the lag/moving-average window
+used for the next month
+"""
+
+import os
+import pickle
+import threading
+import time
+import logging
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+from sklearn.preprocessing import StandardScaler
+
+from aggregation import MonthlyAggregate, TRANSACTION_COLUMNS
+from data_cache import load_frame
+from feature_schema import LINREG_FEATURES
+
+logger = logging.getLogger(__name__)
+
+TRANSACTIONS_FILE = "data/customer_intelligence_dataset.csv"
+TARGET = "total_value_sum"
+# Monthly aggregates the engineered features are derived from
+DRIVERS = ("customer_id_nunique", "product_id_nunique", "quantity_sum", "quantity_mean", "price_mean", "age_mean")
+WINDOW = 3
+TRAIN_FRACTION = 0.8
+MAX_HORIZON = 60
+
+
+def create_time_series_features(df, approx_distinct=False):
+    """Monthly aggregates of the transactions (create_time_series_features in the notebook)"""
+    return MonthlyAggregate(approx_distinct).update(df).table()
+
+
+def engineer_forecasting_features(monthly):
+    """Lag, moving-average, growth and calendar features; rows without a full window are dropped"""
+    df = monthly.copy()
+    customers, quantity, price = df["customer_id_nunique"], df["quantity_sum"], df["price_mean"]
+    df["month"] = df["date"].dt.month
+    df["quarter"] = df["date"].dt.quarter
+    df["year"] = df["date"].dt.year
+    df["month_sin"] = np.sin(2 * np.pi * df["month"] / 12)
+    df["month_cos"] = np.cos(2 * np.pi * df["month"] / 12)
+    df["customers_lag1"] = customers.shift(1)
+    df["customers_lag2"] = customers.shift(2)
+    df["quantity_lag1"] = quantity.shift(1)
+    df["price_lag1"] = price.shift(1)
+    df["customers_ma3"] = customers.rolling(window=WINDOW).mean()
+    df["quantity_ma3"] = quantity.rolling(window=WINDOW).mean()
+    df["customer_growth"] = customers.pct_change()
+    df["quantity_growth"] = quantity.pct_change()
+    df["customers_x_price"] = customers * price
+    df["quantity_x_price"] = quantity * price
+    df["time_trend"] = np.arange(len(df))
+    return df.dropna()
+
+
+def fit_scaler(features):
+    """Refit the training-split StandardScaler of the notebook (first 80% of engineered months)"""
+    split_idx = int(len(features) * TRAIN_FRACTION)
+    return StandardScaler().fit(features[list(LINREG_FEATURES)].iloc[:split_idx].to_numpy(dtype=np.float64))
+
+
+def step_features(window, drivers, date, time_trend):
+    """
+    Feature row for one future month
+
+    Args:
+        window: (WINDOW, len(DRIVERS)) driver values of the preceding months, oldest first
+        drivers: Driver values projected for this month
+        date: First day of the month
+        time_trend: Position of the month in the monthly series
+    """
+    d = dict(zip(DRIVERS, drivers))
+    prev = dict(zip(DRIVERS, window[-1]))
+    customers = np.array([window[-2][0], window[-1][0], d["customer_id_nunique"]])
+    quantity = np.array([window[-2][2], window[-1][2], d["quantity_sum"]])
+    row = {
+        "month": date.month,
+        "quarter": date.quarter,
+        "month_sin": np.sin(2 * np.pi * date.month / 12),
+        "month_cos": np.cos(2 * np.pi * date.month / 12),
+        "time_trend": time_trend,
+        "customers_lag1": prev["customer_id_nunique"],
+        "customers_lag2": window[-2][0],
+        "quantity_lag1": prev["quantity_sum"],
+        "price_lag1": prev["price_mean"],
+        "customers_ma3": customers.mean(),
+        "quantity_ma3": quantity.mean(),
+        "customer_growth": d["customer_id_nunique"] / prev["customer_id_nunique"] - 1,
+        "quantity_growth": d["quantity_sum"] / prev["quantity_sum"] - 1,
+        "customers_x_price": d["customer_id_nunique"] * d["price_mean"],
+        "quantity_x_price": d["quantity_sum"] * d["price_mean"],
+        **d,
+    }
+    return np.array([row[name] for name in LINREG_FEATURES], dtype=np.float64)
+
+
+class SalesForecaster:
+    """Recursive multi-step forecaster with a per-(horizon, data version) result cache"""
+
+    def __init__(self, registry, data_file: str = TRANSACTIONS_FILE, cache_size: int = 32):
+        """
+        Args:
+            registry: ModelRegistry serving "linreg" and "linreg_scaler"
+            data_file: Transactions CSV the monthly series is built from
+            cache_size: Forecasts kept before the least recently used is dropped
+        """
+        self.registry = registry
+        self.data_file = data_file
+        self.cache_size = cache_size
+        self._history = None
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _data_version(self):
+        st = os.stat(self.data_file)
+        return (st.st_size, st.st_mtime_ns)
+
+    def history(self):
+        """(data version, monthly aggregates, engineered features), rebuilt when the data file changes"""
+        version = self._data_version()
+        history = self._history
+        if history is None or history[0] != version:
+            monthly = create_time_series_features(load_frame(self.data_file, columns=TRANSACTION_COLUMNS))
+            history = (version, monthly, engineer_forecasting_features(monthly))
+            self._history = history
+        return history
+
+    def scaler(self):
+        """
+        Return (version, scaler) of linreg_scaler.pkl, written offline by save_scaler
+
+        Raises:
+            ModelNotAvailable: if the scaler is missing or empty
+        """
+        return self.registry.get_versioned("linreg_scaler")
+
+    def transform(self, data_np):
+        """Scale raw linreg feature rows the way the model was trained"""
+        return self.scaler()[1].transform(data_np)
+
+    def forecast(self, horizon: int) -> dict:
+        """
+        Forecast total monthly sales for the next horizon months
+
+        Raises:
+            ModelNotAvailable: if the linreg model or its scaler can't be loaded
+        """
+        data_version, monthly, _ = self.history()
+        model_version, model = self.registry.get_versioned("linreg")
+        scaler_version, scaler = self.scaler()
+        key = (horizon, data_version, model_version, scaler_version)
+        with self._lock:
+            cached = self._cache.get(key)
+            if cached is not None:
+                self._cache.move_to_end(key)
+                self.hits += 1
+                return {**cached, "cached": True}
+            self.misses += 1
+
+        start = time.perf_counter()
+        window = monthly[list(DRIVERS)].tail(WINDOW).to_numpy(dtype=np.float64)
+        last_date = monthly["date"].iloc[-1]
+        next_trend = len(monthly)
+        rows = []
+        for step in range(horizon):
+            date = last_date + pd.DateOffset(months=step + 1)
+            # Drivers are projected as the mean of the rolling window, which
+            # then slides forward over the projection
+            drivers = window.mean(axis=0)
+            x = step_features(window, drivers, date, next_trend + step)
+            prediction = float(model.predict(scaler.transform(x.reshape(1, -1)))[0])
+            rows.append({
+                "date": str(date.date()),
+                "period": step + 1,
+                "predicted_sales": max(prediction, 0.0),
+            })
+            window = np.vstack([window[1:], drivers])
+
+        result = {
+            "horizon": horizon,
+            "last_actual_month": str(last_date.date()),
+            "last_actual_sales": float(monthly[TARGET].iloc[-1]),
+            "forecast": rows,
+            "total_predicted_sales": sum(r["predicted_sales"] for r in rows),
+            "compute_seconds": time.perf_counter() - start,
+        }
+        with self._lock:
+            self._cache[key] = result
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return {**result, "cached": False}
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"entries": len(self._cache), "hits": self.hits, "misses": self.misses}
+
+
+def save_scaler(registry, data_file: str = TRANSACTIONS_FILE):
+    """
+    Refit the notebook's training-split scaler from the transactions and save it as linreg_scaler.pkl
+
+    Returns:
+        The written path
+    """
+    monthly = create_time_series_features(load_frame(data_file, columns=TRANSACTION_COLUMNS))
+    path = registry.path("linreg_scaler")
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'wb') as f:
+        pickle.dump(fit_scaler(engineer_forecasting_features(monthly)), f)
+    os.replace(tmp_path, path)
+    logger.info(f"Saved forecast scaler to {path}")
+    return path
+
+
+if __name__ == "__main__":
+    from model_registry import ModelRegistry
+    logging.basicConfig(level=logging.INFO)
+    save_scaler(ModelRegistry())
@@ -0,0 +1,83 @@
+"""
+Indexed store of generated insight briefs
+Each brief is a text file under insights/<kind>/<slug>.txt and index.json maps
+"<kind>/<slug>" keys to their metadata, so the API can serve any segment's or
+customer's brief by key instead of one monolithic insights file
+"""
+
+import os
+import re
+import json
+import time
+import threading
+
+INSIGHTS_DIR = "insights"
+
+
+def slugify(name: str) -> str:
+    """Stable, URL-safe key part for a segment name or customer id"""
+    return re.sub(r'[^a-z0-9]+', '-', str(name).lower()).strip('-')
+
+
+class InsightsStore:
+    """File-backed brief store shared by all gunicorn workers"""
+
+    def __init__(self, root: str = INSIGHTS_DIR):
+        self.root = root
+        self.index_path = os.path.join(root, "index.json")
+        self._lock = threading.Lock()
+
+    def key(self, kind: str, name: str) -> str:
+        return f"{slugify(kind)}/{slugify(name)}"
+
+    def _write_atomic(self, path, text):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(text)
+        os.replace(tmp_path, path)
+
+    def index(self) -> dict:
+        """Return {key: metadata} for every stored brief"""
+        try:
+            with open(self.index_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def put_many(self, briefs):
+        """
+        Store briefs and update the index once
+
+        Args:
+            briefs: Iterable of dicts with kind, name, title and text; any other
+                keys are kept as metadata
+
+        Returns:
+            List of the stored keys
+        """
+        entries = {}
+        for brief in briefs:
+            brief = dict(brief)
+            text = brief.pop("text")
+            key = self.key(brief["kind"], brief["name"])
+            path = os.path.join(self.root, f"{key}.txt")
+            self._write_atomic(path, f"{brief['title']}\n{'=' * 50}\n\n{text}")
+            entries[key] = {**brief, "path": path, "chars": len(text), "generated_at": time.time()}
+        with self._lock:
+            index = self.index()
+            index.update(entries)
+            self._write_atomic(self.index_path, json.dumps(index, indent=2, default=str))
+        return list(entries)
+
+    def get(self, kind: str, name: str):
+        """Return (metadata, brief text) for a key, or None if it was never generated"""
+        key = self.key(kind, name)
+        meta = self.index().get(key)
+        if meta is None:
+            return None
+        try:
+            with open(meta["path"], 'r', encoding='utf-8') as f:
+                return {**meta, "key": key}, f.read()
+        except OSError:
+            return None
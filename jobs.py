@@ -0,0 +1,254 @@
+"""
+Background job queue for insights and audio generation
+Work runs on a small thread pool so web workers return immediately. Job
+records are JSON files shared by all gunicorn workers, and a lock file per
+input key makes concurrent requests for the same work share one job. The
+process owning a job refreshes its lock file while the job is queued or
+running, so a job whose worker died stops absorbing new requests
+"""
+
+import os
+import json
+import time
+import uuid
+import socket
+import hashlib
+import threading
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+JOBS_DIR = ".jobs"
+
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+
+
+class JobQueue:
+    """Single-flight job queue with file-backed status records"""
+
+    def __init__(self, jobs_dir: str = JOBS_DIR, max_workers: int = 2,
+                 heartbeat_interval: float = 10.0, heartbeat_timeout: float = 60.0):
+        """
+        Args:
+            jobs_dir: Directory for job records and single-flight locks
+            max_workers: Jobs allowed to run at the same time in this process
+            heartbeat_interval: Seconds between refreshes of the locks this
+                process owns
+            heartbeat_timeout: Lock age after which an unfinished job is
+                considered abandoned even if its owner pid still exists
+        """
+        self.jobs_dir = jobs_dir
+        self.heartbeat_interval = heartbeat_interval
+        self.heartbeat_timeout = heartbeat_timeout
+        self.host = socket.gethostname()
+        self.handlers = {}
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="jobs")
+        self._lock = threading.Lock()
+        self._owned = {}
+        self._heartbeat = None
+        os.makedirs(jobs_dir, exist_ok=True)
+
+    def register(self, kind: str, handler):
+        """Register handler(**params) -> JSON-serializable result for a job kind"""
+        self.handlers[kind] = handler
+
+    def _record_path(self, job_id):
+        return os.path.join(self.jobs_dir, f"{job_id}.json")
+
+    def _lock_path(self, key):
+        return os.path.join(self.jobs_dir, f"{key}.lock")
+
+    def _write(self, job):
+        path = self._record_path(job["id"])
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(job, f)
+        os.replace(tmp_path, path)
+
+    def get(self, job_id: str):
+        """Return the job record, or None for an unknown id"""
+        if not job_id or not all(c in "0123456789abcdef" for c in job_id):
+            return None
+        try:
+            with open(self._record_path(job_id), 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _owner_alive(self, job):
+        # A pid can only be checked on the host that owns it; elsewhere the
+        # heartbeat age alone decides
+        pid = job.get("owner_pid")
+        if pid is None or job.get("owner_host") != self.host:
+            return True
+        try:
+            os.kill(pid, 0)
+        except ProcessLookupError:
+            return False
+        except PermissionError:
+            pass
+        return True
+
+    def _abandon(self, job, reason):
+        logger.warning(f"{job['kind']} job {job['id']} abandoned: {reason}")
+        self._write(dict(job, status=FAILED, error=f"Abandoned: {reason}", finished_at=time.time()))
+
+    def _active_job(self, lock_path):
+        try:
+            with open(lock_path, 'r', encoding='utf-8') as f:
+                job_id = f.read().strip()
+            age = time.time() - os.path.getmtime(lock_path)
+        except OSError:
+            return None
+        job = self.get(job_id)
+        if job is not None and job["status"] in (QUEUED, RUNNING):
+            if not self._owner_alive(job):
+                self._abandon(job, f"owner process {job['owner_pid']} exited")
+            elif age >= self.heartbeat_timeout:
+                self._abandon(job, f"no heartbeat for {age:.0f}s")
+            else:
+                return job
+        try:
+            os.remove(lock_path)
+        except OSError:
+            pass
+        return None
+
+    def _heartbeat_loop(self):
+        while True:
+            time.sleep(self.heartbeat_interval)
+            with self._lock:
+                owned = list(self._owned.items())
+            for key, job_id in owned:
+                try:
+                    os.utime(self._lock_path(key))
+                except OSError:
+                    pass
+
+    def _acquire(self, kind, params):
+        # Returns (job, created); a created job owns the key's lock and still
+        # has to be run by the caller
+        if kind not in self.handlers:
+            raise ValueError(f"Unknown job kind: {kind}")
+        params = params or {}
+        key = hashlib.sha256(json.dumps({"kind": kind, "params": params}, sort_keys=True).encode()).hexdigest()[:24]
+        lock_path = self._lock_path(key)
+        with self._lock:
+            if self._heartbeat is None:
+                # Started lazily so it runs in the process that owns the jobs
+                self._heartbeat = threading.Thread(target=self._heartbeat_loop, name="jobs-heartbeat", daemon=True)
+                self._heartbeat.start()
+            for _ in range(3):
+                job = {
+                    "id": uuid.uuid4().hex,
+                    "kind": kind,
+                    "params": params,
+                    "key": key,
+                    "status": QUEUED,
+                    "owner_pid": os.getpid(),
+                    "owner_host": self.host,
+                    "created_at": time.time(),
+                    "started_at": None,
+                    "finished_at": None,
+                    "result": None,
+                    "error": None,
+                }
+                self._write(job)
+                # Publish the lock with its owner already inside: link() fails
+                # if another request holds it, so readers never see it empty
+                tmp_lock = f"{lock_path}.{job['id']}.tmp"
+                with open(tmp_lock, 'w', encoding='utf-8') as f:
+                    f.write(job["id"])
+                try:
+                    os.link(tmp_lock, lock_path)
+                except FileExistsError:
+                    os.remove(self._record_path(job["id"]))
+                    active = self._active_job(lock_path)
+                    if active is not None:
+                        return active, False
+                    continue
+                finally:
+                    os.remove(tmp_lock)
+                self._owned[key] = job["id"]
+                return job, True
+        raise RuntimeError(f"Could not acquire job lock for {kind}")
+
+    def submit(self, kind: str, params: dict = None, **handler_kwargs):
+        """
+        Enqueue a job unless an identical one is already queued or running
+
+        Args:
+            kind: Registered job kind
+            params: JSON-serializable handler arguments; they identify the job
+            handler_kwargs: Extra handler arguments that are not part of the
+                job's identity (e.g. callbacks), used only if this call
+                creates the job
+
+        Returns:
+            (job record, created) where created is False for a deduplicated request
+        """
+        job, created = self._acquire(kind, params)
+        if created:
+            self._executor.submit(self._run, job, handler_kwargs)
+            logger.info(f"Queued {kind} job {job['id']}")
+        return job, created
+
+    def run(self, kind: str, params: dict = None, poll_interval: float = 0.5):
+        """
+        Run a job in the calling thread, or wait for an identical one already in flight
+
+        Used by job handlers that depend on another kind of job: running it
+        inline can't starve the thread pool the way queueing and waiting could.
+
+        Returns:
+            The finished job record (status SUCCEEDED or FAILED)
+        """
+        job, created = self._acquire(kind, params)
+        if created:
+            return self._run(job)
+        return self.wait(job["id"], poll_interval)
+
+    def wait(self, job_id: str, poll_interval: float = 0.5):
+        """Block until a job finishes or is found abandoned; returns its final record"""
+        while True:
+            job = self.get(job_id)
+            if job is None:
+                raise LookupError(f"Unknown job: {job_id}")
+            if job["status"] in (SUCCEEDED, FAILED):
+                return job
+            active = self._active_job(self._lock_path(job["key"]))
+            if active is None or active["id"] != job_id:
+                # Finished or abandoned between the two reads
+                return self.get(job_id)
+            time.sleep(poll_interval)
+
+    def _run(self, job, handler_kwargs=None):
+        job = dict(job, status=RUNNING, started_at=time.time())
+        self._write(job)
+        try:
+            job["result"] = self.handlers[job["kind"]](**job["params"], **(handler_kwargs or {}))
+            job["status"] = SUCCEEDED
+            logger.info(f"{job['kind']} job {job['id']} succeeded")
+        except Exception as e:
+            job["status"] = FAILED
+            job["error"] = str(e)
+            logger.error(f"{job['kind']} job {job['id']} failed: {str(e)}")
+        finally:
+            job["finished_at"] = time.time()
+            self._write(job)
+            with self._lock:
+                if self._owned.get(job["key"]) == job["id"]:
+                    del self._owned[job["key"]]
+            lock_path = self._lock_path(job["key"])
+            try:
+                with open(lock_path, 'r', encoding='utf-8') as f:
+                    owner = f.read().strip()
+                if owner == job["id"]:
+                    os.remove(lock_path)
+            except OSError:
+                pass
+        return job
@@ -1,60 +1,220 @@
 import pandas as pd
 import requests
 import json
+import os
+import sys
+import time
+import hashlib
+import random
+import threading
+import logging
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextlib import contextmanager
+import pickle
 from pathlib import Path
+from data_cache import load_frame
+from aggregation import month_keys
+from insights_store import InsightsStore
+
+logger = logging.getLogger(__name__)
 
 OLLAMA_URL = "http://localhost:11434"
 DATA_PATH = "data"
 DASHBOARD_PATH = "data/dashboards"
-
-print("Starting Customer Intelligence Analysis...")
-
-def load_and_sample_data():
-    """Load data and create manageable summaries for LLM"""
-
-    original_data = pd.read_csv(f"{DATA_PATH}/customer_intelligence_dataset.csv")
-    print(f"Original dataset: {len(original_data)} rows")
-
-    churn_data = pd.read_csv(f"{DASHBOARD_PATH}/churn_dashboard.csv")
-    segments_data = pd.read_csv(f"{DASHBOARD_PATH}/customer_segment_dashboard.csv")
-    sales_forecast = pd.read_csv(f"{DASHBOARD_PATH}/sales_forecast_future_2024_2025.csv")
-
-    print(f"Loaded all data files")
-    return original_data, churn_data, segments_data, sales_forecast
+INSIGHTS_FILE = "customer_insights_mistral.txt"
+STATE_FILE = f"{DATA_PATH}/.cache/insights_state.pkl"
+LLM_CACHE_DIR = f"{DATA_PATH}/.cache/llm"
+LLM_MODEL = "mistral:7b"
+LLM_OPTIONS = {"temperature": 0.3, "num_predict": 1500}
+
+SALES_COLUMNS = ["sale_date", "category", "product_name", "price", "quantity"]
+CHUNK_SIZE = 100_000
+
+CUSTOMERS_FILE = f"{DATA_PATH}/customer_snapshot_with_named_segments.csv"
+CUSTOMER_BRIEF_COLUMNS = [
+    "orders", "tenure_days", "recency_days", "monetary_sum", "aov",
+    "neg_rate", "feedback_count", "high_ticket_rate",
+]
+
+
+class SalesSummaryAggregator:
+    """Single-pass, mergeable accumulator behind the sales summary
+
+    Keeps only per-month, per-category and per-product partial sums plus
+    running totals, so memory depends on the number of distinct keys and not
+    on the number of transactions.
+    """
+
+    COMPACT_EVERY = 16
+
+    def __init__(self):
+        self.total_sales = 0
+        self.total_transactions = 0
+        self.min_date = None
+        self.max_date = None
+        self._monthly = []
+        self._category = []
+        self._product = []
+
+    def update(self, chunk):
+        """Fold a DataFrame chunk of transactions into the running totals"""
+        if chunk.empty:
+            return
+        total_value = chunk['price'] * chunk['quantity']
+        sale_date = pd.to_datetime(chunk['sale_date'])
+
+        self.total_sales += total_value.sum()
+        self.total_transactions += len(chunk)
+        lo, hi = sale_date.min(), sale_date.max()
+        self.min_date = lo if self.min_date is None else min(self.min_date, lo)
+        self.max_date = hi if self.max_date is None else max(self.max_date, hi)
+
+        self._monthly.append(total_value.groupby(month_keys(sale_date)).sum())
+        self._category.append(total_value.groupby(chunk['category']).sum())
+        self._product.append(total_value.groupby(chunk['product_name']).sum())
+        if len(self._monthly) >= self.COMPACT_EVERY:
+            self._compact()
+
+    def merge(self, other):
+        """Fold another aggregator's partial results into this one"""
+        self.total_sales += other.total_sales
+        self.total_transactions += other.total_transactions
+        for attr in ("min_date", "max_date"):
+            mine, theirs = getattr(self, attr), getattr(other, attr)
+            if mine is None or (theirs is not None and (theirs < mine if attr == "min_date" else theirs > mine)):
+                setattr(self, attr, theirs)
+        self._monthly.extend(other._monthly)
+        self._category.extend(other._category)
+        self._product.extend(other._product)
+        self._compact()
+
+    def to_state(self):
+        """Plain-dict form for persisting; independent of how this module was imported"""
+        self._compact()
+        return dict(vars(self))
+
+    @classmethod
+    def from_state(cls, state):
+        aggregator = cls()
+        aggregator.__dict__.update(state)
+        return aggregator
+
+    @staticmethod
+    def _combine(partials):
+        return pd.concat(partials).groupby(level=0).sum()
+
+    def _compact(self):
+        for attr in ("_monthly", "_category", "_product"):
+            partials = getattr(self, attr)
+            if len(partials) > 1:
+                setattr(self, attr, [self._combine(partials)])
+
+    def summary(self):
+        """Build the same dict as create_sales_summary over everything seen so far"""
+        self._compact()
+        monthly_sales = self._monthly[0]
+        monthly_sales = monthly_sales.set_axis(pd.PeriodIndex(ordinal=monthly_sales.index, freq='M'))
+        category_sales = self._category[0].sort_values(ascending=False)
+        top_products = self._product[0].sort_values(ascending=False).head(10)
+
+        avg_monthly = monthly_sales.mean()
+        spikes = monthly_sales[monthly_sales > avg_monthly * 1.2]
+
+        return {
+            "total_sales": float(self.total_sales),
+            "total_transactions": self.total_transactions,
+            "avg_transaction_value": float(self.total_sales / self.total_transactions),
+            "date_range": f"{self.min_date.date()} to {self.max_date.date()}",
+            "top_3_categories": category_sales.head(3).to_dict(),
+            "monthly_sales_trend": monthly_sales.tail(12).to_dict(),  # Last 12 months
+            "top_5_products": top_products.head(5).to_dict(),
+            "peak_sales_month": monthly_sales.idxmax().strftime('%Y-%m'),
+            "peak_sales_value": float(monthly_sales.max()),
+            "sales_spikes": {str(k): float(v) for k, v in spikes.to_dict().items()},
+            "avg_monthly_sales": float(avg_monthly),
+            "growth_trend": "increasing" if monthly_sales.iloc[-1] > monthly_sales.iloc[0] else "decreasing"
+        }
 
 
 def create_sales_summary(df):
-    """Create sales summary from original dataset"""
-    
-    df['sale_date'] = pd.to_datetime(df['sale_date'])
-    df['total_value'] = df['price'] * df['quantity']
-
-    monthly_sales = df.groupby(df['sale_date'].dt.to_period('M'))['total_value'].sum()
-
-    category_sales = df.groupby('category')['total_value'].sum().sort_values(ascending=False)
-
-    top_products = df.groupby('product_name')['total_value'].sum().sort_values(ascending=False).head(10)
-
-    avg_monthly = monthly_sales.mean()
-    spikes = monthly_sales[monthly_sales > avg_monthly * 1.2]
-    
-    summary = {
-        "total_sales": float(df['total_value'].sum()),
-        "total_transactions": len(df),
-        "avg_transaction_value": float(df['total_value'].mean()),
-        "date_range": f"{df['sale_date'].min().date()} to {df['sale_date'].max().date()}",
-        "top_3_categories": category_sales.head(3).to_dict(),
-        "monthly_sales_trend": monthly_sales.tail(12).to_dict(),  # Last 12 months
-        "top_5_products": top_products.head(5).to_dict(),
-        "peak_sales_month": monthly_sales.idxmax().strftime('%Y-%m'),
-        "peak_sales_value": float(monthly_sales.max()),
-        "sales_spikes": {str(k): float(v) for k, v in spikes.to_dict().items()},
-        "avg_monthly_sales": float(avg_monthly),
-        "growth_trend": "increasing" if monthly_sales.iloc[-1] > monthly_sales.iloc[0] else "decreasing"
-    }
-    
+    """Create sales summary from an in-memory transactions DataFrame"""
+    aggregator = SalesSummaryAggregator()
+    aggregator.update(df)
+    return aggregator.summary()
+
+
+def create_sales_summary_streaming(path=f"{DATA_PATH}/customer_intelligence_dataset.csv", chunksize=CHUNK_SIZE):
+    """Create sales summary by streaming the transactions CSV in chunks"""
+    aggregator = SalesSummaryAggregator()
+    for chunk in pd.read_csv(path, usecols=SALES_COLUMNS, chunksize=chunksize):
+        aggregator.update(chunk)
+    logger.info(f"Streamed {aggregator.total_transactions} transactions")
+    return aggregator.summary()
+
+def load_summary_state(state_file=STATE_FILE):
+    """Load the persisted aggregate state of previous runs (empty on first run)"""
+    try:
+        with open(state_file, 'rb') as f:
+            return pickle.load(f)
+    except (OSError, EOFError, pickle.UnpicklingError, AttributeError, ImportError):
+        # Missing, truncated or written by an incompatible version: start over
+        return {}
+
+
+def save_summary_state(state, state_file=STATE_FILE):
+    os.makedirs(os.path.dirname(state_file), exist_ok=True)
+    tmp_file = f"{state_file}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_file, 'wb') as f:
+        pickle.dump(state, f)
+    os.replace(tmp_file, state_file)
+
+
+def update_sales_summary(state, path=f"{DATA_PATH}/customer_intelligence_dataset.csv", chunksize=CHUNK_SIZE):
+    """Create sales summary, folding in only rows appended since the last run
+
+    The high-water mark is the byte offset reached in the append-only
+    transactions file, together with the bytes just before it. If the header
+    or those bytes changed, or the file shrank, the log was rewritten and the
+    aggregate is rebuilt from scratch.
+    """
+    saved = state.get("sales")
+    size = os.path.getsize(path)
+    with open(path, 'rb') as f:
+        header = f.readline()
+        aggregator, offset = None, len(header)
+        if saved and saved["header"] == header and saved["offset"] <= size:
+            f.seek(saved["offset"] - len(saved["tail"]))
+            if f.read(len(saved["tail"])) == saved["tail"]:
+                aggregator, offset = SalesSummaryAggregator.from_state(saved["aggregator"]), saved["offset"]
+        if aggregator is None:
+            logger.info("No reusable sales state, aggregating full history")
+            aggregator = SalesSummaryAggregator()
+        before = aggregator.total_transactions
+        if offset < size:
+            f.seek(offset)
+            columns = header.decode('utf-8').strip().split(',')
+            for chunk in pd.read_csv(f, header=None, names=columns, usecols=SALES_COLUMNS, chunksize=chunksize):
+                aggregator.update(chunk)
+            offset = f.tell()
+        f.seek(max(0, offset - 256))
+        tail = f.read(offset - f.tell())
+    logger.info(f"Folded {aggregator.total_transactions - before} new transactions into the sales summary")
+    state["sales"] = {"header": header, "offset": offset, "tail": tail, "aggregator": aggregator.to_state()}
+    return aggregator.summary()
+
+
+def cached_summary(state, path, summarize):
+    """Return summarize(load_frame(path)), reusing the stored result while the file is unchanged"""
+    st = os.stat(path)
+    signature = (st.st_size, st.st_mtime_ns)
+    entry = state.setdefault("summaries", {}).get(path)
+    if entry is not None and entry[0] == signature:
+        return entry[1]
+    summary = summarize(load_frame(path))
+    state["summaries"][path] = (signature, summary)
     return summary
 
+
 def create_segments_summary(segments_df):
     """Summarize customer segments"""
     segment_counts = segments_df['segment_name'].value_counts()
@@ -85,37 +245,93 @@ def create_forecast_summary(forecast_df):
         "forecast_months": len(forecast_df),
         "total_predicted_sales": float(forecast_df['predicted_sales'].sum()),
         "avg_monthly_forecast": float(forecast_df['predicted_sales'].mean()),
-        "highest_month": forecast_df.loc[forecast_df['predicted_sales'].idxmax(), 'date'],
+        "highest_month": str(pd.Timestamp(forecast_df.loc[forecast_df['predicted_sales'].idxmax(), 'date']).date()),
         "highest_value": float(forecast_df['predicted_sales'].max())
     }
 
 
-def query_llm(prompt):
-    """Improved function to query Ollama with better error handling"""
+def llm_cache_key(model, options, prompt):
+    """Content address of a generation request"""
+    payload = json.dumps({"model": model, "options": options, "prompt": prompt}, sort_keys=True)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def read_llm_cache(key, cache_dir=LLM_CACHE_DIR):
     try:
-        print("⏳ Sending request to Mistral (this may take 1-3 minutes)...")
-        response = requests.post(
-            f"{OLLAMA_URL}/api/generate",
-            json={
-                "model": "mistral:7b",
-                "prompt": prompt,
-                "stream": False,
-                "options": {
-                    "temperature": 0.3,
-                    "num_predict": 1500 
-                }
-            },
-            timeout=300 
-        )
-        
-        if response.status_code == 200:
-            return response.json()["response"]
-        else:
-            return f"Error: HTTP {response.status_code} - {response.text}"
-            
+        with open(os.path.join(cache_dir, f"{key}.json"), 'r', encoding='utf-8') as f:
+            return json.load(f)["response"]
+    except (OSError, ValueError, KeyError):
+        return None
+
+
+def write_llm_cache(key, response, cache_dir=LLM_CACHE_DIR):
+    os.makedirs(cache_dir, exist_ok=True)
+    path = os.path.join(cache_dir, f"{key}.json")
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump({"response": response, "created": time.time()}, f)
+    os.replace(tmp_path, path)
+
+
+def stream_llm(prompt, model=LLM_MODEL, options=None):
+    """Yield response text from Ollama piece by piece as it is generated"""
+    with requests.post(
+        f"{OLLAMA_URL}/api/generate",
+        json={
+            "model": model,
+            "prompt": prompt,
+            "stream": True,
+            "options": options or LLM_OPTIONS
+        },
+        stream=True,
+        timeout=(10, 300)
+    ) as response:
+        if response.status_code != 200:
+            raise RuntimeError(f"HTTP {response.status_code} - {response.text}")
+        for line in response.iter_lines():
+            if not line:
+                continue
+            part = json.loads(line)
+            if "error" in part:
+                raise RuntimeError(part["error"])
+            if part.get("response"):
+                yield part["response"]
+            if part.get("done"):
+                break
+
+
+def query_llm(prompt, on_token=None, use_cache=True, model=LLM_MODEL, options=None):
+    """Query Ollama, serving unchanged prompts from the response cache
+
+    Cache misses are streamed; on_token, if given, receives each piece of
+    text as soon as it arrives (or the whole cached response at once).
+    """
+    options = options or LLM_OPTIONS
+    key = llm_cache_key(model, options, prompt)
+    if use_cache:
+        cached = read_llm_cache(key)
+        if cached is not None:
+            logger.info("Using cached LLM response")
+            if on_token:
+                on_token(cached)
+            return cached
+    try:
+        logger.info(f"Streaming response from {model}")
+        pieces = []
+        for piece in stream_llm(prompt, model, options):
+            pieces.append(piece)
+            if on_token:
+                on_token(piece)
+        response = "".join(pieces)
+        if use_cache:
+            write_llm_cache(key, response)
+        return response
+
     except requests.exceptions.Timeout:
+        logger.error("LLM request timed out")
         return "Error: Request timed out. Mistral may be processing a complex prompt."
     except Exception as e:
+        logger.error(f"LLM request failed: {str(e)}")
         return f"Error connecting to Ollama: {str(e)}"
 
 
@@ -160,48 +376,386 @@ Keep analysis practical and business-focused. Use bullet points for clarity.
     return prompt
 
 
-original_data, churn_data, segments_data, sales_forecast = load_and_sample_data()
-
-print("Creating sales summary...")
-sales_summary = create_sales_summary(original_data)
+def query_llm_with_retries(prompt, retries=3, backoff=2.0, use_cache=True):
+    """query_llm with exponential backoff and jitter; returns the last error text if every attempt fails"""
+    for attempt in range(retries + 1):
+        response = query_llm(prompt, use_cache=use_cache)
+        if not response.startswith("Error"):
+            return response
+        if attempt < retries:
+            delay = backoff * 2 ** attempt * (1 + 0.25 * random.random())
+            logger.warning(f"LLM attempt {attempt + 1} failed, retrying in {delay:.1f}s: {response}")
+            time.sleep(delay)
+    return response
+
+
+def create_segment_summaries(segments_df, customers_df, churn_df):
+    """Summarize every segment_name of the segment dashboard in one grouped pass"""
+    df = segments_df[["customer_id", "segment_name"]].merge(
+        customers_df[["customer_id", *CUSTOMER_BRIEF_COLUMNS]], on="customer_id", how="left"
+    ).merge(
+        churn_df[["customer_id", "churn"]], on="customer_id", how="left"
+    )
+    df["churn"] = (df["churn"] == "Yes").astype(float)
+    grouped = df.groupby("segment_name", observed=True).agg(
+        customers=("customer_id", "size"),
+        churn_rate=("churn", "mean"),
+        avg_orders=("orders", "mean"),
+        avg_tenure_days=("tenure_days", "mean"),
+        avg_recency_days=("recency_days", "mean"),
+        total_revenue=("monetary_sum", "sum"),
+        avg_order_value=("aov", "mean"),
+        negative_feedback_rate=("neg_rate", "mean"),
+        high_ticket_rate=("high_ticket_rate", "mean"),
+    ).sort_values("customers", ascending=False)
+
+    total = len(df)
+    return {
+        str(name): {
+            "segment_name": str(name),
+            "customers": int(row.customers),
+            "share_percent": round(row.customers / total * 100, 1),
+            "churn_rate_percent": round(row.churn_rate * 100, 1),
+            "avg_orders": round(row.avg_orders, 2),
+            "avg_tenure_days": round(row.avg_tenure_days, 1),
+            "avg_recency_days": round(row.avg_recency_days, 1),
+            "total_revenue": float(row.total_revenue),
+            "avg_order_value": round(row.avg_order_value, 2),
+            "negative_feedback_rate": round(row.negative_feedback_rate, 3),
+            "high_ticket_rate": round(row.high_ticket_rate, 3),
+        }
+        for name, row in grouped.iterrows()
+    }
 
-print("Creating segments summary...")
-segments_summary = create_segments_summary(segments_data)
 
-print("Creating churn summary...")
-churn_summary = create_churn_summary(churn_data)
+def top_at_risk_customers(customers_df, n, registry=None, model_type="logreg"):
+    """Summaries of the n customers with the highest churn score from a churn model"""
+    from churn_preprocessing import ChurnModels
+    from feature_schema import CHURN_FEATURES
+    from model_registry import ModelRegistry
+    from scoring import churn_scores, top_n_indices
+
+    registry = registry or ModelRegistry()
+    model = ChurnModels(registry).get(model_type)
+    X = customers_df[list(CHURN_FEATURES)].to_numpy(dtype=float)
+    scores, score_type = churn_scores(model, X)
+    top = top_n_indices(scores, n)
+    rows = customers_df.iloc[top]
+    return [
+        {
+            "customer_id": str(row.customer_id),
+            "segment_name": str(row.segment_name),
+            "churn_score": round(float(scores[i]), 4),
+            "score_type": score_type,
+            **{col: float(getattr(row, col)) for col in CUSTOMER_BRIEF_COLUMNS},
+        }
+        for i, row in zip(top, rows.itertuples(index=False))
+    ]
+
+
+def create_segment_brief_prompt(segment, total_customers):
+    """Prompt for one segment's account-manager brief"""
+    return f"""
+You are a business analyst writing a brief for the account managers of one customer segment.
+
+## SEGMENT: {segment['segment_name']}
+- Customers: {segment['customers']:,} of {total_customers:,} ({segment['share_percent']}%)
+- Predicted Churn Rate: {segment['churn_rate_percent']}%
+- Average Orders: {segment['avg_orders']}
+- Average Tenure: {segment['avg_tenure_days']:.0f} days
+- Average Days Since Last Purchase: {segment['avg_recency_days']:.0f}
+- Total Revenue: ${segment['total_revenue']:,.0f}
+- Average Order Value: ${segment['avg_order_value']:,.0f}
+- Negative Feedback Rate: {segment['negative_feedback_rate']:.1%}
+- High-Ticket Purchase Rate: {segment['high_ticket_rate']:.1%}
+
+## BRIEF REQUIRED:
+1. Who these customers are and how they behave
+2. Main risks and opportunities for this segment
+3. Top 3 concrete actions for the account managers
+
+Keep it short, practical and business-focused. Use bullet points for clarity.
+"""
 
-print("Creating forecast summary...")
-forecast_summary = create_forecast_summary(sales_forecast)
 
-print("Creating simplified LLM prompt...")
-simple_prompt = create_simple_insights_prompt(sales_summary, segments_summary, churn_summary, forecast_summary)
+def create_customer_brief_prompt(customer):
+    """Prompt for one at-risk customer's retention brief"""
+    return f"""
+You are a business analyst writing a retention brief for one at-risk customer.
 
-print("Querying Mistral for insights (simple analysis)...")
-insights = query_llm(simple_prompt)
+## CUSTOMER: {customer['customer_id']}
+- Segment: {customer['segment_name']}
+- Churn Score: {customer['churn_score']} ({customer['score_type']})
+- Orders: {customer['orders']:.0f} over {customer['tenure_days']:.0f} days
+- Days Since Last Purchase: {customer['recency_days']:.0f}
+- Total Spend: ${customer['monetary_sum']:,.0f} (Average Order ${customer['aov']:,.0f})
+- Feedback Given: {customer['feedback_count']:.0f} (Negative Rate {customer['neg_rate']:.0%})
+- High-Ticket Purchase Rate: {customer['high_ticket_rate']:.0%}
 
-if "Error" not in insights and len(insights) > 100:
-    print("Simple analysis successful!")
-    
+## BRIEF REQUIRED:
+1. Why this customer is likely to churn
+2. The single best retention action and the offer to make
 
+Keep it to a few bullet points.
+"""
 
-print("\n" + "="*80)
-print("CUSTOMER INTELLIGENCE INSIGHTS (Mistral 7B)")
-print("="*80)
-print(insights)
 
-with open("customer_insights_mistral.txt", "w") as f:
-    f.write("CUSTOMER INTELLIGENCE INSIGHTS (Mistral 7B)\n")
-    f.write("="*50 + "\n\n")
-    f.write(insights)
+class StagedPipeline:
+    """Stage runner shared by the pipelines: calls STAGES in order and records each one's wall time"""
+
+    STAGES = ("load", "summarize", "prompt", "generate", "persist")
+
+    def __init__(self):
+        self.timings = {}
+
+    @contextmanager
+    def _stage(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.timings[name] = time.perf_counter() - start
+
+    def run_stages(self, **data):
+        """Call every stage method in order; keyword arguments go to the first one"""
+        first, *rest = self.STAGES
+        getattr(self, first)(**data)
+        for name in rest:
+            getattr(self, name)()
+
+
+class InsightsPipeline(StagedPipeline):
+    """Importable insights pipeline: load -> summarize -> prompt -> generate -> persist
+
+    Every stage is a method and records its wall time in ``timings``. Callers
+    that already hold the DataFrames (the Flask app, the job runner) pass them
+    to ``run`` and skip both the subprocess and the CSV parsing.
+    """
+
+    def __init__(self, output_file=INSIGHTS_FILE, state_file=STATE_FILE, use_cache=True, on_token=None):
+        super().__init__()
+        self.output_file = output_file
+        self.state_file = state_file
+        self.use_cache = use_cache
+        self.on_token = on_token
+        self.data = {}
+        self.state = {}
+        self.summaries = {}
+        self.prompt_text = None
+        self.insights = None
+
+    def load(self, transactions=None, churn_data=None, segments_data=None, sales_forecast=None):
+        """Take already-loaded DataFrames; anything missing is read lazily from data/"""
+        with self._stage("load"):
+            self.data = {
+                "transactions": transactions,
+                "churn": churn_data,
+                "segments": segments_data,
+                "forecast": sales_forecast,
+            }
+            self.state = load_summary_state(self.state_file)
+        return self
+
+    def summarize(self):
+        with self._stage("summarize"):
+            data = self.data
+            if data.get("transactions") is not None:
+                sales = create_sales_summary(data["transactions"])
+            else:
+                sales = update_sales_summary(self.state)
+            sources = (
+                ("segments", "customer_segment_dashboard.csv", create_segments_summary),
+                ("churn", "churn_dashboard.csv", create_churn_summary),
+                ("forecast", "sales_forecast_future_2024_2025.csv", create_forecast_summary),
+            )
+            self.summaries = {"sales": sales}
+            for name, fname, summarize in sources:
+                if data.get(name) is not None:
+                    self.summaries[name] = summarize(data[name])
+                else:
+                    self.summaries[name] = cached_summary(self.state, f"{DASHBOARD_PATH}/{fname}", summarize)
+        return self.summaries
+
+    def prompt(self):
+        with self._stage("prompt"):
+            s = self.summaries
+            self.prompt_text = create_simple_insights_prompt(s["sales"], s["segments"], s["churn"], s["forecast"])
+        return self.prompt_text
+
+    def generate(self):
+        with self._stage("generate"):
+            self.insights = query_llm(self.prompt_text, on_token=self.on_token, use_cache=self.use_cache)
+        if self.insights.startswith("Error"):
+            raise RuntimeError(self.insights)
+        return self.insights
+
+    def persist(self):
+        with self._stage("persist"):
+            save_summary_state(self.state, self.state_file)
+            tmp_file = f"{self.output_file}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp_file, "w") as f:
+                f.write("CUSTOMER INTELLIGENCE INSIGHTS (Mistral 7B)\n")
+                f.write("="*50 + "\n\n")
+                f.write(self.insights)
+            os.replace(tmp_file, self.output_file)
+        return self.output_file
+
+    def run(self, **data):
+        """Run every stage in order; keyword arguments are passed to load()"""
+        self.run_stages(**data)
+        return {
+            "insights": self.insights,
+            "insights_file": self.output_file,
+            "summaries": self.summaries,
+            "timings": dict(self.timings),
+        }
+
+
+class BriefsPipeline(StagedPipeline):
+    """Fan-out pipeline: one brief per segment_name and per top at-risk customer
+
+    Summaries come from one grouped pass over the customer tables; prompts
+    are sent to the LLM with bounded concurrency and per-prompt retries, and
+    the successful briefs are written to an InsightsStore under
+    "segment/<name>" and "customer/<id>" keys.
+    """
+
+    def __init__(self, store=None, segments=True, top_at_risk=20, max_workers=4, retries=3, backoff=2.0,
+                 registry=None, model_type="logreg", use_cache=True):
+        super().__init__()
+        self.store = store or InsightsStore()
+        self.segments = segments
+        self.top_at_risk = top_at_risk
+        self.max_workers = max_workers
+        self.retries = retries
+        self.backoff = backoff
+        self.registry = registry
+        self.model_type = model_type
+        self.use_cache = use_cache
+        self.data = {}
+        self.summaries = {}
+        self.prompts = []
+        self.briefs = []
+        self.failed = []
+        self.keys = []
+
+    def load(self, customers=None, churn_data=None, segments_data=None):
+        with self._stage("load"):
+            self.data = {
+                "customers": customers if customers is not None else load_frame(CUSTOMERS_FILE),
+                "churn": churn_data if churn_data is not None else load_frame(f"{DASHBOARD_PATH}/churn_dashboard.csv"),
+                "segments": segments_data if segments_data is not None
+                else load_frame(f"{DASHBOARD_PATH}/customer_segment_dashboard.csv"),
+            }
+        return self
+
+    def summarize(self):
+        with self._stage("summarize"):
+            data = self.data
+            self.summaries = {"segments": {}, "customers": []}
+            if self.segments:
+                self.summaries["segments"] = create_segment_summaries(data["segments"], data["customers"], data["churn"])
+            if self.top_at_risk:
+                self.summaries["customers"] = top_at_risk_customers(
+                    data["customers"], self.top_at_risk, self.registry, self.model_type
+                )
+        return self.summaries
+
+    def prompt(self):
+        with self._stage("prompt"):
+            total = len(self.data["segments"])
+            self.prompts = [
+                {"kind": "segment", "name": name, "title": f"SEGMENT BRIEF: {name}",
+                 "prompt": create_segment_brief_prompt(segment, total)}
+                for name, segment in self.summaries["segments"].items()
+            ] + [
+                {"kind": "customer", "name": customer["customer_id"],
+                 "title": f"AT-RISK CUSTOMER BRIEF: {customer['customer_id']}",
+                 "segment_name": customer["segment_name"], "churn_score": customer["churn_score"],
+                 "prompt": create_customer_brief_prompt(customer)}
+                for customer in self.summaries["customers"]
+            ]
+        return self.prompts
+
+    def generate(self):
+        with self._stage("generate"):
+            self.briefs, self.failed = [], []
+            with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="briefs") as executor:
+                futures = {
+                    executor.submit(query_llm_with_retries, item["prompt"], self.retries, self.backoff, self.use_cache): item
+                    for item in self.prompts
+                }
+                for future in as_completed(futures):
+                    item = {k: v for k, v in futures[future].items() if k != "prompt"}
+                    response = future.result()
+                    if response.startswith("Error"):
+                        self.failed.append({"key": self.store.key(item["kind"], item["name"]), "error": response})
+                    else:
+                        self.briefs.append({**item, "text": response})
+        if self.prompts and not self.briefs:
+            raise RuntimeError(f"Every brief failed: {self.failed[0]['error']}")
+        return self.briefs
+
+    def persist(self):
+        with self._stage("persist"):
+            self.keys = self.store.put_many(self.briefs)
+        return self.keys
+
+    def run(self, **data):
+        """Run every stage in order; keyword arguments are passed to load()"""
+        self.run_stages(**data)
+        return {
+            "briefs": sorted(self.keys),
+            "failed": self.failed,
+            "timings": dict(self.timings),
+        }
+
+
+def main():
+    print("Starting Customer Intelligence Analysis...")
+    pipeline = InsightsPipeline(on_token=lambda piece: print(piece, end="", flush=True))
+    try:
+        result = pipeline.run()
+    except RuntimeError as e:
+        print(f"\nInsights generation failed, {INSIGHTS_FILE} left unchanged: {e}")
+        return 1
+
+    print("\n" + "="*80)
+    print("CUSTOMER INTELLIGENCE INSIGHTS (Mistral 7B)")
+    print("="*80)
+    print(result["insights"])
+
+    print(f"\nInsights saved to: {result['insights_file']}")
+
+    summaries = result["summaries"]
+    print(f"\nDEBUG INFO:")
+    print(f"Total Sales: ${summaries['sales']['total_sales']:,.0f}")
+    print(f"Churn Rate: {summaries['churn']['churn_rate_percent']}%")
+    print(f"Largest Segment: {summaries['segments']['largest_segment']}")
+    print(f"Sales Trend: {summaries['sales']['growth_trend']}")
+    print(f"Forecast: ${summaries['forecast']['total_predicted_sales']:,.0f} over {summaries['forecast']['forecast_months']} months")
+    print("Stage timings: " + ", ".join(f"{k}={v:.2f}s" for k, v in result["timings"].items()))
+
+    print("\nAnalysis complete!")
+    return 0
+
+
+def main_briefs():
+    print("Generating segment and at-risk customer briefs...")
+    pipeline = BriefsPipeline()
+    try:
+        result = pipeline.run()
+    except RuntimeError as e:
+        print(f"\nBrief generation failed: {e}")
+        return 1
 
-print(f"\nInsights saved to: customer_insights_mistral.txt")
+    print(f"\nStored {len(result['briefs'])} briefs in {pipeline.store.root}/")
+    for failure in result["failed"]:
+        print(f"Failed: {failure['key']}: {failure['error']}")
+    print("Stage timings: " + ", ".join(f"{k}={v:.2f}s" for k, v in result["timings"].items()))
+    return 0 if not result["failed"] else 1
 
-print(f"\nDEBUG INFO:")
-print(f"Total Sales: ${sales_summary['total_sales']:,.0f}")
-print(f"Churn Rate: {churn_summary['churn_rate_percent']}%")
-print(f"Largest Segment: {segments_summary['largest_segment']}")
-print(f"Sales Trend: {sales_summary['growth_trend']}")
-print(f"Forecast: ${forecast_summary['total_predicted_sales']:,.0f} over {forecast_summary['forecast_months']} months")
 
-print("\nAnalysis complete!")
\ No newline at end of file
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    raise SystemExit(main_briefs() if "--briefs" in sys.argv[1:] else main())
@@ -0,0 +1,287 @@
+"""
+Prometheus-style metrics shared by all gunicorn workers
+Each process keeps its counters and histograms in memory and a background
+thread writes them to .metrics/<pid>.json at most once per flush interval (or
+just refreshes the file's mtime when nothing changed). /metrics merges the
+files of the live workers and renders the Prometheus text format; the file of
+a worker that exited, or that has not been refreshed for a few flush
+intervals, is removed, which Prometheus sees as a counter reset
+"""
+
+import os
+import json
+import math
+import time
+import atexit
+import threading
+import logging
+from bisect import bisect_left
+
+logger = logging.getLogger(__name__)
+
+METRICS_DIR = ".metrics"
+
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+ROWS_BUCKETS = (1, 10, 100, 1000, 10000, 100000, 1000000)
+
+# name -> (type, help, histogram buckets)
+METRICS = {
+    "api_requests_total": ("counter", "HTTP requests by endpoint, method and status", None),
+    "api_request_duration_seconds": ("histogram", "Request latency by endpoint", LATENCY_BUCKETS),
+    "api_stage_duration_seconds": (
+        "histogram", "Request latency split into parse, load, convert, inference and serialize stages", LATENCY_BUCKETS
+    ),
+    "model_inference_duration_seconds": (
+        "histogram", "Model compute time per call (cache misses only for churn models)", LATENCY_BUCKETS
+    ),
+    "model_batch_rows": ("histogram", "Feature rows per scoring request", ROWS_BUCKETS),
+    "model_rows_total": ("counter", "Feature rows scored by each model", None),
+    "cache_hits_total": ("counter", "Cache hits by cache", None),
+    "cache_misses_total": ("counter", "Cache misses by cache", None),
+    "cache_hit_ratio": ("gauge", "Hits / lookups by cache, across all workers", None),
+    "model_loads_total": ("counter", "Model file loads", None),
+    "model_load_seconds_total": ("counter", "Time spent loading model files", None),
+}
+
+
+def _key(labels):
+    return tuple(sorted((str(k), str(v)) for k, v in labels.items()))
+
+
+def _escape(value):
+    return value.replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+
+def _format_labels(pairs):
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in pairs) + "}"
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def _format_value(value):
+    if value == math.inf:
+        return "+Inf"
+    return repr(float(value))
+
+
+class StageTimer:
+    """Splits one request's latency into consecutive named stages"""
+
+    def __init__(self, metrics, name: str = "api_stage_duration_seconds"):
+        self.metrics = metrics
+        self.name = name
+        self.samples = []
+        self._last = time.perf_counter()
+
+    def mark(self, stage: str):
+        """Close the stage that started at the previous mark"""
+        now = time.perf_counter()
+        self.samples.append((stage, now - self._last))
+        self._last = now
+
+    def observe(self, **labels):
+        for stage, seconds in self.samples:
+            self.metrics.observe(self.name, seconds, stage=stage, **labels)
+
+
+class Metrics:
+    """In-process counters/histograms with periodic per-pid file snapshots"""
+
+    def __init__(self, metrics_dir: str = METRICS_DIR, flush_interval: float = 1.0, stale_intervals: int = 5):
+        """
+        Args:
+            metrics_dir: Directory shared by the workers for per-pid snapshots
+            flush_interval: Seconds between snapshots; another worker's data
+                on /metrics is at most this old
+            stale_intervals: Flush intervals after which a snapshot that was
+                not refreshed is removed, e.g. one left by a killed worker
+        """
+        self.metrics_dir = metrics_dir
+        self.flush_interval = flush_interval
+        self.stale_intervals = stale_intervals
+        self._counters = {}
+        self._histograms = {}
+        self._collectors = []
+        self._dirty = False
+        self._flusher = None
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        os.makedirs(metrics_dir, exist_ok=True)
+
+    def add_collector(self, collect):
+        """Register collect() -> iterable of (counter name, labels, process-cumulative value)"""
+        self._collectors.append(collect)
+
+    def inc(self, name: str, value: float = 1.0, **labels):
+        key = (name, _key(labels))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0.0) + value
+            self._touch()
+
+    def observe(self, name: str, value: float, **labels):
+        buckets = METRICS[name][2]
+        key = (name, _key(labels))
+        with self._lock:
+            hist = self._histograms.get(key)
+            if hist is None:
+                hist = self._histograms[key] = [[0] * (len(buckets) + 1), 0.0, 0]
+            hist[0][bisect_left(buckets, value)] += 1
+            hist[1] += value
+            hist[2] += 1
+            self._touch()
+
+    def stages(self) -> StageTimer:
+        return StageTimer(self)
+
+    def _touch(self):
+        # Called with the lock held; the flusher starts in the process that
+        # records, so a gunicorn --preload master never owns it
+        self._dirty = True
+        if self._flusher is None:
+            self._flusher = threading.Thread(target=self._flush_loop, name="metrics-flush", daemon=True)
+            self._flusher.start()
+            atexit.register(self.flush)
+
+    def _flush_loop(self):
+        while True:
+            time.sleep(self.flush_interval)
+            try:
+                if self._dirty:
+                    self.flush()
+                else:
+                    # Keep an idle worker's snapshot from being pruned as stale
+                    try:
+                        os.utime(self._snapshot_path())
+                    except FileNotFoundError:
+                        self.flush()
+            except Exception as e:
+                logger.error(f"Metrics flush failed: {str(e)}")
+
+    def _snapshot(self):
+        with self._lock:
+            self._dirty = False
+            counters = [[name, dict(labels), value] for (name, labels), value in self._counters.items()]
+            histograms = [
+                [name, dict(labels), list(buckets), total, count]
+                for (name, labels), (buckets, total, count) in self._histograms.items()
+            ]
+        for collect in self._collectors:
+            for name, labels, value in collect():
+                counters.append([name, labels, value])
+        return {"counters": counters, "histograms": histograms}
+
+    def _snapshot_path(self):
+        return os.path.join(self.metrics_dir, f"{os.getpid()}.json")
+
+    def flush(self):
+        """Write this process's snapshot to <metrics_dir>/<pid>.json"""
+        path = self._snapshot_path()
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        # Serialized so an older snapshot can't replace a newer one
+        with self._flush_lock:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(self._snapshot(), f)
+            os.replace(tmp_path, path)
+
+    def _expired(self, fname, cutoff):
+        # Files (snapshots or leftover tmp files) of exited workers, and any
+        # file not refreshed since cutoff
+        pid = fname.split(".", 1)[0]
+        if pid.isdigit() and not _pid_alive(int(pid)):
+            return True
+        try:
+            return os.path.getmtime(os.path.join(self.metrics_dir, fname)) < cutoff
+        except OSError:
+            return False
+
+    def _read_snapshot(self, fname):
+        # Returns (counters, histograms) of one snapshot, or None if it is
+        # missing or malformed
+        try:
+            with open(os.path.join(self.metrics_dir, fname), 'r', encoding='utf-8') as f:
+                snapshot = json.load(f)
+            counters = [(name, _key(labels), float(value)) for name, labels, value in snapshot["counters"]]
+            histograms = [
+                (name, _key(labels), [int(n) for n in buckets], float(total), int(count))
+                for name, labels, buckets, total, count in snapshot["histograms"]
+            ]
+        except (OSError, ValueError, KeyError, TypeError, AttributeError) as e:
+            logger.warning(f"Skipping metrics snapshot {fname}: {str(e)}")
+            return None
+        return counters, histograms
+
+    def collect(self):
+        """Merge the snapshots of the live workers into (counters, histograms) keyed by (name, labels)"""
+        try:
+            self.flush()
+        except OSError as e:
+            logger.error(f"Metrics flush failed: {str(e)}")
+        own = os.path.basename(self._snapshot_path())
+        cutoff = time.time() - self.stale_intervals * self.flush_interval
+        counters, histograms = {}, {}
+        for fname in os.listdir(self.metrics_dir):
+            if fname != own and self._expired(fname, cutoff):
+                try:
+                    os.remove(os.path.join(self.metrics_dir, fname))
+                except OSError:
+                    pass
+                continue
+            if not fname.endswith(".json"):
+                continue
+            snapshot = self._read_snapshot(fname)
+            if snapshot is None:
+                continue
+            for name, key, value in snapshot[0]:
+                counters[(name, key)] = counters.get((name, key), 0.0) + value
+            for name, key, buckets, total, count in snapshot[1]:
+                key = (name, key)
+                merged = histograms.get(key)
+                if merged is None or len(merged[0]) != len(buckets):
+                    histograms[key] = [list(buckets), total, count]
+                else:
+                    merged[0] = [a + b for a, b in zip(merged[0], buckets)]
+                    merged[1] += total
+                    merged[2] += count
+        return counters, histograms
+
+    def render(self) -> str:
+        """All workers' metrics in the Prometheus text exposition format"""
+        counters, histograms = self.collect()
+        gauges = {}
+        for (name, labels), hits in counters.items():
+            if name == "cache_hits_total":
+                lookups = hits + counters.get(("cache_misses_total", labels), 0.0)
+                if lookups:
+                    gauges[("cache_hit_ratio", labels)] = hits / lookups
+
+        lines = []
+        for name, (kind, help_text, buckets) in METRICS.items():
+            series = histograms if kind == "histogram" else gauges if kind == "gauge" else counters
+            samples = sorted((labels, value) for (n, labels), value in series.items() if n == name)
+            if not samples:
+                continue
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            for labels, value in samples:
+                if kind != "histogram":
+                    lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+                    continue
+                counts, total, count = value
+                cumulative = 0
+                for bound, n in zip((*buckets, math.inf), counts):
+                    cumulative += n
+                    le = _format_labels((*labels, ("le", _format_value(bound))))
+                    lines.append(f"{name}_bucket{le} {cumulative}")
+                lines.append(f"{name}_sum{_format_labels(labels)} {_format_value(total)}")
+                lines.append(f"{name}_count{_format_labels(labels)} {count}")
+        return "\n".join(lines) + "\n"
@@ -0,0 +1,155 @@
+"""
+Lazy model registry
+Loads each model on first use instead of at import time and keeps a joblib
+copy of it whose numpy arrays are memory-mapped, so forked gunicorn workers
+share the same physical pages instead of each holding a private copy
+"""
+
+import os
+import pickle
+import threading
+import time
+import logging
+
+import joblib
+
+logger = logging.getLogger(__name__)
+
+MODEL_DIR = "models"
+
+MODEL_FILES = {
+    "logreg": "logistic_regression.pkl",
+    "svm": "svm_rbf.pkl",
+    "dt": "decision_tree.pkl",
+    "rf": "random_forest.pkl",
+    "logreg_preprocess": "logistic_regression_preprocess.pkl",
+    "svm_preprocess": "svm_rbf_preprocess.pkl",
+    "dt_preprocess": "decision_tree_preprocess.pkl",
+    "rf_preprocess": "random_forest_preprocess.pkl",
+    "linreg": "linreg_forecast.pkl",
+    "linreg_scaler": "linreg_scaler.pkl",
+    "kmeans": "kmeans.pkl",
+    "kmeans_scaler": "kmeans_scaler.pkl",
+    "kmeans_pca": "kmeans_pca.pkl",
+    "sentiment": "sentiment_vader.pkl",
+}
+
+
+class ModelNotAvailable(LookupError):
+    """Raised when a model is unknown or its file is missing or empty"""
+
+
+class ModelRegistry:
+    """Thread-safe, lazily populated cache of the pickled models"""
+
+    def __init__(self, model_dir: str = MODEL_DIR, files: dict = None, mmap: bool = True):
+        """
+        Args:
+            model_dir: Directory holding the pickled models
+            files: Mapping of model name to file name inside model_dir
+            mmap: Serve models from memory-mapped joblib copies
+        """
+        self.model_dir = model_dir
+        self.files = dict(files or MODEL_FILES)
+        self.mmap = mmap
+        self.mmap_dir = os.path.join(model_dir, ".mmap")
+        self._models = {}
+        self._load_seconds = {}
+        self._load_totals = {}
+        self._lock = threading.Lock()
+
+    def path(self, name: str) -> str:
+        if name not in self.files:
+            raise ModelNotAvailable(f"Unknown model: {name}")
+        return os.path.join(self.model_dir, self.files[name])
+
+    def version(self, name: str):
+        """Return (mtime_ns, size) of the model file, or None when it can't be loaded"""
+        try:
+            st = os.stat(self.path(name))
+        except FileNotFoundError:
+            return None
+        if st.st_size == 0:
+            return None
+        return (st.st_mtime_ns, st.st_size)
+
+    def get(self, name: str):
+        """
+        Return the named model, loading it on first use
+
+        A model whose file changed on disk since it was loaded is reloaded.
+
+        Raises:
+            ModelNotAvailable: if the model is unknown or its file is missing
+        """
+        return self.get_versioned(name)[1]
+
+    def get_versioned(self, name: str):
+        """Return (version, model) so callers can key caches on the exact file served"""
+        version = self.version(name)
+        if version is None:
+            raise ModelNotAvailable(f"Model '{name}' is not available: {self.path(name)} is missing or empty")
+        entry = self._models.get(name)
+        if entry is not None and entry[0] == version:
+            return entry
+        with self._lock:
+            entry = self._models.get(name)
+            if entry is not None and entry[0] == version:
+                return entry
+            start = time.perf_counter()
+            model = self._load(name, version)
+            self._load_seconds[name] = time.perf_counter() - start
+            loads, seconds = self._load_totals.get(name, (0, 0.0))
+            self._load_totals[name] = (loads + 1, seconds + self._load_seconds[name])
+            self._models[name] = (version, model)
+            logger.info(f"Loaded model '{name}' in {self._load_seconds[name]:.3f}s")
+            return self._models[name]
+
+    def _load(self, name: str, version):
+        src = self.path(name)
+        if not self.mmap:
+            with open(src, 'rb') as f:
+                return pickle.load(f)
+        mmap_path = os.path.join(self.mmap_dir, f"{name}-{version[0]}-{version[1]}.joblib")
+        if not os.path.exists(mmap_path):
+            with open(src, 'rb') as f:
+                model = pickle.load(f)
+            os.makedirs(self.mmap_dir, exist_ok=True)
+            tmp_path = f"{mmap_path}.{os.getpid()}.tmp"
+            joblib.dump(model, tmp_path)
+            os.replace(tmp_path, mmap_path)
+            self._remove_stale(name, mmap_path)
+        # Copy-on-write mapping: pages stay shared until written, and libsvm's
+        # probability path, which insists on writeable buffers, still works
+        return joblib.load(mmap_path, mmap_mode="c")
+
+    def _remove_stale(self, name: str, keep: str):
+        for fname in os.listdir(self.mmap_dir):
+            path = os.path.join(self.mmap_dir, fname)
+            if fname.startswith(f"{name}-") and fname.endswith(".joblib") and path != keep:
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+
+    def preload(self, names=None):
+        """Load the given (default: all available) models ahead of the first request"""
+        for name in names or self.files:
+            if self.version(name) is not None:
+                self.get(name)
+
+    def load_stats(self) -> dict:
+        """Return {name: {"loads": n, "seconds": total}} for models loaded by this process"""
+        return {name: {"loads": n, "seconds": total} for name, (n, total) in list(self._load_totals.items())}
+
+    def available(self) -> dict:
+        """Report availability and load state of every registered model"""
+        return {
+            name: {
+                "file": self.path(name),
+                "available": self.version(name) is not None,
+                "loaded": name in self._models,
+                "load_seconds": self._load_seconds.get(name),
+            }
+            for name in self.files
+        }
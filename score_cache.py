@@ -0,0 +1,126 @@
+"""
+Bounded LRU/TTL cache of per-row model scores
+Entries are keyed on (model name, model file version, feature-row hash), so a
+refreshed .pkl under models/ never serves stale scores
+"""
+
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+
+def row_digest(row) -> bytes:
+    """Stable hash of one float64 feature row"""
+    return hashlib.blake2b(np.ascontiguousarray(row, dtype=np.float64).tobytes(), digest_size=16).digest()
+
+
+class ScoreCache:
+    """Thread-safe LRU cache of (label, score) per model and feature row"""
+
+    def __init__(self, max_entries: int = 50000, ttl_seconds: float = 3600.0):
+        """
+        Args:
+            max_entries: Rows kept before the least recently used are evicted
+            ttl_seconds: Age after which an entry is treated as a miss
+        """
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._data = OrderedDict()
+        self._versions = {}
+        self._score_types = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    def _check_version(self, model_name, version):
+        # Called with the lock held. Dropping the old version's rows eagerly
+        # frees the space instead of waiting for LRU eviction.
+        current = self._versions.get(model_name)
+        if current == version:
+            return
+        if current is not None:
+            stale = [k for k in self._data if k[0] == model_name]
+            for k in stale:
+                del self._data[k]
+            self.invalidations += len(stale)
+            self._score_types.pop(model_name, None)
+        self._versions[model_name] = version
+
+    def score_rows(self, model_name, version, data_np, score_fn):
+        """
+        Return (labels, scores, score_type) for every row, scoring only misses
+
+        Args:
+            model_name: Registry name of the model
+            version: Model file version; a new value invalidates older entries
+            data_np: 2-D float64 feature matrix
+            score_fn: Callable(matrix) -> (labels, scores, score_type) used
+                once, vectorized, on the rows that missed
+        """
+        n_rows = data_np.shape[0]
+        keys = [(model_name, version, row_digest(row)) for row in data_np]
+        labels = np.empty(n_rows, dtype=np.float64)
+        scores = np.empty(n_rows, dtype=np.float64)
+        missing = []
+        now = time.monotonic()
+        with self._lock:
+            self._check_version(model_name, version)
+            score_type = self._score_types.get(model_name)
+            for i, key in enumerate(keys):
+                entry = self._data.get(key)
+                if entry is not None and entry[2] < now:
+                    del self._data[key]
+                    self.expirations += 1
+                    entry = None
+                if entry is None:
+                    missing.append(i)
+                    continue
+                self._data.move_to_end(key)
+                labels[i], scores[i] = entry[0], entry[1]
+            self.hits += n_rows - len(missing)
+            self.misses += len(missing)
+
+        if missing:
+            miss_labels, miss_scores, score_type = score_fn(data_np[missing])
+            miss_labels = np.asarray(miss_labels, dtype=np.float64)
+            miss_scores = np.asarray(miss_scores, dtype=np.float64)
+            labels[missing] = miss_labels
+            scores[missing] = miss_scores
+            expires = time.monotonic() + self.ttl_seconds
+            with self._lock:
+                if self._versions.get(model_name) == version:
+                    self._score_types[model_name] = score_type
+                    for j, i in enumerate(missing):
+                        self._data[keys[i]] = (miss_labels[j], miss_scores[j], expires)
+                        self._data.move_to_end(keys[i])
+                    while len(self._data) > self.max_entries:
+                        self._data.popitem(last=False)
+                        self.evictions += 1
+        return labels, scores, score_type
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self._versions.clear()
+            self._score_types.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._data),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl_seconds,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else None,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "invalidations": self.invalidations,
+            }
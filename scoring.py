@@ -0,0 +1,74 @@
+"""
+Vectorized scoring helpers shared by the prediction endpoints
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+CHURN_MODELS = ("logreg", "svm", "dt", "rf")
+
+# sklearn releases the GIL for most of predict/predict_proba, so independent
+# models scale on threads without paying for process start-up or pickling.
+_executor = ThreadPoolExecutor(max_workers=len(CHURN_MODELS), thread_name_prefix="scoring")
+
+
+def score_model(model, data_np):
+    """Return (labels, churn scores, score_type) for every row of data_np"""
+    labels = model.predict(data_np)
+    scores, score_type = churn_scores(model, data_np)
+    return labels, scores, score_type
+
+
+def score_models(scorers, data_np):
+    """
+    Score the same feature matrix with several models concurrently
+
+    Args:
+        scorers: Mapping of model name to a callable(matrix) returning
+            (labels, scores, score_type), e.g. a bound score_model
+        data_np: 2-D feature matrix shared by all models
+
+    Returns:
+        Mapping of model name to (labels, scores, score_type) in the order of ``scorers``
+    """
+    futures = {name: _executor.submit(scorer, data_np) for name, scorer in scorers.items()}
+    return {name: future.result() for name, future in futures.items()}
+
+
+def combine_scores(results):
+    """
+    Combine per-model results into a majority vote and an average probability
+
+    Only models whose scores are probabilities enter the average. Ties in the
+    vote count as churn, so an even split is never silently dropped from a
+    retention list.
+    """
+    labels = np.vstack([np.asarray(res[0], dtype=np.float64) for res in results.values()])
+    vote = (labels.mean(axis=0) >= 0.5).astype(np.int64)
+    probas = [res[1] for res in results.values() if res[2] == "probability"]
+    avg_proba = np.vstack(probas).mean(axis=0) if probas else None
+    return vote, avg_proba
+
+
+def churn_scores(model, data_np):
+    """
+    Return (scores, score_type) ranking rows by churn risk
+
+    Uses the positive-class probability when the model has one, then the
+    decision function, and finally the hard label.
+    """
+    if hasattr(model, "predict_proba"):
+        return model.predict_proba(data_np)[:, 1], "probability"
+    if hasattr(model, "decision_function"):
+        return np.asarray(model.decision_function(data_np), dtype=np.float64), "decision_function"
+    return np.asarray(model.predict(data_np), dtype=np.float64), "label"
+
+
+def top_n_indices(scores, n):
+    """Row indices of the n highest scores, highest first, via a partial sort"""
+    n = min(int(n), len(scores))
+    if n <= 0:
+        return np.empty(0, dtype=np.int64)
+    idx = np.argpartition(-scores, n - 1)[:n]
+    return idx[np.argsort(-scores[idx], kind="stable")]
@@ -0,0 +1,132 @@
+"""
+Bulk customer segmentation from raw snapshot features
+Runs the persisted StandardScaler -> PCA -> KMeans chain of
+notebooks/clustering.ipynb as one affine projection plus a nearest-centroid
+argmin over the whole batch, and names clusters through a lookup table built
+once from customer_segment_dashboard.csv
+"""
+
+import os
+import threading
+import logging
+
+import numpy as np
+
+from data_cache import load_frame
+from feature_schema import CHURN_FEATURES, XLINEAR_FEATURES, FeatureSchema, FeatureValidationError
+
+logger = logging.getLogger(__name__)
+
+SEGMENTS_DASHBOARD_FILE = "data/dashboards/customer_segment_dashboard.csv"
+
+# cluster_name_map of the notebook, used when the dashboard file is missing
+SEGMENT_NAMES = {
+    3: "VIP Loyal",
+    2: "Discontent Dormant (High Negative Feedback)",
+    0: "Cooling Regulars (At-Risk)",
+    1: "Dormant Regulars (Disengaged/Neutral)",
+    4: "One-Timer / Lapsed Episodic",
+}
+
+SEGMENT_SCHEMA = FeatureSchema(XLINEAR_FEATURES)
+_CHURN_SCHEMA = FeatureSchema(CHURN_FEATURES)
+_XLINEAR_COLUMNS = np.array([CHURN_FEATURES.index(name) for name in XLINEAR_FEATURES])
+
+
+def segment_name_table(path: str = SEGMENTS_DASHBOARD_FILE, n_clusters: int = None):
+    """
+    Cluster id -> segment name lookup array
+
+    Names come from the dashboard's (cluster, segment_name) pairs, falling back
+    to SEGMENT_NAMES; clusters without a name are labelled by their id.
+    """
+    names = dict(SEGMENT_NAMES)
+    try:
+        pairs = load_frame(path, columns=["cluster", "segment_name"]).drop_duplicates("cluster")
+        names.update(zip(pairs["cluster"].astype(int), pairs["segment_name"].astype(str)))
+    except (OSError, KeyError, ValueError) as e:
+        logger.warning(f"Using built-in segment names, could not read {path}: {str(e)}")
+    size = max(n_clusters or 0, max(names) + 1)
+    return np.array([names.get(i, str(i)) for i in range(size)], dtype=object)
+
+
+class SegmentModel:
+    """scaler -> PCA folded into one affine map, followed by nearest-centroid assignment"""
+
+    def __init__(self, scaler, pca, kmeans, names):
+        # StandardScaler already stores 1.0 as the scale of constant columns
+        scale, mean = scaler.scale_, scaler.mean_
+        components = pca.components_
+        if pca.whiten:
+            components = components / np.sqrt(pca.explained_variance_)[:, None]
+        # ((x - mean) / scale - pca.mean_) @ components.T == x @ weights + bias
+        self.weights = np.ascontiguousarray((components / scale).T)
+        self.bias = -(mean / scale + pca.mean_) @ components.T
+        self.centers = np.ascontiguousarray(kmeans.cluster_centers_, dtype=np.float64)
+        self._center_norms = (self.centers ** 2).sum(axis=1)
+        self.names = names
+
+    def components(self, X):
+        """PCA coordinates of raw XLINEAR_FEATURES rows"""
+        return X @ self.weights + self.bias
+
+    def assign(self, X):
+        """Return (clusters, segment names, PCA coordinates) for raw feature rows"""
+        Z = self.components(X)
+        # argmin ||z - c||^2 == argmin (||c||^2 - 2 z.c); ||z||^2 is the same for every c
+        clusters = np.argmin(self._center_norms - 2.0 * (Z @ self.centers.T), axis=1)
+        return clusters, self.names[clusters], Z
+
+
+class Segmenter:
+    """Lazily built SegmentModel, rebuilt when any of its model files change"""
+
+    def __init__(self, registry, segments_file: str = SEGMENTS_DASHBOARD_FILE):
+        self.registry = registry
+        self.segments_file = segments_file
+        self._model = None
+        self._lock = threading.Lock()
+
+    def _names_version(self):
+        try:
+            return os.stat(self.segments_file).st_mtime_ns
+        except OSError:
+            return None
+
+    def model(self) -> SegmentModel:
+        """
+        Return the current SegmentModel
+
+        Raises:
+            ModelNotAvailable: if kmeans.pkl or its scaler/PCA can't be loaded
+        """
+        parts = [self.registry.get_versioned(name) for name in ("kmeans_scaler", "kmeans_pca", "kmeans")]
+        version = (tuple(v for v, _ in parts), self._names_version())
+        entry = self._model
+        if entry is None or entry[0] != version:
+            with self._lock:
+                entry = self._model
+                if entry is None or entry[0] != version:
+                    scaler, pca, kmeans = (m for _, m in parts)
+                    names = segment_name_table(self.segments_file, kmeans.n_clusters)
+                    entry = (version, SegmentModel(scaler, pca, kmeans, names))
+                    self._model = entry
+        return entry[1]
+
+    @staticmethod
+    def to_matrix(features):
+        """
+        Raw clustering inputs as a (rows, len(XLINEAR_FEATURES)) matrix
+
+        Accepts every FeatureSchema shape, named or positional, with either the
+        XLINEAR_FEATURES columns or full churn snapshot rows (CHURN_FEATURES),
+        whose extra columns are dropped.
+        """
+        try:
+            return SEGMENT_SCHEMA.to_matrix(features)
+        except FeatureValidationError as e:
+            try:
+                matrix, single = _CHURN_SCHEMA.to_matrix(features)
+            except FeatureValidationError:
+                raise e
+            return np.ascontiguousarray(matrix[:, _XLINEAR_COLUMNS]), single
@@ -0,0 +1,125 @@
+"""
+Batch VADER sentiment scoring
+Customer feedback is highly repetitive, so texts are de-duplicated per batch
+and memoized across batches; only genuinely new texts reach VADER, and large
+sets of new texts are split across worker processes
+"""
+
+import pickle
+import threading
+import multiprocessing
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+
+# Thresholds of categorize_sentiment in notebooks/text_analysis.ipynb
+POSITIVE_THRESHOLD = 0.05
+NEGATIVE_THRESHOLD = -0.05
+
+
+def categorize_sentiment(compound_score: float) -> str:
+    if compound_score >= POSITIVE_THRESHOLD:
+        return "Positive"
+    elif compound_score <= NEGATIVE_THRESHOLD:
+        return "Negative"
+    return "Neutral"
+
+
+_worker_analyzer = None
+
+
+def _init_worker(model_path):
+    global _worker_analyzer
+    with open(model_path, 'rb') as f:
+        _worker_analyzer = pickle.load(f)
+
+
+def _score_chunk(texts):
+    return [_worker_analyzer.polarity_scores(text) for text in texts]
+
+
+class SentimentScorer:
+    """Memoizing, optionally multi-process wrapper around a VADER analyzer"""
+
+    def __init__(self, get_analyzer, model_path: str, cache_size: int = 100000,
+                 workers: int = None, parallel_threshold: int = 2000, chunk_size: int = 500):
+        """
+        Args:
+            get_analyzer: Callable returning the in-process SentimentIntensityAnalyzer
+            model_path: Pickled analyzer loaded by each worker process
+            cache_size: Distinct texts memoized before the oldest are dropped
+            workers: Worker processes for large batches (default: CPU count)
+            parallel_threshold: Minimum number of new texts worth a process pool
+            chunk_size: Texts sent to a worker per task
+        """
+        self.get_analyzer = get_analyzer
+        self.model_path = model_path
+        self.cache_size = cache_size
+        self.workers = workers or multiprocessing.cpu_count()
+        self.parallel_threshold = parallel_threshold
+        self.chunk_size = chunk_size
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+        self._pool = None
+        self.hits = 0
+        self.misses = 0
+
+    def _get_pool(self):
+        with self._lock:
+            if self._pool is None:
+                # spawn: forking a threaded web worker can deadlock the child
+                self._pool = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                    initializer=_init_worker,
+                    initargs=(self.model_path,),
+                )
+            return self._pool
+
+    def _analyze(self, texts):
+        if len(texts) >= self.parallel_threshold and self.workers > 1:
+            chunks = [texts[i:i + self.chunk_size] for i in range(0, len(texts), self.chunk_size)]
+            return [scores for chunk in self._get_pool().map(_score_chunk, chunks) for scores in chunk]
+        analyzer = self.get_analyzer()
+        return [analyzer.polarity_scores(text) for text in texts]
+
+    def score_many(self, texts) -> list:
+        """
+        Score a list of texts
+
+        Returns:
+            One dict per input text with neg/neu/pos/compound and sentiment_category
+        """
+        unique = list(dict.fromkeys(texts))
+        results = {}
+        with self._lock:
+            for text in unique:
+                cached = self._cache.get(text)
+                if cached is not None:
+                    self._cache.move_to_end(text)
+                    results[text] = cached
+            self.hits += len(results)
+            self.misses += len(unique) - len(results)
+        new_texts = [text for text in unique if text not in results]
+        if new_texts:
+            scored = self._analyze(new_texts)
+            with self._lock:
+                for text, scores in zip(new_texts, scored):
+                    entry = {**scores, "sentiment_category": categorize_sentiment(scores["compound"])}
+                    results[text] = entry
+                    self._cache[text] = entry
+                while len(self._cache) > self.cache_size:
+                    self._cache.popitem(last=False)
+        return [results[text] for text in texts]
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"entries": len(self._cache), "hits": self.hits, "misses": self.misses}
+
+    def score(self, text: str) -> dict:
+        return self.score_many([text])[0]
+
+    def close(self):
+        with self._lock:
+            if self._pool is not None:
+                self._pool.shutdown()
+                self._pool = None
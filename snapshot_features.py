@@ -0,0 +1,307 @@
+"""
+Per-customer snapshot features of notebooks/eda.ipynb as a library
+Builds customer_snapshot_ml.csv from the transaction log with vectorized
+groupby/numpy operations instead of a row-wise groupby-apply. Per-customer
+aggregates are kept in a state file; when rows are appended to the log only
+the customers in those rows are re-aggregated, and the columns that depend on
+the whole log (recency, the 90-day negative-feedback flag, the high-ticket
+threshold) are refreshed for everyone with cheap array operations
+"""
+
+import os
+import pickle
+import time
+import logging
+
+import numpy as np
+import pandas as pd
+
+from data_cache import load_frame
+from feature_schema import CHURN_FEATURES
+
+logger = logging.getLogger(__name__)
+
+DATA_PATH = "data"
+TRANSACTIONS_FILE = f"{DATA_PATH}/customer_intelligence_dataset.csv"
+SNAPSHOT_FILE = f"{DATA_PATH}/customer_snapshot_ml.csv"
+STATE_FILE = f"{DATA_PATH}/.cache/snapshot_state.pkl"
+
+# Column order of customer_snapshot_ml.csv: churn sits between the raw
+# aggregates and the ratios derived from them
+_CHURN_AT = CHURN_FEATURES.index("aov")
+SNAPSHOT_COLUMNS = ("customer_id", *CHURN_FEATURES[:_CHURN_AT], "churn", *CHURN_FEATURES[_CHURN_AT:])
+
+# get_dummies(drop_first=True) levels of the training data; pinned so a
+# snapshot always has the same columns whatever levels a batch contains
+DUMMY_LEVELS = {
+    "gender": ("Male",),
+    "region": ("North", "South", "West"),
+    "top_category": ("Furniture", "Office Supplies"),
+    "last_sentiment": ("Neutral", "Positive"),
+}
+
+# Thresholds and windows of the notebook
+SENTIMENT_THRESHOLD = 0.30
+HIGH_TICKET_QUANTILE = 0.90
+RECENT_DAYS = 90
+SENTIMENT_LABELS = ("Negative", "Neutral", "Positive", "NoFeedback")
+_SENTIMENT_MAP = {"positive": "Positive", "negative": "Negative", "neutral": "Neutral"}
+
+
+def label_sentiment(compound):
+    """Vectorized _label_from_score of the notebook (±0.30 on the VADER compound)"""
+    compound = np.asarray(compound, dtype=np.float64)
+    return np.where(compound >= SENTIMENT_THRESHOLD, "Positive",
+                    np.where(compound <= -SENTIMENT_THRESHOLD, "Negative", "Neutral"))
+
+
+def sentiment_norm(rows, scorer):
+    """
+    Per-row sentiment label (sentiment_norm in the notebook)
+
+    Rows with feedback text are labelled from VADER; the others fall back to
+    the sentiment column, then to NoFeedback.
+    """
+    text = rows["feedback_text"].fillna("").astype(str).str.strip()
+    has_feedback = text.str.len().to_numpy() > 0
+    labels = rows["sentiment"].astype(object).astype(str).str.lower().map(_SENTIMENT_MAP).fillna("NoFeedback").to_numpy(dtype=object)
+    if has_feedback.any():
+        scores = scorer.score_many(text[has_feedback].tolist())
+        labels[has_feedback] = label_sentiment([s["compound"] for s in scores])
+    return has_feedback, pd.Categorical(labels, categories=SENTIMENT_LABELS)
+
+
+def _most_frequent(rows, column, orders):
+    # value_counts()/mode() of the notebook: highest count, ties broken by
+    # category order. Returns (level, share of the customer's rows).
+    counts = rows.groupby(["customer_id", column], observed=True).size().rename("n").reset_index()
+    counts["_rank"] = counts[column].cat.codes if hasattr(counts[column], "cat") else counts[column].rank(method="dense")
+    counts = counts.sort_values(["customer_id", "n", "_rank"], ascending=[True, False, True], kind="mergesort")
+    top = counts.drop_duplicates("customer_id").set_index("customer_id")
+    return top[column].astype(object), top["n"] / orders.reindex(top.index)
+
+
+def customer_aggregates(rows):
+    """
+    Aggregates that depend only on a customer's own transactions
+
+    Args:
+        rows: Transactions of the customers to aggregate, with total_value,
+            sale_dow, has_feedback and sentiment_norm already derived
+
+    Returns:
+        DataFrame indexed by customer_id
+    """
+    g = rows.groupby("customer_id", sort=True)
+    orders = g.size()
+    out = pd.DataFrame({
+        "orders": orders,
+        "first_sale": g["sale_date"].min(),
+        "last_sale": g["sale_date"].max(),
+        "monetary_sum": g["total_value"].sum(),
+        "monetary_median": g["total_value"].median(),
+        "monetary_max": g["total_value"].max(),
+        "avg_quantity": g["quantity"].mean(),
+        "max_quantity": g["quantity"].max().astype(np.float64),
+        "avg_price": g["price"].mean(),
+    })
+
+    dow = rows.groupby(["customer_id", "sale_dow"]).size().unstack(fill_value=0)
+    dow = dow.reindex(index=out.index, columns=range(7), fill_value=0).div(orders, axis=0)
+    for d in range(1, 7):
+        out[f"dow_{d}_rate"] = dow[d].astype(np.float64)
+
+    out["unique_categories"] = g["category"].nunique()
+    out["unique_products"] = g["product_id"].nunique()
+    out["top_category"], out["top_category_share"] = _most_frequent(rows, "category", orders)
+
+    feedback = rows[rows["has_feedback"]]
+    sentiment = pd.crosstab(feedback["customer_id"], feedback["sentiment_norm"]).reindex(
+        index=out.index, columns=list(SENTIMENT_LABELS), fill_value=0
+    )
+    out["sent_pos"] = sentiment["Positive"]
+    out["sent_neg"] = sentiment["Negative"]
+    out["sent_neu"] = sentiment["Neutral"]
+    out["neg_rate"] = out["sent_neg"] / (out["sent_pos"] + out["sent_neg"] + out["sent_neu"]).clip(lower=1)
+    negative = feedback[feedback["sentiment_norm"] == "Negative"]
+    out["last_negative_date"] = negative.groupby("customer_id")["sale_date"].max().reindex(out.index)
+    out["feedback_count"] = g["has_feedback"].sum().astype(np.int64)
+    out["feedback_rate"] = out["feedback_count"] / orders.clip(lower=1)
+
+    # Latest row per customer; a stable sort keeps log order among same-day sales
+    latest = rows.sort_values(["customer_id", "sale_date"], kind="mergesort").drop_duplicates("customer_id", keep="last")
+    latest = latest.set_index("customer_id")
+    out["last_sentiment"] = latest["sentiment_norm"].astype(object)
+    out["age_latest"] = latest["age"].astype(np.int64)
+    out["gender"] = _most_frequent(rows, "gender", orders)[0]
+    out["region"] = _most_frequent(rows, "region", orders)[0]
+    out["churn"] = g["churn"].max()
+    return out
+
+
+def finalize_snapshot(aggregates, as_of, high_ticket_rate):
+    """
+    Add the log-wide columns, derived ratios and dummies in SNAPSHOT_COLUMNS order
+
+    Args:
+        aggregates: customer_aggregates output for every customer
+        as_of: AS_OF_DATE of the notebook (latest sale in the log)
+        high_ticket_rate: Series of per-customer high-ticket rates
+    """
+    cust = aggregates
+    out = pd.DataFrame(index=cust.index)
+    out["orders"] = cust["orders"]
+    out["tenure_days"] = (cust["last_sale"] - cust["first_sale"]).dt.days
+    out["recency_days"] = (as_of - cust["last_sale"]).dt.days
+    for col in ("monetary_sum", "monetary_median", "monetary_max", "avg_quantity", "max_quantity", "avg_price",
+                *(f"dow_{d}_rate" for d in range(1, 7)), "unique_categories", "unique_products",
+                "top_category_share", "sent_pos", "sent_neg", "sent_neu", "neg_rate"):
+        out[col] = cust[col]
+    out["recent_neg_flag"] = (cust["last_negative_date"] >= as_of - pd.Timedelta(days=RECENT_DAYS)).astype(np.int64)
+    out["feedback_count"] = cust["feedback_count"]
+    out["feedback_rate"] = cust["feedback_rate"]
+    out["age_latest"] = cust["age_latest"]
+    out["high_ticket_rate"] = high_ticket_rate.reindex(cust.index).fillna(0.0)
+    out["churn"] = cust["churn"]
+
+    days = out["tenure_days"].clip(lower=1)
+    out["aov"] = out["monetary_sum"] / out["orders"].clip(lower=1)
+    out["orders_per_30d"] = out["orders"] / (days / 30.0)
+    out["monetary_per_30d"] = out["monetary_sum"] / (days / 30.0)
+    for col in ("aov", "orders_per_30d", "monetary_per_30d"):
+        out[col] = out[col].replace([np.inf, -np.inf], np.nan).fillna(0)
+
+    for column, levels in DUMMY_LEVELS.items():
+        values = cust[column].astype(object)
+        for level in levels:
+            out[f"{column}_{level}"] = (values == level).astype(np.uint8)
+
+    out.index.name = "customer_id"
+    return out.reset_index()[list(SNAPSHOT_COLUMNS)]
+
+
+def prepare_rows(rows, scorer):
+    """Row-level columns the aggregates need (total_value is recomputed as price * quantity)"""
+    rows = rows.copy()
+    rows["total_value"] = rows["price"] * rows["quantity"]
+    rows["sale_dow"] = rows["sale_date"].dt.dayofweek
+    rows["has_feedback"], rows["sentiment_norm"] = sentiment_norm(rows, scorer)
+    return rows
+
+
+def default_scorer():
+    from model_registry import ModelRegistry
+    from sentiment import SentimentScorer
+    registry = ModelRegistry()
+    return SentimentScorer(lambda: registry.get("sentiment"), registry.path("sentiment"))
+
+
+class SnapshotBuilder:
+    """Incrementally maintained customer snapshot"""
+
+    def __init__(self, transactions_file: str = TRANSACTIONS_FILE, state_file: str = STATE_FILE, scorer=None):
+        """
+        Args:
+            transactions_file: Append-only transaction log
+            state_file: Pickle holding the per-customer aggregates between runs
+            scorer: Object with score_many(texts) -> [{"compound": ...}] (default:
+                a SentimentScorer over models/sentiment_vader.pkl)
+        """
+        self.transactions_file = transactions_file
+        self.state_file = state_file
+        self.scorer = scorer
+        self.stats = {}
+
+    def _load_state(self):
+        try:
+            with open(self.state_file, 'rb') as f:
+                return pickle.load(f)
+        except (OSError, EOFError, pickle.UnpicklingError, AttributeError, ImportError):
+            return None
+
+    def _save_state(self, state):
+        os.makedirs(os.path.dirname(self.state_file), exist_ok=True)
+        tmp_file = f"{self.state_file}.{os.getpid()}.tmp"
+        with open(tmp_file, 'wb') as f:
+            pickle.dump(state, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_file, self.state_file)
+
+    def build(self, full: bool = False) -> pd.DataFrame:
+        """
+        Return the snapshot, re-aggregating only customers with new transactions
+
+        The saved state is reused when the log still starts with the rows it
+        was built from (same row count prefix and last sale_id); otherwise, or
+        with full=True, every customer is aggregated.
+        """
+        start = time.perf_counter()
+        log = load_frame(self.transactions_file)
+        state = None if full else self._load_state()
+        n_seen = 0
+        if state is not None:
+            n_seen = state["n_rows"]
+            if n_seen > len(log) or (n_seen and log["sale_id"].iat[n_seen - 1] != state["last_sale_id"]):
+                logger.info("Transaction log was rewritten, rebuilding the snapshot")
+                state, n_seen = None, 0
+
+        scorer = self.scorer or default_scorer()
+        new_rows = prepare_rows(log.iloc[n_seen:], scorer)
+        if state is None:
+            aggregates = customer_aggregates(new_rows)
+            sentiment = new_rows["sentiment_norm"].to_numpy()
+            affected = len(aggregates)
+        else:
+            sentiment = state["sentiment"]
+            changed = new_rows["customer_id"].unique()
+            aggregates = state["aggregates"]
+            if len(changed):
+                # Re-aggregate those customers over all of their rows; the
+                # sentiment of already-seen rows comes from the state
+                mask = log["customer_id"].isin(changed).to_numpy()
+                old_mask = mask[:n_seen]
+                history = log.iloc[:n_seen][old_mask].copy()
+                history["total_value"] = history["price"] * history["quantity"]
+                history["sale_dow"] = history["sale_date"].dt.dayofweek
+                history["sentiment_norm"] = pd.Categorical(sentiment[old_mask], categories=SENTIMENT_LABELS)
+                history["has_feedback"] = history["feedback_text"].fillna("").astype(str).str.strip().str.len() > 0
+                refreshed = customer_aggregates(pd.concat([history, new_rows]))
+                aggregates = pd.concat([aggregates.drop(refreshed.index, errors="ignore"), refreshed]).sort_index()
+                sentiment = np.concatenate([sentiment, new_rows["sentiment_norm"].to_numpy()])
+            affected = len(changed)
+
+        # Log-wide columns, recomputed for everyone from flat arrays
+        total_value = (log["price"] * log["quantity"]).to_numpy(dtype=np.float64)
+        threshold = np.quantile(total_value, HIGH_TICKET_QUANTILE)
+        codes, ids = pd.factorize(log["customer_id"])
+        high = np.bincount(codes, weights=(total_value > threshold), minlength=len(ids))
+        high_ticket_rate = pd.Series(high / np.bincount(codes, minlength=len(ids)), index=ids)
+        snapshot = finalize_snapshot(aggregates, log["sale_date"].max(), high_ticket_rate)
+
+        self._save_state({
+            "n_rows": len(log),
+            "last_sale_id": log["sale_id"].iat[-1] if len(log) else None,
+            "sentiment": np.asarray(sentiment, dtype=object),
+            "aggregates": aggregates,
+        })
+        self.stats = {
+            "rows": len(log),
+            "new_rows": len(log) - n_seen,
+            "customers": len(snapshot),
+            "customers_recomputed": affected,
+            "seconds": time.perf_counter() - start,
+        }
+        logger.info(f"Snapshot built: {self.stats}")
+        return snapshot
+
+    def save(self, path: str = SNAPSHOT_FILE, full: bool = False) -> str:
+        """Build the snapshot and write it in the customer_snapshot_ml.csv layout"""
+        snapshot = self.build(full=full)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        snapshot.to_csv(tmp_path, index=False)
+        os.replace(tmp_path, path)
+        return path
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    SnapshotBuilder().save()
@@ -0,0 +1,49 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from aggregation import MonthlyAggregate, aggregate_frame
+
+
+def transactions(n=2000, seed=0):
+    rng = np.random.default_rng(seed)
+    df = pd.DataFrame({
+        "sale_date": pd.Timestamp("2023-01-01") + pd.to_timedelta(rng.integers(0, 365, n), unit="D"),
+        "total_value": rng.uniform(1, 500, n),
+        "quantity": rng.integers(1, 10, n).astype(float),
+        "price": rng.uniform(1, 50, n),
+        "customer_id": rng.integers(0, 300, n).astype(str).astype(object),
+        "product_id": rng.integers(0, 40, n).astype(str).astype(object),
+        "age": rng.integers(18, 80, n).astype(float),
+    })
+    # Missing ids, including a month where every customer id is missing
+    df.loc[rng.random(n) < 0.1, "customer_id"] = np.nan
+    df.loc[rng.random(n) < 0.1, "product_id"] = None
+    df.loc[df["sale_date"].dt.month == 6, "customer_id"] = np.nan
+    return df
+
+
+def expected_nunique(df):
+    grouped = df.groupby(df["sale_date"].dt.to_period("M"))
+    return grouped["customer_id"].nunique().to_numpy(), grouped["product_id"].nunique().to_numpy()
+
+
+@pytest.mark.parametrize("chunksize", [100_000, 170])
+def test_missing_ids_are_not_counted(chunksize):
+    df = transactions()
+    customers, products = expected_nunique(df)
+    table = aggregate_frame(df, chunksize=chunksize)
+    np.testing.assert_array_equal(table["customer_id_nunique"].to_numpy(), customers)
+    np.testing.assert_array_equal(table["product_id_nunique"].to_numpy(), products)
+    assert table.loc[table["date"].dt.month == 6, "customer_id_nunique"].item() == 0
+    # Rows with a missing id still count towards sums and means
+    np.testing.assert_allclose(table["quantity_sum"].sum(), df["quantity"].sum())
+
+
+def test_missing_ids_are_not_sketched():
+    df = transactions()
+    customers, products = expected_nunique(df)
+    table = MonthlyAggregate(approx_distinct=True).update(df).table()
+    np.testing.assert_allclose(table["customer_id_nunique"].to_numpy(), customers, atol=3)
+    np.testing.assert_allclose(table["product_id_nunique"].to_numpy(), products, atol=1)
+    assert table.loc[table["date"].dt.month == 6, "customer_id_nunique"].item() == 0
@@ -0,0 +1,61 @@
+import json
+import os
+import math
+
+import pandas as pd
+import pytest
+
+import app as api
+import metrics
+from feature_schema import CHURN_FEATURES
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.fixture
+def client():
+    return api.app.test_client()
+
+
+@pytest.fixture
+def record():
+    row = pd.read_csv(os.path.join(ROOT, "data/customer_snapshot_ml.csv"), nrows=1)
+    return {name: float(row[name].iloc[0]) for name in CHURN_FEATURES}
+
+
+@pytest.mark.parametrize("model_type", ["logreg", "svm"])
+def test_missing_values_are_imputed_not_rejected(client, record, model_type):
+    complete = client.post("/predict", json={"model_type": model_type, "features": record})
+    assert complete.status_code == 200
+    # Missing values are filled with the training medians by the model's
+    # preprocessing artifact, so null and NaN score like the median
+    record = dict(record, recency_days=None, aov=math.nan)
+    response = client.post("/predict", data=json.dumps({"model_type": model_type, "features": record}),
+                           content_type="application/json")
+    assert response.status_code == 200
+    assert response.json["prediction"] in (0.0, 1.0)
+
+
+def test_ensemble_accepts_missing_values(client, record):
+    record = dict(record, recency_days=None)
+    response = client.post("/predict", json={"model_types": ["logreg", "dt"], "features": [record, record]})
+    assert response.status_code == 200
+    assert len(response.json["vote"]) == 2
+
+
+def test_non_numeric_values_are_still_rejected(client, record):
+    record = dict(record, recency_days="soon")
+    response = client.post("/predict", json={"model_type": "logreg", "features": record})
+    assert response.status_code == 400
+
+
+def test_cold_model_load_is_its_own_stage(client, record, monkeypatch):
+    stages = []
+    monkeypatch.setattr(metrics.StageTimer, "observe", lambda self, **labels: stages.append(self.samples))
+    monkeypatch.setattr(api.registry, "_models", {})
+    monkeypatch.setattr(api.churn_models, "_models", {})
+    response = client.post("/predict", json={"model_type": "dt", "features": record})
+    assert response.status_code == 200
+    samples = dict(stages[-1])
+    assert list(samples) == ["parse", "load", "convert", "inference", "serialize"]
+    assert samples["load"] > samples["convert"]
@@ -0,0 +1,72 @@
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.linear_model import LogisticRegression
+from sklearn.pipeline import Pipeline
+from sklearn.preprocessing import FunctionTransformer, RobustScaler, StandardScaler
+from sklearn.tree import DecisionTreeClassifier
+
+from churn_preprocessing import ChurnPreprocessor, PreprocessedModel
+
+NAMES = ("orders", "aov", "recency_days", "sent_pos")
+CAPPED = ("aov", "recency_days")
+
+
+def training_data(n=400, seed=0):
+    rng = np.random.default_rng(seed)
+    X = np.column_stack([
+        rng.integers(1, 20, n),
+        rng.lognormal(4, 1.5, n),
+        rng.exponential(60, n),
+        rng.uniform(0, 1, n),
+    ]).astype(np.float64)
+    y = (X[:, 2] > 60).astype(int)
+    X[rng.random(n) < 0.05, 1] = np.nan
+    X[rng.random(n) < 0.02, 2] = np.inf
+    return X, y
+
+
+def notebook_steps(X_train):
+    """The notebook's inf -> NaN, median fill and fit_caps clipping on a DataFrame"""
+    train = pd.DataFrame(X_train, columns=NAMES).replace([np.inf, -np.inf], np.nan)
+    medians = train.median()
+    train = train.fillna(medians)
+    caps = {c: (train[c].quantile(0.01), train[c].quantile(0.99)) for c in CAPPED}
+
+    def apply(X):
+        df = pd.DataFrame(X, columns=NAMES).replace([np.inf, -np.inf], np.nan).fillna(medians)
+        for c, (lo, hi) in caps.items():
+            df[c] = df[c].clip(lo, hi)
+        return df.to_numpy()
+
+    return apply
+
+
+@pytest.mark.parametrize("model", [
+    Pipeline([("scaler", RobustScaler()), ("clf", LogisticRegression(max_iter=1000))]),
+    Pipeline([("scaler", StandardScaler()), ("clf", LogisticRegression(max_iter=1000))]),
+    DecisionTreeClassifier(max_depth=4, random_state=0),
+])
+def test_fused_preprocessing_matches_the_sklearn_pipeline(model):
+    X, y = training_data()
+    preprocessor = ChurnPreprocessor.fit(X, feature_names=NAMES, cap_cols=CAPPED)
+    unfused = Pipeline([("prep", FunctionTransformer(notebook_steps(X))), ("model", model)]).fit(X, y)
+    fused = PreprocessedModel(preprocessor, model)
+    if isinstance(model, Pipeline):
+        assert fused.preprocessor.center is not None and fused.estimator is model.steps[-1][1]
+
+    X_new, _ = training_data(n=200, seed=1)
+    X_new[0] = [np.nan, -np.inf, 1e9, np.nan]
+    np.testing.assert_array_equal(fused.predict(X_new), unfused.predict(X_new))
+    np.testing.assert_allclose(fused.predict_proba(X_new), unfused.predict_proba(X_new), rtol=1e-9, atol=1e-12)
+    if hasattr(unfused, "decision_function"):
+        np.testing.assert_allclose(fused.decision_function(X_new), unfused.decision_function(X_new), rtol=1e-9)
+    else:
+        assert not hasattr(fused, "decision_function")
+
+
+def test_caps_skip_degenerate_columns():
+    X = np.column_stack([np.arange(100.0), np.full(100, 3.0)])
+    preprocessor = ChurnPreprocessor.fit(X, feature_names=("a", "b"), cap_cols=("a", "b"))
+    assert list(preprocessor.caps) == ["a"]
+    np.testing.assert_array_equal(preprocessor.transform([[-5.0, 100.0]]), [[0.99, 100.0]])
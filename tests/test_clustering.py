@@ -0,0 +1,42 @@
+import numpy as np
+import pytest
+from sklearn.datasets import make_blobs
+from sklearn.decomposition import PCA
+from sklearn.metrics import silhouette_score
+
+from clustering import ClusteringSearch, make_kmeans, silhouette
+
+
+@pytest.fixture(scope="module")
+def blobs():
+    X, _ = make_blobs(n_samples=600, n_features=5, centers=3, cluster_std=2.0, random_state=0)
+    return X
+
+
+def test_shared_pca_columns_match_smaller_fits(blobs):
+    search = ClusteringSearch(blobs, pc_list=(2, 3, 4), workers=1)
+    for n in (2, 3):
+        expected = PCA(n_components=n, random_state=42).fit_transform(search.X_scaled)
+        # Components are only defined up to sign
+        np.testing.assert_allclose(np.abs(search.pcs()[:, :n]), np.abs(expected), atol=1e-8)
+
+
+def test_sampled_silhouette_picks_the_exact_best(blobs):
+    exact = ClusteringSearch(blobs, pc_list=(2, 3), k_range=(2, 3, 4), sample_size=None, workers=1).run()
+    sampled = ClusteringSearch(blobs, pc_list=(2, 3), k_range=(2, 3, 4), sample_size=200, workers=1).run()
+    assert (sampled["best_n_components"], sampled["best_k"]) == (exact["best_n_components"], exact["best_k"])
+    assert sampled["best_k"] == 3
+    np.testing.assert_allclose(sampled["grid"].to_numpy(), exact["grid"].to_numpy(), atol=0.05)
+
+    # Finalists are re-scored on every row, so they carry the exact scores
+    assert len(sampled["finalists"]) == 3
+    for (n, k), score in sampled["finalists"].items():
+        assert score == pytest.approx(exact["grid"].loc[n, k], abs=1e-12)
+    assert sampled["best_silhouette"] == pytest.approx(exact["best_silhouette"], abs=1e-12)
+
+
+def test_silhouette_of_small_inputs_is_exact(blobs):
+    X = blobs[:150]
+    labels = make_kmeans(3).fit_predict(X)
+    assert silhouette(X, labels, sample_size=500) == pytest.approx(silhouette_score(X, labels), abs=1e-12)
+    assert np.isnan(silhouette(X, np.zeros(len(X), dtype=int)))
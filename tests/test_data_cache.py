@@ -0,0 +1,44 @@
+import os
+import threading
+
+import pandas as pd
+
+import data_cache
+
+
+def test_concurrent_loads_do_not_race(tmp_path, monkeypatch):
+    data_dir = tmp_path / "data"
+    data_dir.mkdir()
+    monkeypatch.setattr(data_cache, "DATA_PATH", str(data_dir))
+    monkeypatch.setattr(data_cache, "CACHE_DIR", str(data_dir / ".cache" / "frames"))
+    csv = data_dir / "sales.csv"
+    pd.DataFrame({
+        "sale_date": ["2023-01-01", "2023-02-01"] * 5000,
+        "region": ["North", "South"] * 5000,
+        "total_value": range(10000),
+    }).to_csv(csv, index=False)
+    errors, frames = [], []
+    barrier = threading.Barrier(8)
+
+    def load():
+        try:
+            for _ in range(5):
+                # Every thread misses the cache at the same time and writes it
+                barrier.wait()
+                frames.append(data_cache.load_frame(str(csv)))
+                if barrier.wait() == 0:
+                    os.remove(data_cache.cache_path(str(csv)))
+        except Exception as e:
+            errors.append(e)
+            barrier.abort()
+
+    threads = [threading.Thread(target=load) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert errors == []
+    df = data_cache.load_frame(str(csv))
+    assert len(df) == 10000 and str(df["region"].dtype) == "category"
+    assert all(f.equals(df) for f in frames)
+    assert [p.suffix for p in (data_dir / ".cache" / "frames").iterdir()] == [".pkl"]
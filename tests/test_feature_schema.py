@@ -0,0 +1,64 @@
+import numpy as np
+import pytest
+
+import feature_schema
+from feature_schema import FeatureSchema, FeatureValidationError, schema_for
+
+
+@pytest.fixture(autouse=True)
+def empty_cache(monkeypatch):
+    monkeypatch.setattr(feature_schema, "_schemas", {})
+
+
+class FittedModel:
+    def __init__(self, names):
+        self.feature_names_in_ = np.array(names, dtype=object)
+
+
+def test_schema_follows_the_model_version():
+    old = schema_for("dt", FittedModel(["a", "b"]), version=(1, 10))
+    assert schema_for("dt", FittedModel(["a", "b"]), version=(1, 10)) is old
+    # A retrained model file with other columns gets a new schema
+    new = schema_for("dt", FittedModel(["a", "b", "c"]), version=(2, 12))
+    assert new.names == ("a", "b", "c")
+    assert schema_for("dt", FittedModel(["a", "b"]), version=(1, 10)).names == ("a", "b")
+
+
+def test_named_columnar_and_positional_input_agree():
+    schema = FeatureSchema(["a", "b", "c"])
+    expected = np.array([[1.0, 2.0, 3.0], [4.0, 5.0, 6.0]])
+    # Names may come in any order; columns follow the training order
+    records = [{"c": 3, "a": 1, "b": 2}, {"b": 5, "c": 6, "a": 4}]
+    for features in (records, {"b": [2, 5], "a": [1, 4], "c": [3, 6]}, [[1, 2, 3], [4, 5, 6]]):
+        matrix, single = schema.to_matrix(features)
+        np.testing.assert_array_equal(matrix, expected)
+        assert matrix.dtype == np.float64 and matrix.flags.c_contiguous
+        assert not single
+
+    for features in (records[0], [1, 2, 3]):
+        matrix, single = schema.to_matrix(features)
+        np.testing.assert_array_equal(matrix, expected[:1])
+        assert single
+
+
+@pytest.mark.parametrize("features, message", [
+    ({"a": 1, "b": 2}, "missing features \\['c'\\]"),
+    ({"a": 1, "b": 2, "c": 3, "d": 4}, "unknown features \\['d'\\]"),
+    ([{"a": 1, "b": 2, "c": 3}, {"a": 1, "b": 2}], "missing features"),
+    ({"a": [1, 2], "b": [1], "c": [1, 2]}, "equal length"),
+    ({"a": 1, "b": "x", "c": 3}, "numeric"),
+    ([1, 2], "Expected 3 features"),
+    ([[1, 2, 3], [1, 2]], "numeric rows"),
+    ([1, None, 3], "finite"),
+    ([1, float("inf"), 3], "finite"),
+    ([], "non-empty"),
+    ("1,2,3", "non-empty"),
+])
+def test_malformed_input_is_rejected(features, message):
+    with pytest.raises(FeatureValidationError, match=message):
+        FeatureSchema(["a", "b", "c"]).to_matrix(features)
+
+
+def test_allow_nan_keeps_missing_values():
+    matrix, _ = FeatureSchema(["a", "b"], allow_nan=True).to_matrix({"a": None, "b": float("nan")})
+    assert np.isnan(matrix).all()
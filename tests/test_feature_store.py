@@ -0,0 +1,73 @@
+import os
+import threading
+
+import numpy as np
+import pandas as pd
+
+import data_cache
+from feature_store import FeatureStore
+
+
+def write_snapshots(data_dir, customers, mtime):
+    features = data_dir / "features.csv"
+    segments = data_dir / "segments.csv"
+    pd.DataFrame({
+        "customer_id": customers,
+        "orders": [float(i + 1) for i in range(len(customers))],
+        "aov": [10.0 * (i + 1) for i in range(len(customers))],
+        "churn": 0,
+    }).to_csv(features, index=False)
+    # The first customer has no segment
+    pd.DataFrame({
+        "customer_id": customers[1:],
+        "cluster": range(1, len(customers)),
+        "segment_name": [f"Segment {c}" for c in customers[1:]],
+    }).to_csv(segments, index=False)
+    for path in (features, segments):
+        os.utime(path, ns=(mtime, mtime))
+    return str(features), str(segments)
+
+
+def make_store(tmp_path, monkeypatch):
+    monkeypatch.setattr(data_cache, "DATA_PATH", str(tmp_path))
+    monkeypatch.setattr(data_cache, "CACHE_DIR", str(tmp_path / ".cache" / "frames"))
+    features, segments = write_snapshots(tmp_path, ["C1", "C2", "C3"], 1_000_000_000)
+    return FeatureStore(features, segments, feature_names=("orders", "aov"))
+
+
+def test_lookup_by_id(tmp_path, monkeypatch):
+    store = make_store(tmp_path, monkeypatch)
+    snapshot, rows, found, missing = store.lookup(["C3", "C9", "C1"])
+    assert found == ["C3", "C1"] and missing == ["C9"]
+    np.testing.assert_array_equal(snapshot.features[rows], [[3.0, 30.0], [1.0, 10.0]])
+    assert list(snapshot.clusters[rows]) == [2, -1]
+    assert list(snapshot.segments[rows]) == ["Segment C3", None]
+
+
+def test_reload_swaps_the_snapshot(tmp_path, monkeypatch):
+    store = make_store(tmp_path, monkeypatch)
+    old = store.snapshot
+    write_snapshots(tmp_path, ["C2", "C4"], 2_000_000_000)
+    new = store.reload()
+    assert store.snapshot is new and new.version != old.version
+    snapshot, rows, found, missing = store.lookup(["C1", "C4"])
+    assert snapshot is new and found == ["C4"] and missing == ["C1"]
+    np.testing.assert_array_equal(snapshot.features[rows], [[2.0, 20.0]])
+    # Requests still holding the old snapshot keep a consistent view
+    assert len(old) == 3 and old.index["C1"] == 0
+    np.testing.assert_array_equal(old.features[old.index["C3"]], [3.0, 30.0])
+
+
+def test_concurrent_first_lookups_build_once(tmp_path, monkeypatch):
+    store = make_store(tmp_path, monkeypatch)
+    builds = []
+    build = store._build
+    monkeypatch.setattr(store, "_build", lambda: builds.append(1) or build())
+    snapshots = []
+    threads = [threading.Thread(target=lambda: snapshots.append(store.lookup(["C1"])[0])) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert len(builds) == 1
+    assert all(s is snapshots[0] for s in snapshots)
@@ -0,0 +1,36 @@
+import os
+import shutil
+
+import pytest
+
+from forecasting import SalesForecaster
+from model_registry import ModelRegistry, ModelNotAvailable, MODEL_DIR
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.fixture
+def model_dir(tmp_path):
+    shutil.copy(os.path.join(ROOT, MODEL_DIR, "linreg_forecast.pkl"), tmp_path)
+    return tmp_path
+
+
+def test_missing_scaler_is_not_refit(model_dir):
+    # An empty file is what the tree shipped before the scaler was committed
+    (model_dir / "linreg_scaler.pkl").write_bytes(b"")
+    forecaster = SalesForecaster(ModelRegistry(model_dir=str(model_dir), mmap=False),
+                                 data_file=os.path.join(ROOT, "data/customer_intelligence_dataset.csv"))
+    with pytest.raises(ModelNotAvailable):
+        forecaster.forecast(3)
+    assert sorted(os.listdir(model_dir)) == ["linreg_forecast.pkl", "linreg_scaler.pkl"]
+    assert (model_dir / "linreg_scaler.pkl").read_bytes() == b""
+
+
+def test_forecast_with_committed_scaler(model_dir):
+    shutil.copy(os.path.join(ROOT, MODEL_DIR, "linreg_scaler.pkl"), model_dir)
+    forecaster = SalesForecaster(ModelRegistry(model_dir=str(model_dir), mmap=False),
+                                 data_file=os.path.join(ROOT, "data/customer_intelligence_dataset.csv"))
+    result = forecaster.forecast(3)
+    assert [row["date"] for row in result["forecast"]] == ["2024-01-01", "2024-02-01", "2024-03-01"]
+    assert all(row["predicted_sales"] > 0 for row in result["forecast"])
+    assert forecaster.forecast(3)["cached"]
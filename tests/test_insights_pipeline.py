@@ -0,0 +1,41 @@
+import threading
+
+import llm_insights
+from insights_store import InsightsStore
+
+
+def test_concurrent_state_saves_do_not_race(tmp_path):
+    state_file = str(tmp_path / "state" / "summary.pkl")
+    errors = []
+
+    def save(i):
+        try:
+            for j in range(20):
+                llm_insights.save_summary_state({"writer": i, "n": j}, state_file)
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=save, args=(i,)) for i in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert errors == []
+    assert llm_insights.load_summary_state(state_file)["n"] == 19
+    assert not [p for p in (tmp_path / "state").iterdir() if p.suffix == ".tmp"]
+
+
+def test_briefs_pipeline_runs_every_stage(tmp_path, monkeypatch):
+    prompts = []
+
+    def fake_llm(prompt, retries, backoff, use_cache):
+        prompts.append(prompt)
+        return f"Brief {len(prompts)}"
+
+    monkeypatch.setattr(llm_insights, "query_llm_with_retries", fake_llm)
+    pipeline = llm_insights.BriefsPipeline(store=InsightsStore(str(tmp_path)), top_at_risk=0)
+    result = pipeline.run()
+    assert list(result["timings"]) == list(llm_insights.StagedPipeline.STAGES)
+    assert result["failed"] == []
+    assert len(result["briefs"]) == len(prompts) > 0
+    assert all(key.startswith("segment/") for key in result["briefs"])
@@ -0,0 +1,115 @@
+import os
+import subprocess
+import sys
+import threading
+import time
+
+import pytest
+
+from jobs import JobQueue, FAILED, QUEUED, RUNNING, SUCCEEDED
+
+
+@pytest.fixture
+def queue(tmp_path):
+    return JobQueue(jobs_dir=str(tmp_path), heartbeat_interval=0.05, heartbeat_timeout=5.0)
+
+
+def blocking_handler(queue, calls):
+    release = threading.Event()
+
+    def handler(**params):
+        calls.append(threading.get_ident())
+        release.wait(5)
+        return {"ok": True}
+
+    queue.register("work", handler)
+    return release
+
+
+def dead_pid():
+    proc = subprocess.Popen([sys.executable, "-c", "pass"])
+    proc.wait()
+    return proc.pid
+
+
+def test_identical_requests_share_one_job(queue):
+    calls = []
+    release = blocking_handler(queue, calls)
+    first, created = queue.submit("work", {"a": 1})
+    second, created_again = queue.submit("work", {"a": 1})
+    other, created_other = queue.submit("work", {"a": 2})
+    assert created and not created_again and created_other
+    assert second["id"] == first["id"] and other["id"] != first["id"]
+
+    release.set()
+    assert queue.wait(first["id"], poll_interval=0.01)["status"] == SUCCEEDED
+    assert queue.submit("work", {"a": 1})[1]
+
+
+def test_job_of_a_dead_worker_is_not_joined(queue, tmp_path):
+    calls = []
+    release = blocking_handler(queue, calls)
+    orphan, _ = queue.submit("work")
+    # Pretend the job belongs to a worker process that has exited
+    record = queue.get(orphan["id"])
+    queue._write(dict(record, owner_pid=dead_pid()))
+
+    other = JobQueue(jobs_dir=str(tmp_path))
+    other.register("work", lambda: {"ok": True})
+    job, created = other.submit("work")
+    assert created and job["id"] != orphan["id"]
+    abandoned = other.get(orphan["id"])
+    assert abandoned["status"] == FAILED and "exited" in abandoned["error"]
+    release.set()
+
+
+def test_job_without_heartbeat_is_not_joined(queue, tmp_path):
+    lock_path = os.path.join(str(tmp_path), "stale.lock")
+    job = {"id": "ab" * 16, "kind": "work", "key": "stale", "status": RUNNING,
+           "owner_pid": os.getpid(), "owner_host": queue.host}
+    queue._write(job)
+    with open(lock_path, "w") as f:
+        f.write(job["id"])
+    old = time.time() - 3600
+    os.utime(lock_path, (old, old))
+    assert queue._active_job(lock_path) is None
+    assert queue.get(job["id"])["status"] == FAILED
+    assert not os.path.exists(lock_path)
+
+
+def test_heartbeat_keeps_a_long_job_active(queue):
+    calls = []
+    release = blocking_handler(queue, calls)
+    queue.heartbeat_timeout = 0.5
+    job, _ = queue.submit("work")
+    time.sleep(1.0)
+    joined, created = queue.submit("work")
+    assert not created and joined["id"] == job["id"]
+    release.set()
+
+
+def test_run_executes_inline_or_joins_the_job_in_flight(queue):
+    calls = []
+    release = blocking_handler(queue, calls)
+    submitted, _ = queue.submit("work")
+    results = []
+    waiter = threading.Thread(target=lambda: results.append(queue.run("work", poll_interval=0.01)))
+    waiter.start()
+    time.sleep(0.2)
+    assert queue.get(submitted["id"])["status"] in (QUEUED, RUNNING)
+    release.set()
+    waiter.join(5)
+    assert results[0]["id"] == submitted["id"] and results[0]["status"] == SUCCEEDED
+    assert len(calls) == 1
+
+    inline = queue.run("work")
+    assert inline["status"] == SUCCEEDED and calls[-1] == threading.get_ident()
+
+
+def test_failed_handler_is_reported(queue):
+    def fail():
+        raise ValueError("boom")
+
+    queue.register("fail", fail)
+    job = queue.run("fail")
+    assert job["status"] == FAILED and job["error"] == "boom"
@@ -0,0 +1,97 @@
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+import llm_insights
+
+
+class OllamaStub:
+    """Minimal /api/generate that streams NDJSON pieces and counts requests"""
+
+    def __init__(self, pieces=("Hello", ", ", "world"), error=None):
+        self.pieces = pieces
+        self.error = error
+        self.requests = []
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.0"
+
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+                stub.requests.append(body)
+                self.send_response(200)
+                self.send_header("Content-Type", "application/x-ndjson")
+                self.end_headers()
+                if stub.error:
+                    lines = [{"error": stub.error}]
+                else:
+                    lines = [{"response": p, "done": False} for p in stub.pieces] + [{"response": "", "done": True}]
+                for line in lines:
+                    self.wfile.write((json.dumps(line) + "\n").encode())
+                    self.wfile.flush()
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}"
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+@pytest.fixture
+def ollama(monkeypatch, tmp_path):
+    # The response cache lives under the relative data/.cache/llm
+    monkeypatch.chdir(tmp_path)
+    with OllamaStub() as stub:
+        monkeypatch.setattr(llm_insights, "OLLAMA_URL", stub.url)
+        yield stub
+
+
+def test_stream_llm_yields_pieces_in_order(ollama):
+    assert list(llm_insights.stream_llm("prompt")) == ["Hello", ", ", "world"]
+    assert ollama.requests[0]["stream"] is True
+    assert ollama.requests[0]["prompt"] == "prompt"
+
+
+def test_query_llm_caches_complete_responses(ollama):
+    streamed = []
+    assert llm_insights.query_llm("prompt", on_token=streamed.append) == "Hello, world"
+    assert streamed == ["Hello", ", ", "world"]
+
+    cached = []
+    assert llm_insights.query_llm("prompt", on_token=cached.append) == "Hello, world"
+    assert cached == ["Hello, world"]
+    assert len(ollama.requests) == 1
+
+
+def test_cache_key_covers_model_options_and_prompt(ollama):
+    llm_insights.query_llm("prompt")
+    llm_insights.query_llm("other prompt")
+    llm_insights.query_llm("prompt", options={"temperature": 0.9})
+    llm_insights.query_llm("prompt", model="other-model")
+    assert len(ollama.requests) == 4
+
+
+def test_use_cache_false_always_streams(ollama):
+    llm_insights.query_llm("prompt", use_cache=False)
+    llm_insights.query_llm("prompt", use_cache=False)
+    assert len(ollama.requests) == 2
+
+
+def test_errors_are_returned_and_not_cached(ollama):
+    ollama.error = "model not found"
+    assert llm_insights.query_llm("prompt").startswith("Error")
+    ollama.error = None
+    assert llm_insights.query_llm("prompt") == "Hello, world"
+    assert len(ollama.requests) == 2
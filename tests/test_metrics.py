@@ -0,0 +1,76 @@
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+
+from metrics import Metrics
+
+
+def dead_pid():
+    proc = subprocess.Popen([sys.executable, "-c", "pass"])
+    proc.wait()
+    return proc.pid
+
+
+def write_snapshot(metrics_dir, pid, value):
+    with open(os.path.join(metrics_dir, f"{pid}.json"), 'w', encoding='utf-8') as f:
+        json.dump({"counters": [["model_rows_total", {"model": "rf"}, value]], "histograms": []}, f)
+
+
+def rows_total(metrics):
+    counters, _ = metrics.collect()
+    return counters.get(("model_rows_total", (("model", "rf"),)), 0.0)
+
+
+def test_render_while_flushing(tmp_path):
+    # The background flusher and the rendering threads all write this
+    # process's snapshot
+    metrics = Metrics(metrics_dir=str(tmp_path), flush_interval=0.001)
+    errors = []
+
+    def work():
+        try:
+            for _ in range(100):
+                metrics.inc("model_rows_total", model="rf")
+                metrics.render()
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=work) for _ in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert errors == []
+    assert rows_total(metrics) == 400
+    assert sorted(os.listdir(tmp_path)) == [f"{os.getpid()}.json"]
+
+
+def test_bad_snapshots_are_skipped(tmp_path):
+    metrics = Metrics(metrics_dir=str(tmp_path))
+    metrics.inc("model_rows_total", 2, model="rf")
+    write_snapshot(str(tmp_path), os.getppid(), 3)
+    (tmp_path / "1.json").write_text("{\"counters\": [", encoding="utf-8")
+    (tmp_path / "2.json").write_text("{\"counters\": [[\"model_rows_total\"]]}", encoding="utf-8")
+    (tmp_path / "3.json").write_text("", encoding="utf-8")
+    assert rows_total(metrics) == 5
+    assert "model_rows_total{model=\"rf\"} 5.0" in metrics.render()
+
+
+def test_dead_and_stale_snapshots_are_pruned(tmp_path):
+    metrics = Metrics(metrics_dir=str(tmp_path), flush_interval=1.0, stale_intervals=5)
+    metrics.inc("model_rows_total", 1, model="rf")
+    live, dead = os.getppid(), dead_pid()
+    write_snapshot(str(tmp_path), live, 10)
+    write_snapshot(str(tmp_path), dead, 100)
+    (tmp_path / f"{dead}.json.{dead}.1.tmp").write_text("{", encoding="utf-8")
+    assert rows_total(metrics) == 11
+    assert sorted(os.listdir(tmp_path)) == sorted([f"{os.getpid()}.json", f"{live}.json"])
+
+    # A live pid whose snapshot stopped being refreshed (e.g. a reused pid)
+    old = time.time() - 10
+    os.utime(tmp_path / f"{live}.json", (old, old))
+    assert rows_total(metrics) == 1
+    assert os.listdir(tmp_path) == [f"{os.getpid()}.json"]
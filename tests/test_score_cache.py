@@ -0,0 +1,87 @@
+import numpy as np
+
+import score_cache
+from score_cache import ScoreCache
+
+
+class Scorer:
+    """score_fn recording which rows it was asked to score"""
+
+    def __init__(self):
+        self.batches = []
+
+    def __call__(self, data_np):
+        self.batches.append(data_np.copy())
+        return data_np[:, 0] > 1, data_np.sum(axis=1), "probability"
+
+
+class Clock:
+    def __init__(self):
+        self.now = 100.0
+
+    def monotonic(self):
+        return self.now
+
+
+def test_only_misses_are_scored():
+    cache, scorer = ScoreCache(), Scorer()
+    rows = np.array([[1.0, 2.0], [3.0, 4.0]])
+    labels, scores, score_type = cache.score_rows("logreg", 1, rows, scorer)
+    np.testing.assert_array_equal(labels, [0.0, 1.0])
+    np.testing.assert_array_equal(scores, [3.0, 7.0])
+    assert score_type == "probability"
+
+    # One known row and one new one, in another order
+    labels, scores, score_type = cache.score_rows("logreg", 1, np.array([[5.0, 6.0], [3.0, 4.0]]), scorer)
+    np.testing.assert_array_equal(labels, [1.0, 1.0])
+    np.testing.assert_array_equal(scores, [11.0, 7.0])
+    assert score_type == "probability"
+    np.testing.assert_array_equal(scorer.batches[1], [[5.0, 6.0]])
+
+    # A full hit doesn't call the model at all
+    cache.score_rows("logreg", 1, rows, scorer)
+    assert len(scorer.batches) == 2
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["entries"]) == (3, 3, 3)
+    assert stats["hit_rate"] == 0.5
+
+
+def test_models_and_versions_do_not_share_entries():
+    cache, scorer = ScoreCache(), Scorer()
+    rows = np.array([[1.0, 2.0]])
+    cache.score_rows("logreg", 1, rows, scorer)
+    cache.score_rows("svm", 1, rows, scorer)
+    # A retrained model file drops the old version's rows
+    cache.score_rows("logreg", 2, rows, scorer)
+    assert len(scorer.batches) == 3
+    stats = cache.stats()
+    assert (stats["entries"], stats["invalidations"]) == (2, 1)
+
+
+def test_entries_expire_after_the_ttl(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(score_cache.time, "monotonic", clock.monotonic)
+    cache, scorer = ScoreCache(ttl_seconds=60), Scorer()
+    rows = np.array([[1.0, 2.0]])
+    cache.score_rows("logreg", 1, rows, scorer)
+    clock.now += 59
+    cache.score_rows("logreg", 1, rows, scorer)
+    assert len(scorer.batches) == 1
+    clock.now += 2
+    cache.score_rows("logreg", 1, rows, scorer)
+    assert len(scorer.batches) == 2
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["expirations"]) == (1, 2, 1)
+
+
+def test_least_recently_used_rows_are_evicted():
+    cache, scorer = ScoreCache(max_entries=2), Scorer()
+    a, b, c = np.array([[1.0]]), np.array([[2.0]]), np.array([[3.0]])
+    cache.score_rows("dt", 1, a, scorer)
+    cache.score_rows("dt", 1, b, scorer)
+    cache.score_rows("dt", 1, a, scorer)
+    cache.score_rows("dt", 1, c, scorer)
+    assert cache.stats()["evictions"] == 1
+    cache.score_rows("dt", 1, a, scorer)
+    cache.score_rows("dt", 1, b, scorer)
+    assert [batch[0, 0] for batch in scorer.batches] == [1.0, 2.0, 3.0, 2.0]
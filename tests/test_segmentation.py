@@ -0,0 +1,64 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.cluster import KMeans
+from sklearn.decomposition import PCA
+from sklearn.preprocessing import StandardScaler
+
+import data_cache
+from feature_schema import CHURN_FEATURES, XLINEAR_FEATURES
+from model_registry import ModelRegistry, MODEL_DIR
+from segmentation import SegmentModel, Segmenter, segment_name_table
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def sklearn_chain(scaler, pca, kmeans, X):
+    Z = pca.transform(scaler.transform(X))
+    return kmeans.predict(Z), Z
+
+
+@pytest.mark.parametrize("whiten", [False, True])
+def test_folded_map_matches_the_sklearn_chain(whiten):
+    rng = np.random.default_rng(0)
+    X = rng.lognormal(1, 1, (500, 6)) * [1, 10, 100, 0.1, 5, 1]
+    X[:, 3] = 7.0  # StandardScaler keeps scale 1.0 for constant columns
+    scaler = StandardScaler().fit(X)
+    pca = PCA(n_components=3, whiten=whiten, random_state=0).fit(scaler.transform(X))
+    kmeans = KMeans(n_clusters=4, n_init=5, random_state=0).fit(pca.transform(scaler.transform(X)))
+    model = SegmentModel(scaler, pca, kmeans, np.array(["a", "b", "c", "d"], dtype=object))
+
+    X_new = rng.lognormal(1, 1, (300, 6)) * [1, 10, 100, 0.1, 5, 1]
+    clusters, names, Z = model.assign(X_new)
+    expected_clusters, expected_Z = sklearn_chain(scaler, pca, kmeans, X_new)
+    np.testing.assert_allclose(Z, expected_Z, rtol=1e-9, atol=1e-9)
+    np.testing.assert_array_equal(clusters, expected_clusters)
+    np.testing.assert_array_equal(names, model.names[expected_clusters])
+
+
+def test_saved_models_match_the_sklearn_chain(tmp_path):
+    registry = ModelRegistry(model_dir=os.path.join(ROOT, MODEL_DIR), mmap=False)
+    segmenter = Segmenter(registry, segments_file=str(tmp_path / "missing.csv"))
+    snapshot = pd.read_csv(os.path.join(ROOT, "data/customer_snapshot_ml.csv"), nrows=200)
+    # Full churn snapshot rows are accepted; the extra columns are dropped
+    X, single = segmenter.to_matrix(snapshot[list(CHURN_FEATURES)].to_numpy().tolist())
+    assert X.shape == (200, len(XLINEAR_FEATURES)) and not single
+    np.testing.assert_array_equal(X, snapshot[list(XLINEAR_FEATURES)].to_numpy(dtype=np.float64))
+
+    clusters, names, Z = segmenter.model().assign(X)
+    expected_clusters, expected_Z = sklearn_chain(registry.get("kmeans_scaler"), registry.get("kmeans_pca"),
+                                                  registry.get("kmeans"), X)
+    np.testing.assert_allclose(Z, expected_Z, rtol=1e-9, atol=1e-9)
+    np.testing.assert_array_equal(clusters, expected_clusters)
+    assert segmenter.model() is segmenter.model()
+
+
+def test_segment_names_fall_back_to_the_notebook_map(tmp_path, monkeypatch):
+    monkeypatch.setattr(data_cache, "DATA_PATH", str(tmp_path))
+    monkeypatch.setattr(data_cache, "CACHE_DIR", str(tmp_path / ".cache" / "frames"))
+    names = segment_name_table(str(tmp_path / "missing.csv"), n_clusters=6)
+    assert names[3] == "VIP Loyal" and names[5] == "5"
+    (tmp_path / "segments.csv").write_text("cluster,segment_name\n3,Champions\n3,Other\n", encoding="utf-8")
+    assert segment_name_table(str(tmp_path / "segments.csv"))[3] == "Champions"
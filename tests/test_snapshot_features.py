@@ -0,0 +1,62 @@
+import os
+
+import pandas as pd
+import pytest
+
+import data_cache
+from snapshot_features import SNAPSHOT_COLUMNS, SnapshotBuilder
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+class WordScorer:
+    """Stand-in for VADER scoring a few words, counting scored texts"""
+
+    def __init__(self):
+        self.scored = 0
+
+    def score_many(self, texts):
+        self.scored += len(texts)
+        return [{"compound": 0.5 if "xcellent" in t else -0.5 if "errible" in t else 0.0} for t in texts]
+
+
+@pytest.fixture
+def data_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(data_cache, "DATA_PATH", str(tmp_path))
+    monkeypatch.setattr(data_cache, "CACHE_DIR", str(tmp_path / ".cache" / "frames"))
+    return tmp_path
+
+
+@pytest.fixture(scope="module")
+def log():
+    return pd.read_csv(os.path.join(ROOT, "data/customer_intelligence_dataset.csv"), nrows=3000)
+
+
+def build(data_dir, rows, full=False, state="state.pkl"):
+    path = data_dir / "transactions.csv"
+    rows.to_csv(path, index=False)
+    scorer = WordScorer()
+    builder = SnapshotBuilder(str(path), str(data_dir / ".cache" / state), scorer=scorer)
+    return builder.build(full=full), builder.stats, scorer
+
+
+def test_incremental_build_matches_a_full_build(data_dir, log):
+    build(data_dir, log.iloc[:2000])
+    snapshot, stats, scorer = build(data_dir, log)
+    assert stats["new_rows"] == 1000
+    assert stats["customers_recomputed"] < stats["customers"]
+    # Only the appended rows are sentiment-scored again
+    assert scorer.scored == log.iloc[2000:]["feedback_text"].fillna("").str.strip().str.len().gt(0).sum()
+
+    expected, _, _ = build(data_dir, log, full=True, state="other.pkl")
+    assert tuple(snapshot.columns) == SNAPSHOT_COLUMNS
+    pd.testing.assert_frame_equal(snapshot.reset_index(drop=True), expected.reset_index(drop=True))
+
+
+def test_rewritten_log_is_rebuilt(data_dir, log):
+    build(data_dir, log.iloc[:2000])
+    # Same length but other rows: the saved state no longer applies
+    snapshot, stats, _ = build(data_dir, log.iloc[1000:3000])
+    assert stats["new_rows"] == 2000 and stats["customers_recomputed"] == stats["customers"]
+    expected, _, _ = build(data_dir, log.iloc[1000:3000], full=True, state="other.pkl")
+    pd.testing.assert_frame_equal(snapshot.reset_index(drop=True), expected.reset_index(drop=True))
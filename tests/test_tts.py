@@ -0,0 +1,105 @@
+import asyncio
+import os
+import threading
+import time
+
+import pytest
+
+import tts
+
+
+class FakeEngine:
+    """Synthesis backend returning the text itself, counting calls per chunk"""
+
+    def __init__(self, failures=0, delays=None):
+        self.calls = {}
+        self.failures = failures
+        self.delays = delays or {}
+        self._lock = threading.Lock()
+
+    async def synthesize(self, text, voice):
+        with self._lock:
+            self.calls[text] = self.calls.get(text, 0) + 1
+            attempt = self.calls[text]
+        await asyncio.sleep(self.delays.get(text, 0))
+        if attempt <= self.failures:
+            raise ConnectionError(f"attempt {attempt} failed")
+        return f"<{text}>".encode("utf-8")
+
+
+@pytest.fixture
+def workdir(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    return tmp_path
+
+
+def test_chunks_are_reused_from_the_cache(workdir):
+    engine = FakeEngine()
+    generator = tts.TTSGenerator(engine=engine)
+    path = generator.text_to_speech("", "first.mp3", ["Alpha.", "Beta."])
+    assert open(path, "rb").read() == b"<Alpha.><Beta.>"
+
+    # Another generator (e.g. another worker) only synthesizes the new chunk
+    path = tts.TTSGenerator(engine=engine).text_to_speech("", "second.mp3", ["Alpha.", "Gamma."])
+    assert open(path, "rb").read() == b"<Alpha.><Gamma.>"
+    assert engine.calls == {"Alpha.": 1, "Beta.": 1, "Gamma.": 1}
+
+
+def test_failed_chunks_are_retried(workdir):
+    engine = FakeEngine(failures=1)
+    generator = tts.TTSGenerator(engine=engine, retries=1)
+    path = generator.text_to_speech("", "retry.mp3", ["Alpha."])
+    assert open(path, "rb").read() == b"<Alpha.>"
+    assert engine.calls == {"Alpha.": 2}
+
+    with pytest.raises(Exception, match="attempt 1 failed"):
+        tts.TTSGenerator(engine=FakeEngine(failures=1), retries=0).text_to_speech("", "fail.mp3", ["Beta."])
+    assert not (workdir / "audio_output" / "fail.mp3").exists()
+
+
+def test_audio_is_yielded_in_reading_order(workdir):
+    # Earlier chunks finish last, so completion order is the reverse of reading order
+    chunks = ["One.", "Two.", "Three."]
+    engine = FakeEngine(delays={"One.": 0.2, "Two.": 0.1})
+    generator = tts.TTSGenerator(engine=engine, max_concurrency=3)
+    pieces = []
+    asyncio.run(generator.text_to_speech_async("", "ordered.mp3", chunks, on_audio=pieces.append))
+    assert pieces == [b"<One.>", b"<Two.>", b"<Three.>"]
+    assert (workdir / "audio_output" / "ordered.mp3").read_bytes() == b"".join(pieces)
+
+
+def test_concurrent_writers_of_one_chunk(workdir):
+    engine = FakeEngine(delays={"Shared.": 0.05})
+    errors = []
+
+    def synthesize(i):
+        try:
+            tts.TTSGenerator(engine=engine).text_to_speech("", f"out{i}.mp3", ["Shared."])
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=synthesize, args=(i,)) for i in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert errors == []
+    chunk_dir = workdir / "audio_output" / ".chunks"
+    assert [p.suffix for p in chunk_dir.iterdir()] == [".mp3"]
+
+
+def test_chunk_cache_drops_least_recently_used(workdir):
+    engine = FakeEngine()
+    # Room for two of the 8-byte chunks
+    generator = tts.TTSGenerator(engine=engine, max_cache_bytes=20)
+    for age, text in ((30, "Alpha."), (20, "Bravo.")):
+        asyncio.run(generator.synthesize_chunk(text))
+        then = time.time() - age
+        os.utime(generator._chunk_path(text), (then, then))
+    # A hit makes Alpha the most recently used chunk, so Bravo is dropped
+    asyncio.run(generator.synthesize_chunk("Alpha."))
+    asyncio.run(generator.synthesize_chunk("Charl."))
+    assert generator._chunk_path("Alpha.").exists()
+    assert not generator._chunk_path("Bravo.").exists()
+    assert generator._chunk_path("Charl.").exists()
+    assert engine.calls == {"Alpha.": 1, "Bravo.": 1, "Charl.": 1}
@@ -0,0 +1,91 @@
+import asyncio
+import os
+import threading
+
+import pytest
+
+import app as api
+import tts
+from jobs import JobQueue
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    # The audio is written relative to the working directory, but send_file
+    # resolves relative paths against the app root
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(api, "AUDIO_FILE", str(tmp_path / api.AUDIO_FILE))
+    (tmp_path / api.INSIGHTS_FILE).write_text("First paragraph.\n\nSecond paragraph.", encoding="utf-8")
+    release = threading.Event()
+    calls = []
+
+    async def synthesize(self, text, voice):
+        calls.append(text)
+        # The test client reads the first chunk before returning a streamed
+        # response, so only later chunks wait for the test
+        if text != "First paragraph.":
+            await asyncio.get_running_loop().run_in_executor(None, release.wait, 5)
+        return f"<{text}>".encode("utf-8")
+
+    monkeypatch.setattr(tts.EdgeTTSEngine, "synthesize", synthesize)
+    jobs = JobQueue(jobs_dir=str(tmp_path / ".jobs"))
+    jobs.register("tts", api.generate_insights_audio)
+    monkeypatch.setattr(api, "job_queue", jobs)
+    client = api.app.test_client()
+    client.release, client.calls = release, calls
+    return client
+
+
+def test_stream_joins_the_tts_job(client):
+    streamed = client.get("/tts_insights?stream=1&regenerate_audio=1", json={"regenerate_audio": True},
+                          buffered=False)
+    assert streamed.status_code == 200
+    # The audio is being synthesized: both a second stream and a regular
+    # request join that job instead of writing AUDIO_FILE again
+    second = client.get("/tts_insights?stream=1", json={"regenerate_audio": True})
+    regular = client.post("/tts_insights", json={"regenerate_audio": True})
+    assert second.status_code == regular.status_code == 202
+    assert second.json["deduplicated"] and regular.json["deduplicated"]
+    assert second.json["job_id"] == regular.json["job_id"]
+
+    client.release.set()
+    assert streamed.get_data() == b"<First paragraph.><Second paragraph.>"
+    assert sorted(client.calls) == ["First paragraph.", "Second paragraph."]
+
+    job_id = regular.json["job_id"]
+    assert api.job_queue.wait(job_id, poll_interval=0.05)["status"] == "succeeded"
+    with open(api.AUDIO_FILE, "rb") as f:
+        assert f.read() == b"<First paragraph.><Second paragraph.>"
+    partial = client.get("/tts_insights", headers={"Range": "bytes=0-17"})
+    assert partial.status_code == 206
+    assert partial.get_data() == b"<First paragraph.>"
+
+
+def test_audio_is_kept_per_voice(client):
+    client.release.set()
+    os.makedirs(os.path.dirname(api.AUDIO_FILE), exist_ok=True)
+    with open(api.AUDIO_FILE, "wb") as f:
+        f.write(b"<default voice>")
+    assert client.get("/tts_insights").get_data() == b"<default voice>"
+
+    # Another voice is synthesized instead of being served the default's audio
+    other = client.get("/tts_insights?voice=en-US-GuyNeural")
+    assert other.status_code == 202
+    assert api.job_queue.wait(other.json["job_id"], poll_interval=0.05)["status"] == "succeeded"
+    with open(api.audio_file_for("en-US-GuyNeural"), "rb") as f:
+        assert f.read() == b"<First paragraph.><Second paragraph.>"
+    with open(api.AUDIO_FILE, "rb") as f:
+        assert f.read() == b"<default voice>"
+
+    assert client.get("/tts_insights?voice=../../etc/passwd").status_code == 400
+
+
+def test_regenerate_audio_query_parameter(client):
+    client.release.set()
+    os.makedirs(os.path.dirname(api.AUDIO_FILE), exist_ok=True)
+    with open(api.AUDIO_FILE, "wb") as f:
+        f.write(b"<old audio>")
+    response = client.get("/tts_insights?regenerate_audio=1")
+    assert response.status_code == 202
+    assert api.job_queue.wait(response.json["job_id"], poll_interval=0.05)["status"] == "succeeded"
+    assert client.get("/tts_insights").get_data() == b"<First paragraph.><Second paragraph.>"
@@ -0,0 +1,64 @@
+import pytest
+
+from benchmarks.clean_text_benchmark import SAMPLE, legacy_clean_text_for_speech
+from tts import normalize_for_speech
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("Total sales of $462 million grew 12.5% year over year",
+     "Total sales of 462 million dollars grew 12.5 percent year over year."),
+    ("Average order value fell -3.2% & returns rose",
+     "Average order value fell minus 3.2 percent and returns rose."),
+    ("(-1.5%) churn", "(minus 1.5 percent) churn."),
+    ("-5 customers left", "minus 5 customers left."),
+    ("a loss of -$3k", "a loss of minus 3 thousand dollars."),
+    ("act on the $1.2M at stake", "act on the 1.2 million dollars at stake."),
+    # Ranges read as "to", with or without spaces around the dash
+    ("Discounts of 3%-5%", "Discounts of 3 percent to 5 percent."),
+    ("from Q1 - Q2", "from Q1 to Q2."),
+    ("from Q1-Q2", "from Q1 to Q2."),
+    ("5 - 7 days", "5 to 7 days."),
+    ("the 2019–2021 cohorts", "the 2019 to 2021 cohorts."),
+    ("$10-$20 orders", "10 dollars to 20 dollars orders."),
+    # A spaced dash between words is a pause
+    ("a medium risk - act now", "a medium risk, act now."),
+    ("x - y", "x, y."),
+    # Hyphens inside words, codes and dates are kept
+    ("year-over-year growth", "year-over-year growth."),
+    ("COVID-19 impact", "COVID-19 impact."),
+    ("peaking on 2020-10-01.", "peaking on 2020-10-01."),
+])
+def test_normalize_for_speech(text, expected):
+    assert normalize_for_speech(text) == expected
+
+
+def test_benchmark_sample():
+    assert normalize_for_speech(SAMPLE) == (
+        "Customer Intelligence Insights. (Mistral 7B). Point 1: Sales Performance. "
+        "Point: Total sales of 462 million dollars grew 12.5 percent year over year, peaking on 2020-10-01. "
+        "Point: Average order value fell minus 3.2 percent and returns rose; consider cross-selling bundles. "
+        "Point: Discounts of 3 percent to 5 percent from Q1 to Q2 cut churn (minus 1.5 percent) "
+        "for 2019 to 2021 cohorts. Point 2: Churn Risk. "
+        "Point: At 20.1 percent, the churn rate is a medium risk, act on the 1.2 million dollars at stake."
+    )
+
+
+@pytest.mark.parametrize("text", [
+    "Customer retention improved across all segments.",
+    "CUSTOMER INTELLIGENCE INSIGHTS",
+    "Revenue & margin grew in 2021; loyalty held.",
+    "Churn Risk is medium. Act on it!",
+])
+def test_prose_matches_legacy_output(text):
+    # Text without dashes, currency or headings was already read correctly
+    # by the old multi-pass implementation
+    assert normalize_for_speech(text).rstrip(".") == " ".join(legacy_clean_text_for_speech(text).split()).rstrip(".")
+
+
+def test_sample_fixes_legacy_defects():
+    legacy = legacy_clean_text_for_speech(SAMPLE)
+    fixed = normalize_for_speech(SAMPLE)
+    for broken, read in (("2020Point:10Point:01", "2020-10-01"), ("3 percentPoint:5 percent", "3 percent to 5 percent"),
+                         ("Point:3.2 percent", "minus 3.2 percent"), ("dollars 462", "462 million dollars")):
+        assert broken in legacy
+        assert read in fixed and broken not in fixed
@@ -3,18 +3,149 @@ Text-to-Speech Module using Edge TTS
 Converts customer insights to high-quality speech
 """
 
-import edge_tts
 import asyncio
+import hashlib
+import os
+import re
+import threading
 from pathlib import Path
 import logging
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+_PARAGRAPH_BREAK = re.compile(r'\n\s*\n')
+_SENTENCE_END = re.compile(r'(?<=[.!?])\s+')
+
+_NUMBER = r'(\d[\d,]*(?:\.\d+)?)'
+_SCALES = {"k": "thousand", "m": "million", "b": "billion", "bn": "billion"}
+
+
+def _money(sign, amount, scale):
+    if scale:
+        scale = _SCALES.get(scale.lower(), scale.lower())
+        return f"{'minus ' if sign else ''}{amount} {scale} dollars"
+    return f"{'minus ' if sign else ''}{amount} dollars"
+
+
+def _percent(sign, amount):
+    return f"{'minus ' if sign else ''}{amount} percent"
+
+
+# Speech normalization rules, combined into one regex and tried left to right
+# at each position. Every rule starts with a distinctive character (line rules
+# with the newline before the line) so plain prose is skipped without a match
+# attempt. Replacements are strings or callables taking the rule's groups;
+# "\n" in a replacement marks a sentence break, resolved by the second pass.
+# A "-" is a minus sign only at the start of a word or after "(", and a dash
+# between two numbers (or tokens like Q1) is a range, read as "to".
+_SIGN = r'(?:(?<![^\s(])(-))?'
+_RANGE_END = r'(?=\$?[A-Za-z]*\d)'
+_SPEECH_RULES = (
+    (r'\n[ \t]*(?:={3,}|-{3,}|_{3,})[ \t]*(?=\n|$)', "\n"),
+    (r'\n[ \t]*(\d+)\.[ \t]*\*\*([^*\n]+?)[ \t]*:?[ \t]*\*\*:?', lambda n, title: f"\nPoint {n}: {title}\n"),
+    (r'\n[ \t]*(\d+)\.[ \t]+', lambda n: f"\nPoint {n}: "),
+    (r'\n[ \t]*[-•*][ \t]+', "\nPoint: "),
+    (r'(?:\n[ \t]*)+(?=\n)', "\n"),
+    (r'\r?\n', " "),
+    (r'\r', ""),
+    (r'={3,}', ""),
+    (r'CUSTOMER INTELLIGENCE INSIGHTS', "Customer Intelligence Insights."),
+    (r'\*\*|#{2,}[ \t]*', ""),
+    (_SIGN + r'\$[ \t]*' + _NUMBER + r'(?:[ \t]*((?i:thousand|million|billion|trillion)|[KkMmBb]n?)\b)?', _money),
+    (r'(\d{4}-\d\d-\d\d)(?!\d)', lambda date: date),
+    (_SIGN + _NUMBER + r'[ \t]*%', _percent),
+    (r'[-\u2013](?<=[\d%][-\u2013])' + _RANGE_END, " to "),
+    (r'[-\u2013\u2014](?<=[\d%][ \t][-\u2013\u2014])[ \t]+' + _RANGE_END, " to "),
+    (r'(?<![^\s(])-(?=\d)', "minus "),
+    (r'[-\u2013\u2014](?<=[ \t][-\u2013\u2014])[ \t]+', ", "),
+    (r'&', " and "),
+    (r'\$', " dollars "),
+    (r'%', " percent"),
+    (r'•', " Point: "),
+)
+
+
+# Every rule's first character; the lookahead lets the engine skip other
+# characters without trying each alternative
+_RULE_STARTS = r'[\n\r=C*#$%&\d\u2022\u2013\u2014-]'
+
+
+def _compile_rules(rules, starts):
+    parts, actions = [], {}
+    index = 1
+    for pattern, replacement in rules:
+        groups = re.compile(pattern).groups
+        parts.append(f"({pattern})")
+        actions[index] = (groups, replacement)
+        index += groups + 1
+    return re.compile(f"(?={starts})(?:{'|'.join(parts)})"), actions
+
+
+_SPEECH_PATTERN, _SPEECH_ACTIONS = _compile_rules(_SPEECH_RULES, _RULE_STARTS)
+
+
+def _apply_speech_rule(match):
+    index = match.lastindex
+    groups, replacement = _SPEECH_ACTIONS[index]
+    if isinstance(replacement, str):
+        return replacement
+    return replacement(*match.groups()[index:index + groups])
+
+
+def normalize_for_speech(text: str) -> str:
+    """
+    Normalize report text for speech in one regex pass
+
+    The regex pass applies _SPEECH_RULES (markup, headings and bullets,
+    currency, percentages, ranges, negative numbers); sentence breaks and whitespace
+    are then resolved with str.split/join.
+
+    Args:
+        text: Raw text content
+
+    Returns:
+        Text optimized for speech
+    """
+    # The leading newline lets line rules match the first line too
+    text = _SPEECH_PATTERN.sub(_apply_speech_rule, "\n" + text)
+    sentences = []
+    for sentence in text.split("\n"):
+        sentence = " ".join(sentence.split())
+        if not sentence or sentence == ".":
+            continue
+        if sentence[-1] in ":;,":
+            sentence = sentence[:-1] + "."
+        elif sentence[-1] not in ".!?":
+            sentence += "."
+        sentences.append(sentence)
+    return " ".join(sentences).replace(" ,", ",")
+
+
+class EdgeTTSEngine:
+    """
+    Synthesis backend using Edge TTS
+
+    Any object with an ``async synthesize(text, voice) -> bytes`` method
+    returning MP3 data can be passed to TTSGenerator instead, e.g. a local
+    fake engine for offline runs.
+    """
+
+    async def synthesize(self, text: str, voice: str) -> bytes:
+        import edge_tts
+        communicate = edge_tts.Communicate(text, voice)
+        audio = bytearray()
+        async for chunk in communicate.stream():
+            if chunk["type"] == "audio":
+                audio.extend(chunk["data"])
+        return bytes(audio)
+
+
 class TTSGenerator:
     """Text-to-Speech generator using Edge TTS"""
     
-    def __init__(self, voice="en-US-AriaNeural"):
+    def __init__(self, voice="en-US-AriaNeural", engine=None, max_concurrency: int = 4,
+                 max_chunk_chars: int = 1500, retries: int = 2, max_cache_bytes: int = 256 * 1024 * 1024):
         """
         Initialize TTS with voice selection
         
@@ -23,18 +154,145 @@ class TTSGenerator:
         - en-US-JennyNeural (Conversational female)  
         - en-US-GuyNeural (Professional male)
         - en-US-DavisNeural (Casual male)
+
+        Args:
+            voice: Voice to use
+            engine: Synthesis backend (default: EdgeTTSEngine)
+            max_concurrency: Chunks synthesized at the same time
+            max_chunk_chars: Upper bound on the text of one chunk
+            retries: Extra attempts for a chunk that fails
+            max_cache_bytes: Size of the chunk cache before the least
+                recently used chunks are dropped
         """
         self.voice = voice
+        self.engine = engine or EdgeTTSEngine()
+        self.max_concurrency = max_concurrency
+        self.max_chunk_chars = max_chunk_chars
+        self.retries = retries
+        self.max_cache_bytes = max_cache_bytes
         self.output_dir = Path("audio_output")
         self.output_dir.mkdir(exist_ok=True)
+        self.chunk_dir = self.output_dir / ".chunks"
+        self.chunk_dir.mkdir(exist_ok=True)
     
-    async def text_to_speech_async(self, text: str, output_filename: str = None) -> str:
+    def split_text(self, text: str, clean: bool = False) -> list:
+        """
+        Split text into chunks at paragraph, then sentence boundaries
+
+        Paragraphs are never merged, so editing one paragraph only changes
+        its own chunks and every other chunk is served from the cache.
+
+        Args:
+            text: Text to split
+            clean: Apply clean_text_for_speech to each paragraph
+
+        Returns:
+            List of non-empty text chunks in reading order
+        """
+        chunks = []
+        for paragraph in _PARAGRAPH_BREAK.split(text):
+            paragraph = self.clean_text_for_speech(paragraph) if clean else " ".join(paragraph.split())
+            if not paragraph:
+                continue
+            if len(paragraph) <= self.max_chunk_chars:
+                chunks.append(paragraph)
+                continue
+            current = ""
+            for sentence in _SENTENCE_END.split(paragraph):
+                if current and len(current) + 1 + len(sentence) > self.max_chunk_chars:
+                    chunks.append(current)
+                    current = sentence
+                else:
+                    current = f"{current} {sentence}" if current else sentence
+            if current:
+                chunks.append(current)
+        return chunks
+
+    def _chunk_path(self, text: str) -> Path:
+        key = hashlib.sha256(f"{self.voice}\0{text}".encode("utf-8")).hexdigest()
+        return self.chunk_dir / f"{key}.mp3"
+
+    async def synthesize_chunk(self, text: str) -> bytes:
+        """Return MP3 bytes for one chunk, from the cache when available"""
+        path = self._chunk_path(text)
+        try:
+            audio = path.read_bytes()
+            # The mtime orders the cache for least-recently-used pruning
+            os.utime(path)
+            return audio
+        except FileNotFoundError:
+            pass
+        for attempt in range(self.retries + 1):
+            try:
+                audio = await self.engine.synthesize(text, self.voice)
+                break
+            except Exception as e:
+                if attempt == self.retries:
+                    raise
+                logger.warning(f"TTS chunk failed (attempt {attempt + 1}), retrying: {str(e)}")
+                await asyncio.sleep(0.5 * 2 ** attempt)
+        # Other threads and workers may be writing the same chunk
+        tmp_path = path.with_name(f"{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+        tmp_path.write_bytes(audio)
+        tmp_path.replace(path)
+        self._prune_chunk_cache(keep=path)
+        return audio
+
+    def _prune_chunk_cache(self, keep):
+        entries, total = [], 0
+        for path in self.chunk_dir.glob("*.mp3"):
+            try:
+                st = path.stat()
+            except OSError:
+                continue
+            entries.append((st.st_mtime_ns, st.st_size, path))
+            total += st.st_size
+        if total <= self.max_cache_bytes:
+            return
+        for _, size, path in sorted(entries):
+            if path == keep:
+                continue
+            try:
+                path.unlink()
+            except OSError:
+                continue
+            total -= size
+            if total <= self.max_cache_bytes:
+                break
+
+    async def iter_speech(self, chunks: list):
+        """
+        Synthesize chunks concurrently and yield their audio in reading order
+
+        At most max_concurrency chunks are in flight; each chunk is yielded
+        as soon as it and every chunk before it are done.
+        """
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+
+        async def bounded(text):
+            async with semaphore:
+                return await self.synthesize_chunk(text)
+
+        tasks = [asyncio.ensure_future(bounded(text)) for text in chunks]
+        try:
+            for task in tasks:
+                yield await task
+        finally:
+            for task in tasks:
+                task.cancel()
+            # Let cancelled tasks finish so no "never retrieved" warnings leak
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def text_to_speech_async(self, text: str, output_filename: str = None, chunks: list = None,
+                                   on_audio=None) -> str:
         """
         Convert text to speech asynchronously
         
         Args:
             text: Text to convert to speech
             output_filename: Optional custom filename
+            chunks: Pre-split chunks to use instead of splitting text
+            on_audio: Optional callback receiving each chunk's MP3 bytes in order
             
         Returns:
             Path to generated audio file
@@ -44,36 +302,47 @@ class TTSGenerator:
                 output_filename = "customer_insights_audio.mp3"
             
             output_path = self.output_dir / output_filename
-            communicate = edge_tts.Communicate(text, self.voice)
-            await communicate.save(str(output_path))
+            tmp_path = output_path.with_name(f"{output_path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+            if chunks is None:
+                chunks = self.split_text(text)
+            with open(tmp_path, "wb") as f:
+                async for audio in self.iter_speech(chunks):
+                    f.write(audio)
+                    if on_audio is not None:
+                        on_audio(audio)
+            tmp_path.replace(output_path)
             
-            logger.info(f"Audio generated successfully: {output_path}")
+            logger.info(f"Audio generated successfully: {output_path} ({len(chunks)} chunks)")
             return str(output_path)
             
         except Exception as e:
             logger.error(f"TTS Error: {str(e)}")
             raise Exception(f"Failed to generate audio: {str(e)}")
     
-    def text_to_speech(self, text: str, output_filename: str = None) -> str:
+    def text_to_speech(self, text: str, output_filename: str = None, chunks: list = None,
+                       on_audio=None) -> str:
         """
         Synchronous wrapper for text_to_speech_async
         
         Args:
             text: Text to convert to speech
             output_filename: Optional custom filename
+            chunks: Pre-split chunks to use instead of splitting text
+            on_audio: Optional callback receiving each chunk's MP3 bytes in order
             
         Returns:
             Path to generated audio file
         """
-        return asyncio.run(self.text_to_speech_async(text, output_filename))
-    
-    def read_file_and_generate_audio(self, file_path: str, output_filename: str = None) -> str:
+        return asyncio.run(self.text_to_speech_async(text, output_filename, chunks, on_audio))
+
+    def read_file_and_generate_audio(self, file_path: str, output_filename: str = None, on_audio=None) -> str:
         """
         Read text file and convert to speech
         
         Args:
             file_path: Path to text file
             output_filename: Optional custom audio filename
+            on_audio: Optional callback receiving each chunk's MP3 bytes in order
             
         Returns:
             Path to generated audio file
@@ -83,11 +352,12 @@ class TTSGenerator:
             with open(file_path, 'r', encoding='utf-8') as f:
                 text_content = f.read()
             
-            # Clean up the text for better speech
-            cleaned_text = self.clean_text_for_speech(text_content)
+            # Clean up the text for better speech, paragraph by paragraph so
+            # unchanged paragraphs keep hitting the chunk cache
+            chunks = self.split_text(text_content, clean=True)
             
             # Generate audio
-            return self.text_to_speech(cleaned_text, output_filename)
+            return self.text_to_speech(text_content, output_filename, chunks, on_audio)
             
         except FileNotFoundError:
             raise Exception(f"File not found: {file_path}")
@@ -104,26 +374,7 @@ class TTSGenerator:
         Returns:
             Cleaned text optimized for speech
         """
-
-        text = text.replace("="*80, "")
-        text = text.replace("="*50, "")
-        text = text.replace("CUSTOMER INTELLIGENCE INSIGHTS", "Customer Intelligence Insights.")
-        text = text.replace("**", "")  
-        text = text.replace("##", "")  
-        text = text.replace("•", "Point:")
-        text = text.replace("-", "Point:")
-        
-        import re
-        text = re.sub(r'\b(\d+)\.\s*\*\*([^*]+)\*\*', r'Point \1: \2.', text)
-        
-        text = re.sub(r'\n\s*\n', '. ', text)
-        text = re.sub(r'\s+', ' ', text)
-        
-        text = text.replace("$", "dollars ")
-        text = text.replace("%", " percent")
-        text = text.replace("&", " and ")
-        
-        return text.strip()
+        return normalize_for_speech(text)
     
     def get_available_voices(self) -> list:
         """
@@ -161,7 +412,8 @@ def generate_audio_from_text(text: str, voice: str = "en-US-AriaNeural", output_
     tts = TTSGenerator(voice)
     return tts.text_to_speech(text, output_file)
 
-def generate_audio_from_file(file_path: str, voice: str = "en-US-AriaNeural", output_file: str = None) -> str:
+def generate_audio_from_file(file_path: str, voice: str = "en-US-AriaNeural", output_file: str = None,
+                             on_audio=None) -> str:
     """
     Convenience function to generate audio from text file
     
@@ -169,12 +421,13 @@ def generate_audio_from_file(file_path: str, voice: str = "en-US-AriaNeural", ou
         file_path: Path to text file
         voice: Voice to use  
         output_file: Output filename
+        on_audio: Optional callback receiving each chunk's MP3 bytes in order
         
     Returns:
         Path to generated audio file
     """
     tts = TTSGenerator(voice)
-    return tts.read_file_and_generate_audio(file_path, output_file)
+    return tts.read_file_and_generate_audio(file_path, output_file, on_audio)
 
 # if __name__ == "__main__":
 #     tts = TTSGenerator()